@@ -6,6 +6,7 @@ var vm = new Vue({
         token: sessionStorage.token || localStorage.token,
         username: sessionStorage.username || localStorage.username,
         is_show_edit: false,
+        area_tree: [],
         provinces: [],
         cities: [],
         districts: [],
@@ -31,11 +32,23 @@ var vm = new Vue({
         input_title: ''
     },
     mounted: function(){
-        axios.get(this.host + '/areas/', {
+        // 一次取得所有省市区，格式: [[省id, 省名, [[市id, 市名, [[区id, 区名], ...]], ...]], ...]
+        // 先从静态文件 areas/manifest.json 取得当前版本的文件名，带版本号的文件可以一直缓存；
+        // 没有导出过或读取失败时使用接口
+        var tree_api = this.host + '/areas/tree/';
+        axios.get('/areas/manifest.json', {
+                headers: {
+                    'Cache-Control': 'no-cache'
+                },
                 responseType: 'json'
             })
+            .then(response => '/areas/' + response.data.file)
+            .catch(() => tree_api)
+            .then(url => axios.get(url, {responseType: 'json'})
+                .catch(error => url === tree_api ? Promise.reject(error) : axios.get(tree_api, {responseType: 'json'})))
             .then(response => {
-                this.provinces = response.data;
+                this.area_tree = response.data;
+                this.provinces = this.to_areas(this.area_tree);
             })
             .catch(error => {
                 alert(error.response.data);
@@ -64,34 +77,38 @@ var vm = new Vue({
     watch: {
         'form_address.province_id': function(){
             if (this.form_address.province_id) {
-                axios.get(this.host + '/areas/'+ this.form_address.province_id + '/', {
-                        responseType: 'json'
-                    })
-                    .then(response => {
-                        this.cities = response.data.subs;
-                    })
-                    .catch(error => {
-                        console.log(error.response.data);
-                        this.cities = [];
-                    });
+                this.cities = this.to_areas(this.find_subs(this.area_tree, this.form_address.province_id));
             }
         },
         'form_address.city_id': function(){
             if (this.form_address.city_id){
-                axios.get(this.host + '/areas/'+ this.form_address.city_id + '/', {
-                        responseType: 'json'
-                    })
-                    .then(response => {
-                        this.districts = response.data.subs;
-                    })
-                    .catch(error => {
-                        console.log(error.response.data);
-                        this.districts = [];
-                    });
+                var province = this.find_subs(this.area_tree, this.form_address.province_id);
+                this.districts = this.to_areas(this.find_subs(province, this.form_address.city_id));
             }
+        },
+        // 行政区划树在修改地址时可能晚于地址返回
+        area_tree: function(){
+            var province = this.find_subs(this.area_tree, this.form_address.province_id);
+            this.cities = this.to_areas(province);
+            this.districts = this.to_areas(this.find_subs(province, this.form_address.city_id));
         }
     },
     methods: {
+        // 行政区划树中的一级转换为 [{id:, name:}, ...]
+        to_areas: function(items){
+            return items.map(function(item){
+                return {id: item[0], name: item[1]};
+            });
+        },
+        // 行政区划树中id对应的下级
+        find_subs: function(items, id){
+            for (var i = 0; i < items.length; i++) {
+                if (items[i][0] == id) {
+                    return items[i][2] || [];
+                }
+            }
+            return [];
+        },
         // 退出
         logout: function(){
             sessionStorage.clear();
@@ -0,0 +1,16 @@
+import logging
+
+from celery_tasks.main import celery_app
+from verifications import captcha_pool
+
+logger = logging.getLogger("django")
+
+
+@celery_app.task(name="fill_captcha_pool")
+def fill_captcha_pool(count):
+    """
+    生成图片验证码补充到验证码池
+    :param count: 最多生成的数量，池满时停止
+    """
+    added = captcha_pool.fill_captcha_pool(count)
+    logger.info("补充图片验证码池[正常][ 数量: %s ]" % added)
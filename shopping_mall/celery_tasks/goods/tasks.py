@@ -0,0 +1,15 @@
+import logging
+
+from celery_tasks.main import celery_app
+from goods import sku_cache
+
+logger = logging.getLogger("django")
+
+
+@celery_app.task(name="build_sku_ids")
+def build_sku_ids():
+    """
+    从数据库重建缓存的sku id集合
+    """
+    sku_cache.build_sku_ids()
+    logger.info("重建sku id集合[正常]")
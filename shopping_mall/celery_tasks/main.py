@@ -14,4 +14,6 @@ celery_app = Celery('shopping')
 celery_app.config_from_object('celery_tasks.config')
 
 # 导入任务
-celery_app.autodiscover_tasks(['celery_tasks.sms', "celery_tasks.email", "celery_tasks.html"])
+celery_app.autodiscover_tasks(['celery_tasks.sms', "celery_tasks.email", "celery_tasks.html", "celery_tasks.stock",
+                             "celery_tasks.orders", "celery_tasks.search", "celery_tasks.captcha",
+                             "celery_tasks.goods"])
@@ -0,0 +1,29 @@
+import logging
+
+from celery_tasks.main import celery_app
+from orders import pipeline
+
+logger = logging.getLogger("django")
+
+
+@celery_app.task(name="handle_order_placed")
+def handle_order_placed(event):
+    """
+    下单后续处理：SPU销量、清理购物车、售罄商品详情页
+    :param event: 订单已创建事件
+    """
+    pipeline.handle_order_placed(event)
+
+
+@celery_app.task(name="flush_goods_sales")
+def flush_goods_sales():
+    """
+    把redis中累计的SPU销量批量写回数据库
+    """
+    try:
+        count = pipeline.flush_goods_sales()
+    except Exception as e:
+        logger.error("同步SPU销量[异常][ message: %s ]" % e)
+        raise
+    else:
+        logger.info("同步SPU销量[正常][ SPU数量: %s ]" % count)
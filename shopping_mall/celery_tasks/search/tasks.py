@@ -0,0 +1,21 @@
+import logging
+
+from celery_tasks.main import celery_app
+from shopping_mall.utils.search.signals import flush_search_updates
+
+logger = logging.getLogger("django")
+
+
+@celery_app.task(name="update_search_index")
+def update_search_index():
+    """
+    把记录的修改批量更新到搜索索引
+    """
+    try:
+        count = flush_search_updates()
+    except Exception as e:
+        # 修改记录保留在redis中，下一次更新时重试
+        logger.error("更新搜索索引[异常][ message: %s ]" % e)
+        raise
+    else:
+        logger.info("更新搜索索引[正常][ 文档数量: %s ]" % count)
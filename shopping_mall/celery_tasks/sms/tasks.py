@@ -1,20 +1,34 @@
-from celery_tasks.sms.utils.yuntongxun.sms import CCP
 import logging
+
 from celery_tasks.main import celery_app
+from shopping_mall.utils.sms import sender
 
 logger = logging.getLogger("django")
 
 
 @celery_app.task(name="send_sms_code")
 def send_sms_code(mobile, sms_code, expires, temp_id):
-    # 发送短信
+    # 发送短信，失败的短信记入死信
     try:
-        ccp = CCP()
-        result = ccp.send_template_sms(mobile, [sms_code, expires], temp_id)
+        sent, failed = sender.send_messages([{"to": mobile, "datas": [sms_code, expires], "temp_id": temp_id}])
     except Exception as e:
         logger.error("发送验证码短信[异常][ mobile: %s, message: %s ]" % (mobile, e))
     else:
-        if result == 0:
+        if sent:
             logger.info("发送验证码短信[正常][ mobile: %s ]" % mobile)
         else:
             logger.warning("发送验证码短信[失败][ mobile: %s ]" % mobile)
+
+
+@celery_app.task(name="dispatch_sms")
+def dispatch_sms():
+    """
+    批量发送短信队列中的短信
+    """
+    try:
+        sent, failed = sender.dispatch_sms_queue()
+    except Exception as e:
+        logger.error("批量发送短信[异常][ message: %s ]" % e)
+        raise
+    else:
+        logger.info("批量发送短信[正常][ 成功: %s, 失败: %s ]" % (sent, failed))
@@ -0,0 +1,21 @@
+import logging
+
+from celery_tasks.main import celery_app
+from orders import hot_stock
+
+logger = logging.getLogger("django")
+
+
+@celery_app.task(name="flush_hot_stock")
+def flush_hot_stock():
+    """
+    把redis中热点商品的库存扣减量批量同步回数据库
+    """
+    try:
+        count = hot_stock.flush_hot_stock()
+    except Exception as e:
+        # 扣减量保留在redis中，下一次同步时重试
+        logger.error("同步热点商品库存[异常][ message: %s ]" % e)
+        raise
+    else:
+        logger.info("同步热点商品库存[正常][ sku数量: %s ]" % count)
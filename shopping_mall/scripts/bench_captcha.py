@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+"""
+功能：测试图片验证码的生成速度，每个进程占用一个cpu核，输出每核每秒生成的验证码数量和平均图片大小，不需要数据库和redis
+使用方法:
+    ./bench_captcha.py [count] [processes]
+"""
+import sys
+sys.path.insert(0, "../")
+
+import time
+from multiprocessing import Pool
+
+from shopping_mall.libs.captcha.captcha import SAVE_OPTIONS, captcha
+
+
+def render(args):
+    """在一个进程中生成count个验证码，返回 (耗时, 图片总大小)"""
+    fmt, count = args
+    # 预先加载字体和字符灰度图，不计入耗时
+    for _ in range(20):
+        captcha.generate_captcha(fmt)
+    size = 0
+    start = time.time()
+    for _ in range(count):
+        size += len(captcha.generate_captcha(fmt)[1])
+    return time.time() - start, size
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    with Pool(processes) as pool:
+        for fmt in SAVE_OPTIONS:
+            results = pool.map(render, [(fmt, count)] * processes)
+            per_core = sum(count / cost for cost, _ in results) / processes
+            size = sum(size for _, size in results) / (count * processes)
+            print("%-5s %8.1f captchas/s/core  %8.1f captchas/s total  avg %6d bytes" % (
+                fmt, per_core, per_core * processes, size))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""
+功能：对比购物车cookie编解码的耗时和cookie长度
+    pickle: 原来的 pickle + base64
+    codec:  carts.codec 紧凑二进制 + HMAC签名
+使用方法:
+    ./bench_cart_codec.py [rounds]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import base64
+import pickle
+import random
+import timeit
+
+from carts.codec import encode_cart, decode_cart, CartCookieTooLarge
+
+
+def pickle_encode(cart):
+    return base64.b64encode(pickle.dumps(cart)).decode()
+
+
+def pickle_decode(cookie):
+    return pickle.loads(base64.b64decode(cookie.encode()))
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("%6s %8s | %8s %10s %10s | %8s %10s %10s" % (
+        "items", "", "p_size", "p_enc_us", "p_dec_us", "c_size", "c_enc_us", "c_dec_us"))
+    for items in (1, 5, 10, 20, 50, 100, 200):
+        sku_ids = random.sample(range(1, 100000), items)
+        cart = {sku_id: {"count": random.randint(1, 20), "selected": random.random() < 0.8}
+                for sku_id in sku_ids}
+
+        p_cookie = pickle_encode(cart)
+        p_enc = timeit.timeit(lambda: pickle_encode(cart), number=rounds) / rounds * 1e6
+        p_dec = timeit.timeit(lambda: pickle_decode(p_cookie), number=rounds) / rounds * 1e6
+
+        try:
+            c_cookie = encode_cart(cart)
+        except CartCookieTooLarge:
+            print("%6d %8s | %8d %10.1f %10.1f | %s" % (items, "", len(p_cookie), p_enc, p_dec, "too large"))
+            continue
+        assert decode_cart(c_cookie) == cart
+        c_enc = timeit.timeit(lambda: encode_cart(cart), number=rounds) / rounds * 1e6
+        c_dec = timeit.timeit(lambda: decode_cart(c_cookie), number=rounds) / rounds * 1e6
+
+        print("%6d %8s | %8d %10.1f %10.1f | %8d %10.1f %10.1f" % (
+            items, "", len(p_cookie), p_enc, p_dec, len(c_cookie), c_enc, c_dec))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""
+功能：对比购物车两种redis存储布局的吞吐量
+    legacy: cart_<user_id> 哈希 + cart_selected_<user_id> 集合
+    single: carts.repository 单个哈希 + lua脚本
+    测试使用 cart_bench_ 前缀的用户id，结束后删除
+使用方法:
+    ./bench_cart_storage.py [users] [items] [rounds]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import random
+import time
+
+from django_redis import get_redis_connection
+
+from carts.repository import CartRepository
+
+
+def legacy_read(redis_conn, user_id):
+    pl = redis_conn.pipeline()
+    pl.hgetall("cart_%s" % user_id)
+    pl.smembers("cart_selected_%s" % user_id)
+    redis_cart, cart_selected = pl.execute()
+    return {int(sku_id): {"count": int(count), "selected": sku_id in cart_selected}
+            for sku_id, count in redis_cart.items()}
+
+
+def legacy_add(redis_conn, user_id, sku_id):
+    pl = redis_conn.pipeline()
+    pl.hincrby("cart_%s" % user_id, sku_id, 1)
+    pl.sadd("cart_selected_%s" % user_id, sku_id)
+    pl.execute()
+
+
+def legacy_select_all(redis_conn, user_id, selected):
+    sku_id_list = redis_conn.hkeys("cart_%s" % user_id)
+    if selected:
+        redis_conn.sadd("cart_selected_%s" % user_id, *sku_id_list)
+    else:
+        redis_conn.srem("cart_selected_%s" % user_id, *sku_id_list)
+
+
+def bench(name, func, rounds):
+    start = time.time()
+    for i in range(rounds):
+        func(i)
+    cost = time.time() - start
+    print("%-8s %-12s %8.0f ops/s" % (name, func.__name__, rounds / cost))
+
+
+if __name__ == '__main__':
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    items = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+
+    redis_conn = get_redis_connection("cart")
+    user_ids = ["bench_%d" % i for i in range(users)]
+    try:
+        for user_id in user_ids:
+            repo = CartRepository(user_id, redis_conn)
+            for sku_id in random.sample(range(1, 10000), items):
+                legacy_add(redis_conn, user_id, sku_id)
+                repo.add(sku_id, 1, True)
+
+        def read(i):
+            legacy_read(redis_conn, user_ids[i % users])
+
+        def add(i):
+            legacy_add(redis_conn, user_ids[i % users], random.randint(1, 10000))
+
+        def select_all(i):
+            legacy_select_all(redis_conn, user_ids[i % users], i % 2 == 0)
+
+        for func in (read, add, select_all):
+            bench("legacy", func, rounds)
+
+        def read(i):
+            CartRepository(user_ids[i % users], redis_conn).get_all()
+
+        def add(i):
+            CartRepository(user_ids[i % users], redis_conn).add(random.randint(1, 10000), 1, True)
+
+        def select_all(i):
+            CartRepository(user_ids[i % users], redis_conn).select_all(i % 2 == 0)
+
+        for func in (read, add, select_all):
+            bench("single", func, rounds)
+    finally:
+        keys = []
+        for user_id in user_ids:
+            keys += ["cart_%s" % user_id, "cart_selected_%s" % user_id, "cart_v2_%s" % user_id]
+        redis_conn.delete(*keys)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+"""
+功能：在合成的商品数据上对比详情页静态化的耗时和sql查询次数，结束后回滚合成数据
+    legacy:  原来的逐个SKU生成，每个SKU查询分类菜单、兄弟SKU的规格和选项（只取样部分SKU后按比例估算）
+    builder: goods.detail_html.DetailPageBuilder 按SPU批量生成
+    rebuild: 再次用builder生成，内容未变化的页面不重写
+使用方法:
+    ./bench_detail_html.py [skus] [legacy_sample]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import itertools
+import tempfile
+import time
+import uuid
+
+from django.db import connection, transaction
+from django.template import loader
+from django.test.utils import CaptureQueriesContext
+
+from goods.detail_html import DetailPageBuilder
+from goods.models import GoodsCategory, GoodsChannel, Brand, Goods, GoodsSpecification, SpecificationOption, \
+    SKU, SKUSpecification
+from goods.utils import get_categories
+
+# 每个SPU的规格数和每个规格的选项数，每个SPU有 OPTIONS ** SPECS 个SKU
+SPECS = 2
+OPTIONS = 2
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_catalog(sku_count):
+    """合成商品数据，返回SPU id列表和SKU id列表"""
+    tag = uuid.uuid4().hex[:8]
+    cat1 = GoodsCategory.objects.create(name="bench1")
+    cat2 = GoodsCategory.objects.create(name="bench2", parent=cat1)
+    cat3 = GoodsCategory.objects.create(name="bench3", parent=cat2)
+    GoodsChannel.objects.create(group_id=99, category=cat1, url="http://bench", sequence=1)
+    brand = Brand.objects.create(name="bench", logo="bench.png", first_letter="B")
+
+    goods_count = sku_count // OPTIONS ** SPECS
+    Goods.objects.bulk_create([
+        Goods(name="bench-%s-%d" % (tag, i), brand=brand, category1=cat1, category2=cat2, category3=cat3,
+              desc_detail="<p>detail</p>" * 20, desc_pack="pack", desc_service="service")
+        for i in range(goods_count)])
+    goods_list = list(Goods.objects.filter(name__startswith="bench-%s-" % tag).order_by("id"))
+
+    GoodsSpecification.objects.bulk_create([
+        GoodsSpecification(goods=goods, name="spec%d" % i) for goods in goods_list for i in range(SPECS)])
+    specs = {}
+    for spec in GoodsSpecification.objects.filter(goods__in=goods_list).order_by("id"):
+        specs.setdefault(spec.goods_id, []).append(spec)
+
+    SpecificationOption.objects.bulk_create([
+        SpecificationOption(spec=spec, value="option%d" % i)
+        for spec_list in specs.values() for spec in spec_list for i in range(OPTIONS)])
+    options = {}
+    for option in SpecificationOption.objects.filter(spec__goods__in=goods_list).order_by("id"):
+        options.setdefault(option.spec_id, []).append(option)
+
+    SKU.objects.bulk_create([
+        SKU(name="%s-%d" % (goods.name, i), caption="caption", goods=goods, category=cat3,
+            price=100, cost_price=80, market_price=120, stock=10, default_image_url="bench.png")
+        for goods in goods_list for i in range(OPTIONS ** SPECS)])
+    sku_list = list(SKU.objects.filter(goods__in=goods_list).order_by("id"))
+
+    # 每个SPU的SKU依次对应规格选项的所有组合
+    sku_specs = []
+    for goods, group in itertools.groupby(sku_list, key=lambda sku: sku.goods_id):
+        combos = itertools.product(*[options[spec.id] for spec in specs[goods]])
+        for sku, combo in zip(group, combos):
+            sku_specs.extend(SKUSpecification(sku=sku, spec_id=option.spec_id, option=option) for option in combo)
+    SKUSpecification.objects.bulk_create(sku_specs, batch_size=5000)
+
+    return [goods.id for goods in goods_list], [sku.id for sku in sku_list]
+
+
+def legacy_generate(sku_id, output_dir):
+    """原来的 celery_tasks.html.tasks.generate_static_sku_detail_html"""
+    categories = get_categories()
+    sku = SKU.objects.get(id=sku_id)
+    sku.images = sku.skuimage_set.all()
+    goods = sku.goods
+    goods.channel = goods.category1.goodschannel_set.all()[0]
+    sku_key = [spec.option.id for spec in sku.skuspecification_set.order_by("spec_id")]
+    spec_sku_map = {}
+    for s in goods.sku_set.all():
+        key = [spec.option.id for spec in s.skuspecification_set.order_by("spec_id")]
+        spec_sku_map[tuple(key)] = s.id
+    specs = goods.goodsspecification_set.order_by("id")
+    if len(sku_key) < len(specs):
+        return
+    for index, spec in enumerate(specs):
+        key = sku_key[:]
+        options = spec.specificationoption_set.all()
+        for option in options:
+            key[index] = option.id
+            option.sku_id = spec_sku_map.get(tuple(key))
+        spec.options = options
+    context = {"categories": categories, "goods": goods, "specs": specs, "sku": sku}
+    html_text = loader.get_template("detail.html").render(context)
+    with open(os.path.join(output_dir, "goods", str(sku_id) + ".html"), "w") as f:
+        f.write(html_text)
+
+
+def build(output_dir, goods_id_list):
+    builder = DetailPageBuilder(output_dir=output_dir)
+    builder.build_goods(goods_id_list)
+    return builder
+
+
+def measure(func):
+    start = time.time()
+    with CaptureQueriesContext(connection) as ctx:
+        result = func()
+    return time.time() - start, len(ctx.captured_queries), result
+
+
+if __name__ == '__main__':
+    sku_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    legacy_sample = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    legacy_dir = tempfile.mkdtemp(prefix="bench_detail_html_legacy_")
+    output_dir = tempfile.mkdtemp(prefix="bench_detail_html_")
+    for path in (legacy_dir, output_dir):
+        os.mkdir(os.path.join(path, "goods"))
+
+    try:
+        with transaction.atomic():
+            start = time.time()
+            goods_id_list, sku_id_list = create_catalog(sku_count)
+            print("synthetic catalog: goods=%d skus=%d (%.1fs)" % (
+                len(goods_id_list), len(sku_id_list), time.time() - start))
+
+            sample = sku_id_list[:legacy_sample]
+            cost, queries, _ = measure(lambda: [legacy_generate(sku_id, legacy_dir) for sku_id in sample])
+            ratio = len(sku_id_list) / len(sample)
+            print("legacy : %d skus %.2fs %d queries, estimated for all: %.1fs %d queries" % (
+                len(sample), cost, queries, cost * ratio, queries * ratio))
+
+            for name in ("builder", "rebuild"):
+                cost, queries, builder = measure(lambda: build(output_dir, goods_id_list))
+                print("%-7s: %d skus %.2fs %d queries, written=%d skipped=%d" % (
+                    name, builder.rendered, cost, queries, builder.written, builder.skipped))
+
+            raise Rollback
+    except Rollback:
+        pass
+    print("output: %s %s" % (legacy_dir, output_dir))
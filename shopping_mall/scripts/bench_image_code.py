@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+功能：测试图片验证码接口每秒处理的请求数，对比请求中生成验证码和从验证码池取出验证码
+使用方法:
+    ./bench_image_code.py [requests]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import time
+import uuid
+
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from verifications import constants
+from verifications.captcha_pool import CAPTCHA_REFILL_FLAG_KEY, fill_captcha_pool, get_pool_connection
+from verifications.views import ImageCodeView
+
+
+def bench(count):
+    """请求count次图片验证码接口，返回每秒请求数"""
+    view = ImageCodeView.as_view()
+    factory = APIRequestFactory()
+    start = time.time()
+    for _ in range(count):
+        image_code_id = str(uuid.uuid4())
+        response = view(factory.get("/image_codes/%s/" % image_code_id), image_code_id=image_code_id)
+        assert response.status_code == 200
+    return count / (time.time() - start)
+
+
+if __name__ == '__main__':
+    count = min(int(sys.argv[1]) if len(sys.argv) > 1 else 500, constants.CAPTCHA_POOL_SIZE)
+
+    with override_settings(CAPTCHA_POOL_ENABLED=False):
+        inline = bench(count)
+    print("inline: %8.1f req/s" % inline)
+
+    redis_conn = get_pool_connection()
+    # 测试期间不调度celery补充任务，只使用预先生成的验证码
+    redis_conn.set(CAPTCHA_REFILL_FLAG_KEY, 1, ex=3600)
+    try:
+        start = time.time()
+        added = fill_captcha_pool(count)
+        print("fill:   %8.1f captchas/s (%d)" % (added / (time.time() - start), added))
+        with override_settings(CAPTCHA_POOL_ENABLED=True):
+            pooled = bench(count)
+        print("pool:   %8.1f req/s (%.1fx)" % (pooled, pooled / inline))
+    finally:
+        redis_conn.delete(CAPTCHA_REFILL_FLAG_KEY)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""
+功能：模拟N个用户同时抢购同一个SKU，对比下单扣库存的吞吐量
+    legacy: 原来的 get + 乐观锁update 循环重试，逐条保存
+    batch:  orders.utils.reserve_stock 一条条件更新语句扣减
+    hot:    orders.hot_stock 在redis中预扣，结束后同步回数据库
+    测试结束后恢复该SKU及其SPU的库存和销量
+使用方法:
+    ./bench_order_contention.py <sku_id> [buyers] [count]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import threading
+import time
+
+from django.db import connection, transaction
+
+from goods.models import SKU, Goods
+from orders import hot_stock
+from orders.utils import reserve_stock, incr_goods_sales, get_skus, StockNotEnough
+
+
+def legacy_buy(sku_id, count, stats):
+    """原来的乐观锁下单方式"""
+    while True:
+        sku = SKU.objects.get(id=sku_id)
+        origin_stock = sku.stock
+        origin_sales = sku.sales
+        if count > origin_stock:
+            raise StockNotEnough
+        ret = SKU.objects.filter(id=sku.id, stock=origin_stock).update(
+            stock=origin_stock - count, sales=origin_sales + count)
+        if ret == 0:
+            stats["retries"] += 1
+            continue
+        sku.goods.sales += count
+        sku.goods.save()
+        break
+
+
+def batch_buy(sku_id, count, stats):
+    """批量条件更新的下单方式"""
+    cart = {sku_id: count}
+    skus = reserve_stock(cart)
+    incr_goods_sales(skus, cart)
+
+
+def hot_buy(sku_id, count, stats):
+    """热点商品在redis中预扣的下单方式"""
+    cart = {sku_id: count}
+    try:
+        hot_stock.reserve_hot_stock(cart)
+    except hot_stock.HotStockNotEnough:
+        raise StockNotEnough
+    get_skus([sku_id])
+
+
+def buyer(func, sku_id, count, barrier, stats, lock):
+    barrier.wait()
+    local = {"retries": 0}
+    try:
+        with transaction.atomic():
+            func(sku_id, count, local)
+    except StockNotEnough:
+        result = "sold_out"
+    except Exception as e:
+        result = "error"
+        print(e)
+    else:
+        result = "ok"
+    finally:
+        connection.close()
+    with lock:
+        stats[result] += 1
+        stats["retries"] += local["retries"]
+
+
+def run(name, func, sku_id, buyers, count):
+    stats = {"ok": 0, "sold_out": 0, "error": 0, "retries": 0}
+    barrier = threading.Barrier(buyers)
+    lock = threading.Lock()
+    threads = [threading.Thread(target=buyer, args=(func, sku_id, count, barrier, stats, lock))
+               for _ in range(buyers)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cost = time.time() - start
+    print("%-7s buyers=%d ok=%d sold_out=%d error=%d retries=%d cost=%.3fs orders/s=%.1f" % (
+        name, buyers, stats["ok"], stats["sold_out"], stats["error"], stats["retries"],
+        cost, stats["ok"] / cost))
+
+
+if __name__ == '__main__':
+    sku_id = int(sys.argv[1])
+    buyers = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    sku = SKU.objects.get(id=sku_id)
+    origin = (sku.stock, sku.sales, sku.goods.sales)
+    try:
+        for name, func in (("legacy", legacy_buy), ("batch", batch_buy), ("hot", hot_buy)):
+            # 库存只够一半的人买到，同时覆盖抢购成功和售罄两种情况
+            SKU.objects.filter(id=sku_id).update(stock=buyers * count // 2)
+            if func is hot_buy:
+                hot_stock.enable_hot_stock([sku_id])
+            run(name, func, sku_id, buyers, count)
+            if func is hot_buy:
+                hot_stock.disable_hot_stock([sku_id])
+            sku.refresh_from_db()
+            print("%-7s remaining stock=%d" % (name, sku.stock))
+    finally:
+        SKU.objects.filter(id=sku_id).update(stock=origin[0], sales=origin[1])
+        Goods.objects.filter(id=sku.goods_id).update(sales=origin[2])
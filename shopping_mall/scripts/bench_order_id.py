@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""
+功能：订单号生成器多进程压力测试，统计每秒生成数量（不重复的检查见 orders.tests）
+使用方法:
+    ./bench_order_id.py [processes] [ids_per_process]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import time
+import threading
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def generate(args):
+    worker_id, count = args
+    generator = import_string(settings.ORDER_ID_GENERATOR)(worker_id)
+
+    # 每个进程内再用多个线程同时生成，覆盖线程安全
+    results = [[] for _ in range(4)]
+
+    def run(out):
+        for _ in range(count // len(results)):
+            out.append(generator.next_id())
+
+    threads = [threading.Thread(target=run, args=(out,)) for out in results]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cost = time.time() - start
+
+    ids = [order_id for out in results for order_id in out]
+    for out in results:
+        assert out == sorted(out), "同一线程内的订单号无序"
+    return ids, cost
+
+
+if __name__ == '__main__':
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    with Pool(processes) as pool:
+        results = pool.map(generate, [(worker_id, count) for worker_id in range(processes)])
+
+    all_ids = [order_id for ids, _ in results for order_id in ids]
+    unique = len(set(all_ids))
+    max_len = max(len(order_id) for order_id in all_ids)
+    for worker_id, (ids, cost) in enumerate(results):
+        print("worker %4d: %d ids in %.3fs, %.0f ids/s" % (worker_id, len(ids), cost, len(ids) / cost))
+    print("total=%d unique=%d max_length=%d" % (len(all_ids), unique, max_len))
+    if unique != len(all_ids):
+        print("FAILED: duplicated order ids")
+        sys.exit(1)
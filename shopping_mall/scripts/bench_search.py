@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+"""
+功能：在进程内搜索后端中建立合成的sku索引，测试搜索、过滤、分面统计和排序的耗时，不需要elasticsearch和数据库
+    同时测试更新一个文档后第一次查询的耗时（缓存的字段值、排序等数据增量更新，BM25得分重新计算）
+    指定max_ms时，任一查询的p95耗时超过max_ms毫秒则以状态码1退出，用于检查搜索性能是否退化
+使用方法:
+    ./bench_search.py [docs] [rounds] [max_ms]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+# 使用进程内的搜索后端
+os.environ["SEARCH_ENGINE"] = "local"
+
+import django
+django.setup()
+
+import random
+import time
+from decimal import Decimal
+
+from haystack import connections
+from haystack.query import SearchQuerySet
+
+from goods import constants
+from goods.models import SKU, Goods
+
+BRANDS = ["Apple", "华为", "小米", "OPPO", "vivo", "联想", "戴尔", "索尼", "三星", "荣耀"]
+PRODUCTS = ["手机", "笔记本电脑", "平板电脑", "蓝牙耳机", "智能手表", "显示器", "机械键盘", "鼠标", "路由器", "移动电源"]
+COLORS = ["黑色", "白色", "金色", "银色", "蓝色", "红色"]
+SPECS = ["64GB", "128GB", "256GB", "8GB+256GB", "16GB+512GB", "Pro", "Max", "Lite"]
+
+
+def make_skus(count):
+    """合成的sku对象，只在内存中，不写数据库"""
+    rand = random.Random(0)
+    goods = [Goods(id=i, brand_id=i % len(BRANDS) + 1) for i in range(count // 4 + 1)]
+    skus = []
+    for i in range(count):
+        spu = goods[i // 4]
+        brand = BRANDS[spu.brand_id - 1]
+        product = PRODUCTS[i // 4 % len(PRODUCTS)]
+        sku = SKU(id=i + 1, name="%s %s %s %s" % (brand, product, rand.choice(SPECS), rand.choice(COLORS)),
+                  caption="%s新品%s" % (brand, product), category_id=100 + i // 4 % len(PRODUCTS),
+                  price=Decimal(rand.randint(50, 9999)), sales=rand.randint(0, 10000),
+                  stock=rand.choice([0, 5, 100]), comments=rand.randint(0, 500), default_image_url="")
+        sku.goods = spu
+        skus.append(sku)
+    return skus
+
+
+def bench(name, build, rounds, before=None):
+    """
+    执行rounds次查询，返回p95耗时（毫秒）
+    :param before: 每次查询前执行的函数，不计入耗时
+    """
+    costs = []
+    for i in range(rounds):
+        if before is not None:
+            before(i)
+        start = time.time()
+        sqs = build()
+        results = list(sqs[0:10])
+        sqs.count()
+        costs.append((time.time() - start) * 1000)
+    costs.sort()
+    p50 = costs[len(costs) // 2]
+    p95 = costs[min(len(costs) - 1, int(len(costs) * 0.95))]
+    print("%-48s p50 %7.2fms  p95 %7.2fms  hits=%d results=%d" % (name, p50, p95, sqs.count(), len(results)))
+    return p95
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    max_ms = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    index = connections["default"].get_unified_index().get_index(SKU)
+    backend = connections["default"].get_backend()
+    start = time.time()
+    backend.clear()
+    skus = make_skus(count)
+    for i in range(0, len(skus), 1000):
+        backend.update(index, skus[i:i + 1000])
+    print("indexed %d docs in %.1fs" % (count, time.time() - start))
+
+    def base():
+        return SearchQuerySet().models(SKU)
+
+    def facets(sqs):
+        for field in constants.SEARCH_FACET_FIELDS:
+            sqs = sqs.facet(field)
+        return sqs
+
+    cases = [
+        ("text", lambda: base().filter(content="手机")),
+        ("text single char", lambda: base().filter(content="机")),
+        ("text latin", lambda: base().filter(content="apple pro")),
+        ("text + category", lambda: base().filter(content="华为").filter(category=100)),
+        ("text + price range", lambda: base().filter(content="手机").filter(
+            price_value__gte=1000, price_value__lt=2000)),
+        ("text + in stock + brand", lambda: base().filter(content="电脑").filter(in_stock=True).filter(brand=2)),
+        ("text + exclude brand", lambda: base().filter(content="手机").exclude(brand=1)),
+        ("text + facets", lambda: facets(base().filter(content="手机"))),
+        ("text + sort by -sales", lambda: base().filter(content="手机").order_by("-sales")),
+        ("text + price + facets + sort", lambda: facets(base().filter(content="手机").filter(
+            price_value__gte=500).order_by("price_value"))),
+        ("filters only + facets", lambda: facets(base().filter(category=101).filter(in_stock=True))),
+    ]
+    # 第一次查询时计算并缓存字段值、排序等数据，不计入耗时
+    for name, build in cases:
+        list(build()[0:10])
+    slow = []
+    for name, build in cases:
+        if bench(name, build, rounds) > (max_ms if max_ms is not None else float("inf")):
+            slow.append(name)
+
+    def update_one(i):
+        """修改一个sku的销量后更新索引"""
+        sku = skus[i % len(skus)]
+        sku.sales += 1
+        backend.update(index, [sku])
+
+    for name, build in cases:
+        name = "%s (after update)" % name
+        if bench(name, build, rounds, update_one) > (max_ms if max_ms is not None else float("inf")):
+            slow.append(name)
+
+    sqs = facets(base().filter(content="手机"))
+    list(sqs[0:10])
+    for field, counts in sqs.facet_counts()["fields"].items():
+        print("facet %s: %s" % (field, counts[:5]))
+
+    if slow:
+        print("slower than %.1fms: %s" % (max_ms, ", ".join(slow)))
+        sys.exit(1)
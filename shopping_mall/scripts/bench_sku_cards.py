@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+功能：对比购物车页面商品数据的生成耗时
+    db:    原来的 SKU.objects.filter 查询后序列化
+    cache: goods.sku_cache 一次MGET批量读取sku卡片后序列化
+使用方法:
+    ./bench_sku_cards.py [items] [rounds]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import time
+
+from carts.serializers import CartSKUSerializer
+from goods.models import SKU
+from goods.sku_cache import get_sku_cards, invalidate_sku_cards
+from shopping_mall.utils import stats
+
+
+def render_db(cart):
+    skus = SKU.objects.filter(id__in=cart.keys())
+    for sku in skus:
+        sku.count = cart[sku.id]["count"]
+        sku.selected = cart[sku.id]["selected"]
+    return CartSKUSerializer(skus, many=True).data
+
+
+def render_cache(cart):
+    cards = get_sku_cards(cart.keys())
+    skus = []
+    for sku_id in sorted(cards):
+        card = cards[sku_id]
+        card["count"] = cart[sku_id]["count"]
+        card["selected"] = cart[sku_id]["selected"]
+        skus.append(card)
+    return CartSKUSerializer(skus, many=True).data
+
+
+def bench(func, cart, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        func(cart)
+    return (time.time() - start) / rounds * 1000
+
+
+if __name__ == '__main__':
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    sku_id_list = list(SKU.objects.filter(is_launched=True).values_list("id", flat=True)[:items])
+    cart = {sku_id: {"count": 1, "selected": True} for sku_id in sku_id_list}
+    assert [dict(d) for d in render_db(cart)] == [dict(d) for d in render_cache(cart)]
+
+    invalidate_sku_cards(sku_id_list)
+    start = time.time()
+    render_cache(cart)
+    print("cache cold: %.2f ms" % ((time.time() - start) * 1000))
+
+    print("db:         %.2f ms/render (%d items)" % (bench(render_db, cart, rounds), len(cart)))
+    print("cache warm: %.2f ms/render (%d items)" % (bench(render_cache, cart, rounds), len(cart)))
+
+    counters = stats.get_counters()
+    hits, misses = counters.get("sku_card.hit", 0), counters.get("sku_card.miss", 0)
+    if hits + misses:
+        print("sku_card hit rate: %.1f%%" % (hits * 100.0 / (hits + misses)))
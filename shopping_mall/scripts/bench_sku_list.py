@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""
+功能：在合成的分类商品数据上对比分类商品列表深分页的耗时，结束后回滚合成数据
+    page:   页码分页，OFFSET随页数增加
+    cursor: 游标分页，按 (排序字段, id) 定位，耗时与页数无关
+使用方法:
+    ./bench_sku_list.py [skus] [rounds]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import time
+from urllib.parse import urlparse, parse_qs
+
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from bench_detail_html import create_catalog, Rollback
+from goods.models import SKU
+from goods.sku_cache import invalidate_category_sku_count
+from goods.views import SKUListView
+from shopping_mall.utils.pagination import KeysetPagination
+
+PAGE_SIZE = 10
+PAGES = (1, 10, 100, 1000)
+ORDERINGS = ("-create_time", "price", "-sales")
+
+
+def request(category_id, params):
+    response = SKUListView.as_view()(APIRequestFactory().get("/categories/%s/skus/" % category_id, params),
+                                     category_id=category_id)
+    assert response.status_code == 200, response.data
+    return response
+
+
+def bench(category_id, params, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        request(category_id, params)
+    return (time.time() - start) / rounds * 1000
+
+
+def cursor_of_page(category_id, ordering, page):
+    """第page页的游标，即上一页最后一条记录的位置"""
+    if page == 1:
+        return ""
+    name = ordering.lstrip("-")
+    field = SKU._meta.get_field(name)
+    last = SKU.objects.filter(category_id=category_id, is_launched=True).order_by(
+        ordering, "-id" if ordering.startswith("-") else "id")[(page - 1) * PAGE_SIZE - 1]
+    return KeysetPagination.encode_cursor(ordering, field.value_to_string(last), last.id)
+
+
+if __name__ == '__main__':
+    sku_count = int(sys.argv[1]) if len(sys.argv) > 1 else PAGES[-1] * PAGE_SIZE + PAGE_SIZE
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    try:
+        with transaction.atomic():
+            goods_id_list, sku_id_list = create_catalog(sku_count)
+            category_id = SKU.objects.get(id=sku_id_list[0]).category_id
+            # 合成数据的价格和销量各不相同，也有相同值，覆盖按id区分的情况
+            for i, sku_id in enumerate(sku_id_list):
+                SKU.objects.filter(id=sku_id).update(price=100 + i % 500, sales=i % 97)
+            print("category %s: %d skus, page_size=%d" % (category_id, len(sku_id_list), PAGE_SIZE))
+
+            for ordering in ORDERINGS:
+                for page in PAGES:
+                    if (page - 1) * PAGE_SIZE >= len(sku_id_list):
+                        continue
+                    page_ms = bench(category_id, {"page": page, "page_size": PAGE_SIZE, "ordering": ordering}, rounds)
+                    cursor = cursor_of_page(category_id, ordering, page)
+                    cursor_ms = bench(category_id, {"cursor": cursor, "page_size": PAGE_SIZE, "ordering": ordering},
+                                      rounds)
+                    print("%-13s page %5d: page %.2fms  cursor %.2fms" % (ordering, page, page_ms, cursor_ms))
+
+            # 游标分页逐页遍历，检查没有重复和遗漏
+            for ordering in ORDERINGS:
+                seen = []
+                params = {"cursor": "", "page_size": PAGE_SIZE, "ordering": ordering}
+                while True:
+                    data = request(category_id, params).data
+                    seen.extend(item["id"] for item in data["results"])
+                    if not data["next"]:
+                        break
+                    params["cursor"] = parse_qs(urlparse(data["next"]).query)["cursor"][0]
+                ok = len(seen) == len(set(seen)) == len(sku_id_list)
+                print("%-13s walk: %d skus %s" % (ordering, len(seen), "ok" if ok else "FAILED"))
+
+            invalidate_category_sku_count([category_id])
+            raise Rollback
+    except Rollback:
+        pass
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""
+功能：启动本地模拟短信服务（fake_sms_server.py），测试短信发送每秒的短信数
+    对比 每条短信新建连接 / keep-alive连接池顺序发送 / 连接池并发发送 / 相同内容合并发送
+使用方法:
+    ./bench_sms.py [messages] [latency_ms] [pool_size]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import threading
+import time
+
+from django.conf import settings
+
+from fake_sms_server import FakeSMSServer
+from shopping_mall.utils.sms.providers import YuntongxunProvider
+from shopping_mall.utils.sms.sender import send_messages
+
+
+def bench(name, server, provider, messages, batch_size):
+    """每次发送batch_size条，返回每秒短信数"""
+    server.requests = server.messages = 0
+    start = time.time()
+    sent = 0
+    for i in range(0, len(messages), batch_size):
+        sent += send_messages(messages[i:i + batch_size], provider)[0]
+    rate = sent / (time.time() - start)
+    print("%-28s %8.1f msg/s  sent=%d requests=%d" % (name, rate, sent, server.requests))
+    provider.pool.close()
+    return rate
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    pool_size = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    server = FakeSMSServer(("127.0.0.1", 0), latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def provider(size):
+        # 压测不限速
+        options = dict(settings.SMS_PROVIDERS["yuntongxun"], RATE=None, POOL_SIZE=size,
+                       URL="http://127.0.0.1:%d" % server.server_port)
+        return YuntongxunProvider("bench", options)
+
+    codes = [{"to": "1%010d" % i, "datas": ["%06d" % (i % 1000000), 5], "temp_id": 1} for i in range(count)]
+    same = [{"to": "1%010d" % i, "datas": ["双十一大促", 5], "temp_id": 2} for i in range(count)]
+
+    bench("new connection, sequential", server, provider(0), codes, 1)
+    bench("keep-alive, sequential", server, provider(1), codes, 1)
+    bench("keep-alive pool, concurrent", server, provider(pool_size), codes, 100)
+    bench("same content, merged", server, provider(pool_size), same, 100)
+    server.shutdown()
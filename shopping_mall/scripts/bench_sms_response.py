@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""
+功能：用记录的云通讯模板短信响应测试响应解码的耗时，对比 xml流式解析 / json解析，
+    并检查解码结果与原来的 xmltojson 对这些响应的输出相同，不一致时以状态码1退出
+使用方法:
+    ./bench_sms_response.py [rounds]
+"""
+import sys
+sys.path.insert(0, "../")
+
+import time
+
+from shopping_mall.utils.yuntongxun.response import TEMPLATE_SMS_FIELDS, decode_response
+
+# 记录的响应
+RESPONSES = {
+    "xml success": b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>000000</statusCode>'
+                   b'<TemplateSMS><dateCreated>20190720105638</dateCreated>'
+                   b'<smsMessageSid>fc5e1d8c4c6e4a0e8b1a3c1f3e0b9a77</smsMessageSid></TemplateSMS></Response>',
+    "xml error": '<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>160040</statusCode>'
+                 '<statusMsg>验证码超出同模板同号码天发送上限</statusMsg></Response>'.encode(),
+    "json success": b'{"statusCode":"000000","templateSMS":{"dateCreated":"20190720105638",'
+                    b'"smsMessageSid":"fc5e1d8c4c6e4a0e8b1a3c1f3e0b9a77"}}',
+    "json error": '{"statusCode":"160040","statusMsg":"验证码超出同模板同号码天发送上限"}'.encode(),
+}
+
+
+# 原来的 xmltojson().main(data) 对上面的响应的输出（每个响应在新的进程中解码，xmltojson在多次调用间会残留字段）
+EXPECTED = {
+    "xml success": {"statusCode": "000000",
+                    "templateSMS": {"dateCreated": "20190720105638",
+                                    "smsMessageSid": "fc5e1d8c4c6e4a0e8b1a3c1f3e0b9a77"}},
+    "xml error": {"statusCode": "160040", "statusMsg": "验证码超出同模板同号码天发送上限"},
+    "json success": {"statusCode": "000000",
+                     "templateSMS": {"dateCreated": "20190720105638",
+                                     "smsMessageSid": "fc5e1d8c4c6e4a0e8b1a3c1f3e0b9a77"}},
+    "json error": {"statusCode": "160040", "statusMsg": "验证码超出同模板同号码天发送上限"},
+}
+
+
+def bench(name, decode, data, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        decode(data)
+    cost = (time.time() - start) / rounds * 1000000
+    print("%-14s %-8s %8.2fus" % (name, decode.__name__, cost))
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    def stream(data):
+        return decode_response(data, "xml", TEMPLATE_SMS_FIELDS)
+
+    def json(data):
+        return decode_response(data, "json")
+
+    mismatched = []
+    for name, data in RESPONSES.items():
+        decode = stream if name.startswith("xml") else json
+        if decode(data) != EXPECTED[name]:
+            mismatched.append(name)
+        bench(name, decode, data, rounds)
+
+    if mismatched:
+        print("decoded responses differ from xmltojson: %s" % ", ".join(mismatched))
+        sys.exit(1)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+
+"""
+功能：导出行政区划树为带版本号的静态json文件，行政区划数据修改后或部署时执行
+使用方法:
+    ./export_area_tree.py [output_dir]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+from areas.area_tree import export_area_tree, get_output_dir
+
+
+if __name__ == '__main__':
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    tree = export_area_tree(output_dir)
+    print("%d areas, %d bytes -> %s" % (len(tree.parents), len(tree.body),
+                                        os.path.join(get_output_dir(output_dir), tree.file_name)))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+功能：模拟云通讯模板短信接口的本地服务，支持keep-alive，用于压测短信发送，不真正发送短信
+    可以指定每个请求的处理延迟（模拟网络和服务商耗时）和返回HTTP 503的比例（发送端会重试）
+    配合环境变量 SMS_SERVER_URL=http://127.0.0.1:<port> 使用
+使用方法:
+    ./fake_sms_server.py [port] [latency_ms] [error_rate]
+"""
+import sys
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class FakeSMSServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0, error_rate=0):
+        HTTPServer.__init__(self, address, FakeSMSHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        # 收到的请求数和短信数
+        self.requests = 0
+        self.messages = 0
+
+
+class FakeSMSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和包体分开写入，keep-alive时避免nagle算法的延迟
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.requests += 1
+        if random.random() < self.server.error_rate:
+            self.reply(503, {"statusCode": "503", "statusMsg": "服务暂时不可用"})
+            return
+        try:
+            message = json.loads(body.decode())
+            mobiles = message["to"].split(",")
+        except (ValueError, KeyError):
+            self.reply(400, {"statusCode": "160031", "statusMsg": "参数格式错误"})
+            return
+        self.server.messages += len(mobiles)
+        self.reply(200, {"statusCode": "000000", "templateSMS": {
+            "dateCreated": time.strftime("%Y%m%d%H%M%S"), "smsMessageSid": uuid.uuid4().hex}})
+
+    def reply(self, status, result):
+        data = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8883
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    print("fake sms server on http://127.0.0.1:%d" % port)
+    FakeSMSServer(("127.0.0.1", port), latency, error_rate).serve_forever()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+"""
+功能：管理热点商品库存
+使用方法:
+    ./hot_stock.py enable <sku_id> [<sku_id> ...]    标记热点商品，库存镜像到redis
+    ./hot_stock.py disable <sku_id> [<sku_id> ...]   取消热点标记，扣减量同步回数据库
+    ./hot_stock.py flush                             立即把扣减量同步回数据库
+    ./hot_stock.py reconcile [--repair]              检查redis与mysql的库存偏差，--repair 以mysql为准修复
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import argparse
+
+from django.conf import settings
+
+from orders import hot_stock
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="热点商品库存管理")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    subparsers.add_parser("enable").add_argument("sku_ids", type=int, nargs="+")
+    subparsers.add_parser("disable").add_argument("sku_ids", type=int, nargs="+")
+    subparsers.add_parser("flush")
+    subparsers.add_parser("reconcile").add_argument("--repair", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "enable":
+        if not settings.HOT_STOCK_ENABLED:
+            print("HOT_STOCK_ENABLED is off, orders will not use redis stock")
+            sys.exit(1)
+        hot_stock.enable_hot_stock(args.sku_ids)
+    elif args.command == "disable":
+        hot_stock.disable_hot_stock(args.sku_ids)
+    elif args.command == "flush":
+        print("flushed %d skus" % hot_stock.flush_hot_stock())
+    else:
+        drifts = hot_stock.reconcile_hot_stock(repair=args.repair)
+        for sku_id, redis_stock, expected in drifts:
+            print("sku %s: redis=%s expected=%s%s" % (sku_id, redis_stock, expected,
+                                                     " (repaired)" if args.repair else ""))
+        print("%d drifted" % len(drifts))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+"""
+功能：把已登录用户的购物车从 cart_<user_id> 哈希 + cart_selected_<user_id> 集合
+     迁移到 carts.repository 使用的单个哈希 cart_v2_<user_id>
+     每个用户的迁移在一个lua脚本中原子完成，可以在线重复执行
+使用方法:
+    ./migrate_cart_layout.py
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import re
+
+from django_redis import get_redis_connection
+
+from carts.repository import migrate_user_cart
+
+
+if __name__ == '__main__':
+    redis_conn = get_redis_connection("cart")
+    pattern = re.compile(r"^cart_(\d+)$")
+    users = 0
+    items = 0
+    for key in redis_conn.scan_iter("cart_*", count=1000):
+        match = pattern.match(key.decode())
+        if not match:
+            continue
+        items += migrate_user_cart(redis_conn, match.group(1))
+        users += 1
+        if users % 1000 == 0:
+            print("migrated %d users" % users)
+    print("migrated %d users, %d items" % (users, items))
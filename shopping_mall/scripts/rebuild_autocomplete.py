@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+"""
+功能：从数据库重建sku名称自动补全索引，并测试几个前缀的查询耗时
+使用方法:
+    ./rebuild_autocomplete.py [prefix ...]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import time
+
+from goods import autocomplete
+
+ROUNDS = 100
+
+
+if __name__ == '__main__':
+    start = time.time()
+    autocomplete.build_prefix_index()
+    print("rebuilt in %.2fs" % (time.time() - start))
+
+    for prefix in sys.argv[1:] or ["a", "iphone", "华为"]:
+        start = time.time()
+        for _ in range(ROUNDS):
+            results = autocomplete.complete(prefix)
+        cost = (time.time() - start) / ROUNDS * 1000
+        print("%-16s %6.2fms  %s" % (prefix, cost, [item["name"] for item in results[:3]]))
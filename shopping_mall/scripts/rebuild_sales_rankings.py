@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+"""
+功能：从数据库全量重建分类sku销量排行，修正redis中累加产生的偏差（定时任务每天执行一次）
+使用方法:
+    ./rebuild_sales_rankings.py [category_id ...]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import time
+
+from goods import rankings
+
+
+if __name__ == '__main__':
+    start = time.time()
+    category_id_list = [int(category_id) for category_id in sys.argv[1:]]
+    if category_id_list:
+        for category_id in category_id_list:
+            rankings.build_sales_ranking(category_id)
+    else:
+        rankings.rebuild_sales_rankings()
+    print("rebuilt in %.2fs" % (time.time() - start))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""
+功能：全量重建sku搜索索引，按主键分块读取 SKUIndex.index_queryset，每块用bulk接口写入
+使用方法:
+    ./rebuild_search_index.py [--clear] [--batch-size N]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import argparse
+import time
+
+from haystack import connections
+
+from goods.models import SKU
+from shopping_mall.utils.search.signals import bump_index_version
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="全量重建sku搜索索引")
+    parser.add_argument("--clear", action="store_true", help="先清空索引中的sku，已下架的sku不会残留")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    index = connections["default"].get_unified_index().get_index(SKU)
+    backend = connections["default"].get_backend()
+    if args.clear:
+        backend.clear(models=[SKU])
+
+    start = time.time()
+    queryset = index.index_queryset().order_by("pk")
+    last_pk = 0
+    total = 0
+    while True:
+        # 按主键分块，不使用OFFSET，内存占用与总数无关
+        batch = list(queryset.filter(pk__gt=last_pk)[:args.batch_size])
+        if not batch:
+            break
+        backend.update(index, batch)
+        last_pk = batch[-1].pk
+        total += len(batch)
+        cost = time.time() - start
+        print("indexed %d docs (last pk %d) %.0f docs/s" % (total, last_pk, total / cost if cost else 0))
+
+    # 搜索结果缓存失效
+    bump_index_version()
+    print("done: %d docs in %.1fs" % (total, time.time() - start))
@@ -1,13 +1,15 @@
 #!/usr/bin/env python
 
 """
-功能：手动生成所有SKU的静态detail html文件
+功能：多进程生成所有SKU的静态detail html文件，内容未变化的文件不重写
+    SPU按id顺序分块交给进程池，同一SPU的SKU在同一进程中一起生成
+    每完成一块在检查点文件中记录一行，中断后用 --resume 跳过已完成的块，并重试失败的SPU
 使用方法:
-    ./regenerate_detail_html.py
+    ./regenerate_detail_html.py [--processes N] [--chunk-size N] [--checkpoint FILE] [--resume]
 """
 import sys
 sys.path.insert(0, '../')
-sys.path.insert(0, '../meiduo_mall/apps')
+sys.path.insert(0, '../shopping_mall/apps')
 
 import os
 if not os.getenv('DJANGO_SETTINGS_MODULE'):
@@ -16,89 +18,115 @@ if not os.getenv('DJANGO_SETTINGS_MODULE'):
 import django
 django.setup()
 
-from django.template import loader
-from django.conf import settings
-
-from goods.utils import get_categories
-from goods.models import SKU
-
-
-def generate_static_sku_detail_html(sku_id):
-    """
-    生成静态商品详情页面
-    :param sku_id: 商品sku id
-    """
-    # 商品分类菜单
-    categories = get_categories()
-
-    # 获取当前sku的信息
-    sku = SKU.objects.get(id=sku_id)
-    sku.images = sku.skuimage_set.all()
-
-    # 面包屑导航信息中的频道
-    goods = sku.goods
-    goods.channel = goods.category1.goodschannel_set.all()[0]
-
-    # 构建当前商品的规格键
-    sku_specs = sku.skuspecification_set.order_by('spec_id')
-    sku_key = []
-    for spec in sku_specs:
-        sku_key.append(spec.option.id)
-
-    # 获取当前商品的所有SKU
-    skus = goods.sku_set.all()
-
-    # 构建不同规格参数（选项）的sku字典
-    # spec_sku_map = {
-    #     (规格1参数id, 规格2参数id, 规格3参数id, ...): sku_id,
-    #     (规格1参数id, 规格2参数id, 规格3参数id, ...): sku_id,
-    #     ...
-    # }
-    spec_sku_map = {}
-    for s in skus:
-        # 获取sku的规格参数
-        s_specs = s.skuspecification_set.order_by('spec_id')
-        # 用于形成规格参数-sku字典的键
-        key = []
-        for spec in s_specs:
-            key.append(spec.option.id)
-        # 向规格参数-sku字典添加记录
-        spec_sku_map[tuple(key)] = s.id
-
-    # 获取当前商品的规格信息
-    specs = goods.goodsspecification_set.order_by('id')
-    # 若当前sku的规格信息不完整，则不再继续
-    if len(sku_key) < len(specs):
-        return
-    for index, spec in enumerate(specs):
-        # 复制当前sku的规格键
-        key = sku_key[:]
-        # 该规格的选项
-        options = spec.specificationoption_set.all()
-        for option in options:
-            # 在规格参数sku字典中查找符合当前规格的sku
-            key[index] = option.id
-            option.sku_id = spec_sku_map.get(tuple(key))
-
-        spec.options = options
-
-    # 渲染模板，生成静态html文件
-    context = {
-        'categories': categories,
-        'goods': goods,
-        'specs': specs,
-        'sku': sku
-    }
-
-    template = loader.get_template('detail.html')
-    html_text = template.render(context)
-    file_path = os.path.join(settings.GENERATED_STATIC_HTML_FILES_DIR, 'goods/'+str(sku_id)+'.html')
-    with open(file_path, 'w') as f:
-        f.write(html_text)
+import argparse
+import json
+import time
+from multiprocessing import Pool, cpu_count
+
+from django.db import connections
+
+from goods import constants
+from goods.detail_html import DetailPageBuilder
+from goods.models import Goods
+
+# 每个进程一个生成器，分类菜单和模板每个进程只加载一次
+builder = None
+
+
+def init_worker():
+    global builder
+    # 不使用父进程继承来的数据库连接
+    connections.close_all()
+    builder = DetailPageBuilder()
+
+
+def build_chunk(goods_id_list):
+    """生成一块SPU的详情页，返回 (SPU id列表, 生成页面数, 写入页面数, 失败的SPU id列表)"""
+    rendered, written, failed = builder.rendered, builder.written, len(builder.failed)
+    try:
+        builder.build_goods(goods_id_list)
+    except Exception as e:
+        print('chunk %s-%s failed: %s' % (goods_id_list[0], goods_id_list[-1], e))
+        return goods_id_list, 0, 0, goods_id_list
+    return (goods_id_list, builder.rendered - rendered, builder.written - written,
+            builder.failed[failed:])
+
+
+def load_checkpoint(path):
+    """读取检查点，返回已完成的SPU id区间列表和其中失败的SPU id集合"""
+    done, failed = [], set()
+    if not os.path.exists(path):
+        return done, failed
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            done.append((record['first'], record['last']))
+            # 区间内之前失败的SPU都在这一块中重试过了
+            failed = {goods_id for goods_id in failed if not record['first'] <= goods_id <= record['last']}
+            failed.update(record['failed'])
+    return done, failed
+
+
+def iter_chunks(chunk_size, done, failed):
+    """按id顺序分块，跳过检查点中已完成且未失败的SPU，每次按id范围查询一批，不一次取出全部id"""
+    chunk = []
+    last_id = 0
+    while True:
+        goods_id_list = list(Goods.objects.filter(id__gt=last_id).order_by('id')
+                             .values_list('id', flat=True)[:chunk_size])
+        if not goods_id_list:
+            break
+        last_id = goods_id_list[-1]
+        for goods_id in goods_id_list:
+            if goods_id not in failed and any(first <= goods_id <= last for first, last in done):
+                continue
+            chunk.append(goods_id)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
 
 
 if __name__ == '__main__':
-    skus = SKU.objects.all()
-    for sku in skus:
-        print(sku.id)
-        generate_static_sku_detail_html(sku.id)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='生成所有SKU的静态详情页')
+    parser.add_argument('--processes', type=int, default=cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=constants.DETAIL_HTML_CHUNK_SIZE)
+    parser.add_argument('--checkpoint', default='regenerate_detail_html.checkpoint')
+    parser.add_argument('--resume', action='store_true', help='跳过检查点中已完成的SPU')
+    args = parser.parse_args()
+
+    if args.resume:
+        done, failed = load_checkpoint(args.checkpoint)
+    else:
+        done, failed = [], set()
+        open(args.checkpoint, 'w').close()
+
+    # 进程池在后台线程中边生成分块边分发，不预先取出全部SPU id，进度按SPU总数估计
+    total = Goods.objects.count()
+    connections.close_all()
+
+    start = time.time()
+    pages = written = goods_count = 0
+    failures = []
+    with Pool(args.processes, initializer=init_worker) as pool, open(args.checkpoint, 'a') as checkpoint:
+        for index, (goods_id_list, chunk_pages, chunk_written, chunk_failed) in enumerate(
+                pool.imap_unordered(build_chunk, iter_chunks(args.chunk_size, done, failed)), 1):
+            goods_count += len(goods_id_list)
+            pages += chunk_pages
+            written += chunk_written
+            failures.extend(chunk_failed)
+            checkpoint.write(json.dumps({'first': goods_id_list[0], 'last': goods_id_list[-1],
+                                         'failed': chunk_failed}) + '\n')
+            checkpoint.flush()
+
+            cost = time.time() - start
+            print('chunk %d: goods=%d/%d pages=%d written=%d failed=%d %.0f pages/s' % (
+                index, goods_count, total, pages, written, len(failures), pages / cost if cost else 0))
+
+    cost = time.time() - start
+    print('done: pages=%d written=%d skipped=%d cost=%.1fs %.0f pages/s' % (
+        pages, written, pages - written, cost, pages / cost if cost else 0))
+    if failures:
+        print('failed goods: %s' % ' '.join(str(goods_id) for goods_id in sorted(failures)))
+        sys.exit(1)
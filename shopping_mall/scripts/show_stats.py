@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+"""
+功能：查看各阶段耗时（次数、平均、p50/p95/p99，单位毫秒）和计数器
+使用方法:
+    ./show_stats.py [--reset]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+from shopping_mall.utils import stats
+
+
+if __name__ == '__main__':
+    if "--reset" in sys.argv:
+        stats.reset_stats()
+        sys.exit(0)
+
+    print("%-30s %10s %10s %8s %8s %8s" % ("stage", "count", "avg", "p50", "p95", "p99"))
+    for stage in stats.get_latency_stages():
+        s = stats.get_latency_summary(stage)
+        print("%-30s %10d %10.2f %8s %8s %8s" % (stage, s["count"], s["avg"], s["p50"], s["p95"], s["p99"]))
+
+    counters = stats.get_counters()
+    if counters:
+        print()
+        for name in sorted(counters):
+            print("%-30s %10d" % (name, counters[name]))
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+"""
+功能：查看最终发送失败的短信（死信），--requeue 把死信中的短信重新加入发送队列（已失效的死信丢弃）
+使用方法:
+    ./sms_dead_letter.py [count] [--requeue]
+"""
+import sys
+sys.path.insert(0, "../")
+sys.path.insert(0, "../shopping_mall/apps")
+
+import os
+if not os.getenv("DJANGO_SETTINGS_MODULE"):
+    os.environ["DJANGO_SETTINGS_MODULE"] = "shopping_mall.settings.dev"
+
+import django
+django.setup()
+
+import time
+
+from shopping_mall.utils.sms import sender
+
+
+if __name__ == '__main__':
+    if "--requeue" in sys.argv:
+        print("requeued %d messages, dropped %d expired" % sender.requeue_dead_letters())
+        sys.exit(0)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    for letter in sender.get_dead_letters(count):
+        print("%s  %-10s to=%s temp_id=%s attempts=%s error=%s" % (
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(letter["time"])), letter["provider"],
+            ",".join(letter["to"]), letter["temp_id"], letter["attempts"], letter["error"]))
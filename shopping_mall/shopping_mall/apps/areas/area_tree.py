@@ -0,0 +1,155 @@
+"""
+行政区划树
+
+一条sql查出所有行政区划，导出为一个紧凑的json文件 areas/tree.<版本号>.json，版本号为内容的md5，
+内容不变时版本号不变，可以长期缓存；areas/manifest.json 记录当前版本的文件名
+json格式: [[省id, 省名, [[市id, 市名, [[区id, 区名], ...]], ...]], ...]，没有下级的行政区划不带第三项
+进程内保存一份只读的行政区划表，地址的省市区校验不查询数据库；manifest修改后重新读取，
+没有导出文件时从数据库构建，AREA_TREE_BUILD_EXPIRES 秒后重新构建
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+
+from areas import constants
+from areas.models import Area
+
+logger = logging.getLogger("django")
+
+MANIFEST_NAME = "manifest.json"
+
+# 进程内缓存的 manifest修改时间、行政区划树、过期时间（读取导出文件时为None）
+_local = {"mtime": None, "tree": None, "expires": None}
+_local_lock = threading.Lock()
+
+
+def build_area_tree():
+    """从数据库构建行政区划树，格式见模块说明"""
+    children = {}
+    for area_id, name, parent_id in Area.objects.order_by("id").values_list("id", "name", "parent_id"):
+        children.setdefault(parent_id, []).append([area_id, name])
+
+    def attach(areas):
+        for area in areas:
+            subs = children.get(area[0])
+            if subs:
+                area.append(attach(subs))
+        return areas
+    return attach(children.get(None, []))
+
+
+def dump_area_tree(tree):
+    return json.dumps(tree, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class AreaTree(object):
+    """导出的行政区划树，创建后不再修改，可以在线程间共享"""
+
+    def __init__(self, body):
+        # 导出的json
+        self.body = body
+        self.version = hashlib.md5(body).hexdigest()[:12]
+        # {行政区划id: 上级id}，省的上级为None
+        parents = {}
+
+        def collect(areas, parent_id):
+            for area in areas:
+                parents[area[0]] = parent_id
+                if len(area) > 2:
+                    collect(area[2], area[0])
+        collect(json.loads(body.decode()), None)
+        self.parents = MappingProxyType(parents)
+
+    @property
+    def file_name(self):
+        return "tree.%s.json" % self.version
+
+    def is_valid_address(self, province_id, city_id, district_id):
+        """省市区是否存在且依次从属"""
+        return (self.parents.get(province_id, 0) is None
+                and self.parents.get(city_id) == province_id
+                and self.parents.get(district_id) == city_id)
+
+
+def get_output_dir(output_dir=None):
+    return os.path.join(output_dir or settings.GENERATED_STATIC_HTML_FILES_DIR, constants.AREA_TREE_DIR)
+
+
+def _write(file_path, body):
+    """先写临时文件再改名，不会读到写了一半的文件"""
+    tmp_path = "%s.%d.tmp" % (file_path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, file_path)
+
+
+def export_area_tree(output_dir=None):
+    """
+    从数据库导出行政区划树，内容没有变化时不改写文件
+    :return: AreaTree
+    """
+    tree = AreaTree(dump_area_tree(build_area_tree()))
+    output_dir = get_output_dir(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, tree.file_name)
+    if not os.path.exists(file_path):
+        _write(file_path, tree.body)
+    manifest = json.dumps({"version": tree.version, "file": tree.file_name}).encode()
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "rb") as f:
+            changed = f.read() != manifest
+    except FileNotFoundError:
+        changed = True
+    if changed:
+        _write(manifest_path, manifest)
+    return tree
+
+
+def load_area_tree(output_dir=None):
+    """读取当前版本的行政区划文件，没有导出过时返回None"""
+    output_dir = get_output_dir(output_dir)
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "rb") as f:
+            manifest = json.loads(f.read().decode())
+        with open(os.path.join(output_dir, manifest["file"]), "rb") as f:
+            return AreaTree(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def get_area_tree():
+    """
+    获取行政区划树
+    读取导出的文件，manifest修改后重新读取；没有导出过或文件损坏时从数据库构建，过期后重新构建
+    """
+    try:
+        mtime = os.stat(os.path.join(get_output_dir(), MANIFEST_NAME)).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    now = time.time()
+    with _local_lock:
+        if (_local["tree"] is not None and _local["mtime"] == mtime
+                and (_local["expires"] is None or _local["expires"] > now)):
+            return _local["tree"]
+
+    tree = None
+    if mtime is not None:
+        try:
+            tree = load_area_tree()
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            # manifest或行政区划文件损坏、不完整
+            logger.error("读取行政区划文件[异常][ message: %s ]" % e)
+    expires = None
+    if tree is None:
+        tree = AreaTree(dump_area_tree(build_area_tree()))
+        expires = now + constants.AREA_TREE_BUILD_EXPIRES
+    with _local_lock:
+        _local["mtime"], _local["tree"], _local["expires"] = mtime, tree, expires
+    return tree
@@ -0,0 +1,8 @@
+# 行政区划静态文件所在的目录，相对于静态文件目录
+AREA_TREE_DIR = "areas"
+
+# 带版本号的行政区划文件的缓存时间，内容变化后版本号随之变化，可以一直缓存
+AREA_TREE_MAX_AGE = 365 * 24 * 60 * 60
+
+# 没有导出文件（或文件损坏）时从数据库构建的行政区划树在进程内的缓存时间，单位秒
+AREA_TREE_BUILD_EXPIRES = 10 * 60
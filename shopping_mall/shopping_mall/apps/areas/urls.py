@@ -1,3 +1,4 @@
+from django.conf.urls import url
 from rest_framework.routers import DefaultRouter
 
 from areas import views
@@ -6,6 +7,9 @@ from areas import views
 router = DefaultRouter()
 router.register("areas", views.AreasViewSet,base_name="areas")
 
-urlpatterns = []
+urlpatterns = [
+    url(r"^areas/tree/$", views.AreaTreeView.as_view()),
+    url(r"^areas/tree/(?P<version>[0-9a-f]+)\.json$", views.AreaTreeView.as_view()),
+]
 
 urlpatterns += router.urls
\ No newline at end of file
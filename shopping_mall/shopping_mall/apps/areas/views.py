@@ -1,9 +1,13 @@
 from django.shortcuts import render
 
 # Create your views here.
+from django.http import HttpResponse, HttpResponseNotModified, Http404
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from rest_framework_extensions.cache.mixins import CacheResponseMixin
 
+from areas import constants
+from areas.area_tree import get_area_tree
 from areas.models import Area
 from areas.serializers import AreaSerializer, SubAreaSerializer
 
@@ -24,4 +28,30 @@ class AreasViewSet(CacheResponseMixin, ReadOnlyModelViewSet):
         if self.action == "list":
             return AreaSerializer
         else:
-            return SubAreaSerializer
\ No newline at end of file
+            return SubAreaSerializer
+
+
+# /areas/tree/  /areas/tree/<version>.json
+class AreaTreeView(APIView):
+    """
+    整个行政区划树，地址表单一次请求取得所有省市区，格式见 areas.area_tree
+    不带版本号时每次用ETag确认是否有更新，带版本号时可以一直缓存
+    """
+
+    def get(self, request, version=None):
+        tree = get_area_tree()
+        etag = '"%s"' % tree.version
+        if version is not None:
+            if version != tree.version:
+                raise Http404
+            cache_control = "public, max-age=%d, immutable" % constants.AREA_TREE_MAX_AGE
+        else:
+            cache_control = "no-cache"
+
+        if request.META.get("HTTP_IF_NONE_MATCH") == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(tree.body, content_type="application/json; charset=utf-8")
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
@@ -0,0 +1,111 @@
+"""
+未登录用户购物车cookie的编解码
+
+格式: base64url( 版本(1字节) + 商品数据 + HMAC-SHA256前16字节 )
+商品数据按sku_id升序，每个商品两个varint：
+    sku_id与上一个sku_id的差值
+    count << 1 | selected
+cookie由服务端签名，不再反序列化客户端可控的pickle数据
+升级前的pickle+base64格式的cookie不会被解析，视为空购物车（未登录用户升级前加入的商品不保留），
+查询购物车时删除这样的cookie，见 is_stale_cookie
+"""
+import base64
+import hashlib
+import hmac
+
+from django.conf import settings
+
+from carts import constants
+
+CART_CODEC_VERSION = 1
+SIGNATURE_LENGTH = 16
+
+
+class CartCookieTooLarge(Exception):
+    """购物车cookie超出大小限制"""
+    pass
+
+
+def _sign(data):
+    key = hashlib.sha256(("carts.codec" + settings.SECRET_KEY).encode()).digest()
+    return hmac.new(key, data, hashlib.sha256).digest()[:SIGNATURE_LENGTH]
+
+
+def _write_varint(buf, value):
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("varint过长")
+
+
+def encode_cart(cart):
+    """
+    购物车数据编码为cookie字符串
+    :param cart: {sku_id: {"count": count, "selected": selected}}
+    :return: cookie字符串
+    """
+    buf = bytearray([CART_CODEC_VERSION])
+    last_id = 0
+    for sku_id in sorted(cart):
+        item = cart[sku_id]
+        _write_varint(buf, sku_id - last_id)
+        _write_varint(buf, (int(item["count"]) << 1) | (1 if item["selected"] else 0))
+        last_id = sku_id
+    buf += _sign(bytes(buf))
+
+    cookie = base64.urlsafe_b64encode(bytes(buf)).rstrip(b"=").decode()
+    if len(cookie) > constants.CART_COOKIE_MAX_LENGTH:
+        raise CartCookieTooLarge
+    return cookie
+
+
+def is_stale_cookie(cookie, cart):
+    """cookie存在但无法解码（如升级前的pickle格式、签名错误），需要删除"""
+    return bool(cookie) and not cart
+
+
+def decode_cart(cookie):
+    """
+    解码cookie中的购物车数据，签名错误、版本不符或格式错误时视为空购物车
+    :param cookie: cookie字符串
+    :return: {sku_id: {"count": count, "selected": selected}}
+    """
+    if not cookie or len(cookie) > constants.CART_COOKIE_MAX_LENGTH:
+        return {}
+    try:
+        data = base64.urlsafe_b64decode(cookie + "=" * (-len(cookie) % 4))
+    except (ValueError, TypeError):
+        return {}
+
+    if len(data) < 1 + SIGNATURE_LENGTH or data[0] != CART_CODEC_VERSION:
+        return {}
+    payload, signature = data[:-SIGNATURE_LENGTH], data[-SIGNATURE_LENGTH:]
+    if not hmac.compare_digest(_sign(payload), signature):
+        return {}
+
+    cart = {}
+    pos = 1
+    sku_id = 0
+    try:
+        while pos < len(payload):
+            delta, pos = _read_varint(payload, pos)
+            value, pos = _read_varint(payload, pos)
+            sku_id += delta
+            cart[sku_id] = {"count": value >> 1, "selected": bool(value & 1)}
+    except (IndexError, ValueError):
+        return {}
+    return cart
@@ -1,2 +1,5 @@
 # 购物车有效期
-CART_COOKIE_EXPIRES = 31 * 24 * 60 * 60
\ No newline at end of file
+CART_COOKIE_EXPIRES = 31 * 24 * 60 * 60
+
+# 购物车cookie最大长度，浏览器单个cookie上限约4KB
+CART_COOKIE_MAX_LENGTH = 3800
@@ -0,0 +1,168 @@
+"""
+已登录用户的购物车存储
+
+每个用户一个哈希 cart_v2_<user_id>，字段为sku_id，值为 count * 2 + selected，
+数量和勾选状态一次读出，修改都由lua脚本在redis中原子完成
+原来的布局（cart_<user_id> 哈希 + cart_selected_<user_id> 集合）由 scripts/migrate_cart_layout.py 迁移
+"""
+from django_redis import get_redis_connection
+
+from shopping_mall.utils.redis_script import RedisScript
+
+CART_KEY = "cart_v2_%s"
+
+# 添加商品：数量累加，勾选时设为勾选，不勾选时保持原状态
+# KEYS: 购物车  ARGV: sku_id, count, selected
+ADD_SCRIPT = RedisScript("cart", """
+local value = tonumber(redis.call('hget', KEYS[1], ARGV[1]) or '0')
+local count = math.floor(value / 2) + tonumber(ARGV[2])
+local selected = value % 2
+if ARGV[3] == '1' then
+    selected = 1
+end
+redis.call('hset', KEYS[1], ARGV[1], count * 2 + selected)
+return count
+""")
+
+# 全选/全不选
+# KEYS: 购物车  ARGV: selected
+SELECT_ALL_SCRIPT = RedisScript("cart", """
+local items = redis.call('hgetall', KEYS[1])
+local selected = tonumber(ARGV[1])
+for i = 1, #items, 2 do
+    local value = tonumber(items[i + 1])
+    redis.call('hset', KEYS[1], items[i], value - value % 2 + selected)
+end
+return #items / 2
+""")
+
+# 删除已下单的商品：扣除下单的数量，结算期间又加购的数量保留
+# KEYS: 购物车  ARGV: sku_id1, count1, sku_id2, count2, ...
+REMOVE_PURCHASED_SCRIPT = RedisScript("cart", """
+for i = 1, #ARGV, 2 do
+    local value = redis.call('hget', KEYS[1], ARGV[i])
+    if value then
+        value = tonumber(value)
+        local count = math.floor(value / 2) - tonumber(ARGV[i + 1])
+        if count > 0 then
+            redis.call('hset', KEYS[1], ARGV[i], count * 2 + value % 2)
+        else
+            redis.call('hdel', KEYS[1], ARGV[i])
+        end
+    end
+end
+return 1
+""")
+
+# 合并cookie购物车：数量以cookie为准，cookie中勾选的商品设为勾选
+# KEYS: 购物车  ARGV: sku_id1, count1, selected1, sku_id2, ...
+MERGE_SCRIPT = RedisScript("cart", """
+for i = 1, #ARGV, 3 do
+    local value = tonumber(redis.call('hget', KEYS[1], ARGV[i]) or '0')
+    local selected = value % 2
+    if ARGV[i + 2] == '1' then
+        selected = 1
+    end
+    redis.call('hset', KEYS[1], ARGV[i], tonumber(ARGV[i + 1]) * 2 + selected)
+end
+return 1
+""")
+
+# 从原来的两个key迁移到新布局，已存在的新布局数据优先
+# KEYS: 原购物车哈希, 原勾选集合, 新购物车哈希
+MIGRATE_SCRIPT = RedisScript("cart", """
+local items = redis.call('hgetall', KEYS[1])
+for i = 1, #items, 2 do
+    if redis.call('hexists', KEYS[3], items[i]) == 0 then
+        local selected = redis.call('sismember', KEYS[2], items[i])
+        redis.call('hset', KEYS[3], items[i], tonumber(items[i + 1]) * 2 + selected)
+    end
+end
+redis.call('del', KEYS[1], KEYS[2])
+return #items / 2
+""")
+
+
+def pack(count, selected):
+    return count * 2 + (1 if selected else 0)
+
+
+def unpack(value):
+    value = int(value)
+    return value >> 1, bool(value & 1)
+
+
+class CartRepository(object):
+    """已登录用户的购物车"""
+
+    def __init__(self, user_id, redis_conn=None):
+        self.key = CART_KEY % user_id
+        self.redis_conn = redis_conn or get_redis_connection("cart")
+
+    def get_all(self):
+        """
+        获取购物车中所有商品
+        :return: {sku_id: {"count": count, "selected": selected}}
+        """
+        cart = {}
+        for sku_id, value in self.redis_conn.hgetall(self.key).items():
+            count, selected = unpack(value)
+            cart[int(sku_id)] = {"count": count, "selected": selected}
+        return cart
+
+    def get_selected(self):
+        """
+        获取购物车中勾选的商品
+        :return: {sku_id: count}
+        """
+        cart = {}
+        for sku_id, value in self.redis_conn.hgetall(self.key).items():
+            count, selected = unpack(value)
+            if selected:
+                cart[int(sku_id)] = count
+        return cart
+
+    def add(self, sku_id, count, selected):
+        """添加商品，返回累加后的数量"""
+        return ADD_SCRIPT(keys=[self.key], args=[sku_id, count, 1 if selected else 0], client=self.redis_conn)
+
+    def update(self, sku_id, count, selected):
+        """修改商品的数量和勾选状态"""
+        self.redis_conn.hset(self.key, sku_id, pack(count, selected))
+
+    def remove(self, sku_id):
+        """删除商品"""
+        self.redis_conn.hdel(self.key, sku_id)
+
+    def select_all(self, selected):
+        """全选或全不选"""
+        SELECT_ALL_SCRIPT(keys=[self.key], args=[1 if selected else 0], client=self.redis_conn)
+
+    def remove_purchased(self, cart):
+        """
+        删除已下单的商品
+        :param cart: 下单的商品 {sku_id: count}
+        """
+        if not cart:
+            return
+        args = []
+        for sku_id, count in cart.items():
+            args.extend([sku_id, count])
+        REMOVE_PURCHASED_SCRIPT(keys=[self.key], args=args, client=self.redis_conn)
+
+    def merge(self, cookie_cart):
+        """
+        合并cookie中的购物车
+        :param cookie_cart: {sku_id: {"count": count, "selected": selected}}
+        """
+        if not cookie_cart:
+            return
+        args = []
+        for sku_id, item in cookie_cart.items():
+            args.extend([sku_id, item["count"], 1 if item["selected"] else 0])
+        MERGE_SCRIPT(keys=[self.key], args=args, client=self.redis_conn)
+
+
+def migrate_user_cart(redis_conn, user_id):
+    """把一个用户的购物车从原来的两个key迁移到新布局，返回迁移的商品数"""
+    return MIGRATE_SCRIPT(client=redis_conn, keys=["cart_%s" % user_id, "cart_selected_%s" % user_id, CART_KEY % user_id])
@@ -1,7 +1,5 @@
-import pickle
-import base64
-
-from django_redis import get_redis_connection
+from carts.codec import decode_cart
+from carts.repository import CartRepository
 
 
 def merge_cart_cookie_to_redis(request, user, response):
@@ -16,29 +14,10 @@ def merge_cart_cookie_to_redis(request, user, response):
     cookie_str = request.COOKIES.get("cart")
     if not cookie_str:
         return response
-    cookie_dict = pickle.loads(base64.b64decode(cookie_str.encode()))
-
-    # 取出存在redis中信息
-    redis_conn = get_redis_connection("cart")
-    redis_cart = redis_conn.hgetall("cart_%s" % user.id)
-    redis_cart_selected = redis_conn.smembers("cart_selected_%s" % user.id)
-
-    # 设置一个空字典用与保存最新redis信息
-    cart = {}
-    for sku_id, count in redis_cart.items():
-        cart[int(sku_id)] = int(count)
-
-    for sku_id, count_selecte_dict in cookie_dict.items():
-        cart[sku_id] = count_selecte_dict["count"]
-        if count_selecte_dict["selected"]:
-            redis_cart_selected.add(sku_id)
-
-    # 保存最新的购物车信息到redis中
-    if cart:
-        pl = redis_conn.pipeline()
-        pl.hmset("cart_%s" % user.id, cart)
-        pl.sadd("cart_selected_%s" % user.id, *redis_cart_selected)
-        pl.execute()
+    cookie_dict = decode_cart(cookie_str)
+
+    # 合并到redis中,数量以cookie为准,cookie中勾选的商品设为勾选
+    CartRepository(user.id).merge(cookie_dict)
 
     response.delete_cookie("cart")
 
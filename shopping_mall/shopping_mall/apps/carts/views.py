@@ -1,17 +1,15 @@
-import base64
-import pickle
-
 from django.shortcuts import render
 
 # Create your views here.
-from django_redis import get_redis_connection
 from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 
 from carts import constants
+from carts.repository import CartRepository
+from carts.codec import encode_cart, decode_cart, is_stale_cookie, CartCookieTooLarge
 from carts.serializers import CartSerializer, CartSKUSerializer,CartDeleteSerializer,CartSelectAllSerializer
-from goods.models import SKU
+from goods.sku_cache import get_sku_cards
 
 
 class CartView(GenericAPIView):
@@ -39,30 +37,18 @@ class CartView(GenericAPIView):
 
         # 保存
         if user and user.is_authenticated:
-            # 用户登录保存到redis中
-            redis_conn = get_redis_connection("cart")
-            pl = redis_conn.pipeline()
-
-            # 保存添加到购物车的数量
-            pl.hincrby("cart_%s" % user.id, sku_id, count)
-            #　保存添加购物车的勾选项默认为勾选
-            if selected:
-                pl.sadd("cart_selected_%s" % user.id, sku_id)
-            pl.execute()
+            # 用户登录保存到redis中,累加数量,勾选时设为勾选
+            CartRepository(user.id).add(sku_id, count, selected)
 
             # 返回相应
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             # 用户未登录保存到cookie中
             # 取出cookie中购物车数据
-            cart = request.COOKIES.get("cart")
-            if cart is not None:
-                cart = pickle.loads(base64.b64decode(cart.encode()))
-            else:
-                cart = {}
+            cart = decode_cart(request.COOKIES.get("cart"))
 
             # 保存添加到购物车的数量
-            sku = cart.get("count")
+            sku = cart.get(sku_id)
             if sku:
                 count += int(sku.get("count"))
 
@@ -73,7 +59,10 @@ class CartView(GenericAPIView):
             }
 
             #对cart进行编码
-            cookie_cart = base64.b64encode(pickle.dumps(cart)).decode()
+            try:
+                cookie_cart = encode_cart(cart)
+            except CartCookieTooLarge:
+                return Response({"message":"购物车商品数量过多"}, status=status.HTTP_400_BAD_REQUEST)
 
             # 返回相应
             response = Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -90,36 +79,31 @@ class CartView(GenericAPIView):
         except:
             user = None
 
+        stale_cookie = False
         if user and user.is_authenticated:
             # 用户已登录,从redis中获取数据
-            redis_conn = get_redis_connection("cart")
-            redis_cart = redis_conn.hgetall("cart_%s" % user.id)
-            redis_cart_selected = redis_conn.smembers("cart_selected_%s" % user.id)
-
-            # 购物车内商品
-            cart = {}
-            for sku_id, count in redis_cart.items():
-                cart[int(sku_id)] = {
-                    "count":int(count),
-                    "selected":sku_id in redis_cart_selected
-                }
+            cart = CartRepository(user.id).get_all()
         else:
             # 用户未登录,从cookie中获取数据
-            cart = request.COOKIES.get("cart")
-            if cart is not None:
-                cart = pickle.loads(base64.b64decode(cart.encode()))
-            else:
-                cart = {}
-
-        # 遍历处理购物车数据
-        skus = SKU.objects.filter(id__in=cart.keys())
-        for sku in skus:
-            sku.count = cart[sku.id]["count"]
-            sku.selected = cart[sku.id]["selected"]
+            cart = decode_cart(request.COOKIES.get("cart"))
+            stale_cookie = is_stale_cookie(request.COOKIES.get("cart"), cart)
+
+        # 遍历处理购物车数据,商品信息从sku卡片缓存中批量获取
+        cards = get_sku_cards(cart.keys())
+        skus = []
+        for sku_id in sorted(cards):
+            card = cards[sku_id]
+            card["count"] = cart[sku_id]["count"]
+            card["selected"] = cart[sku_id]["selected"]
+            skus.append(card)
 
         # 序列化返回
         serializer = CartSKUSerializer(skus, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        if stale_cookie:
+            # 升级前的pickle格式或无效的cookie，明确删除，不再每次请求都解码失败
+            response.delete_cookie("cart")
+        return response
 
     def put(self, request):
         """修改购物车信息"""
@@ -138,28 +122,20 @@ class CartView(GenericAPIView):
 
         if user and user.is_authenticated:
             # 用户已经登录,在redis中保存
-            redis_conn = get_redis_connection("cart")
-            pl = redis_conn.pipeline()
-            pl.hset("cart_%s" % user.id, sku_id, count)
-            if selected:
-                pl.sadd("cart_selected_%s" % user.id, sku_id)
-            else:
-                pl.srem('cart_selected_%s' % user.id, sku_id)
-            pl.execute()
+            CartRepository(user.id).update(sku_id, count, selected)
 
             return Response(serializer.data)
         else:
             # 用户未登录,保存在cookie中
-            cart = request.COOKIES.get("cart")
-            if cart:
-                cart = pickle.loads(base64.b64decode(cart.encode()))
-            else:
-                cart = {}
+            cart = decode_cart(request.COOKIES.get("cart"))
             cart[sku_id] = {
                 "count":count,
                 "selected":selected,
             }
-            cookie_cart = base64.b64encode(pickle.dumps(cart)).decode()
+            try:
+                cookie_cart = encode_cart(cart)
+            except CartCookieTooLarge:
+                return Response({"message":"购物车商品数量过多"}, status=status.HTTP_400_BAD_REQUEST)
             response = Response(serializer.data)
 
             # 设置购物车cookie
@@ -179,22 +155,17 @@ class CartView(GenericAPIView):
 
         if user and user.is_authenticated:
             # 用户已经登录,在redis中删除
-            redis_conn = get_redis_connection("cart")
-            pl = redis_conn.pipeline()
-            pl.hdel("cart_%s" % user.id, sku_id)
-            pl.srem("cart_selected_%s" % user.id, sku_id)
-            pl.execute()
+            CartRepository(user.id).remove(sku_id)
 
             return Response(status=status.HTTP_204_NO_CONTENT)
         else:
             # 用户未登录,在cookie中删除
-            cart = request.COOKIES.get("cart")
+            cart = decode_cart(request.COOKIES.get("cart"))
             response = Response(status=status.HTTP_204_NO_CONTENT)
             if cart:
-                cart = pickle.loads(base64.b64decode(cart.encode()))
                 if sku_id in cart:
                     del cart[sku_id]
-                    cookie_cart = base64.b64encode(pickle.dumps(cart)).decode()
+                    cookie_cart = encode_cart(cart)
                     # 保存cookie
                     response.set_cookie("cart", cookie_cart, max_age=constants.CART_COOKIE_EXPIRES)
 
@@ -220,24 +191,16 @@ class CartSelectAllView(GenericAPIView):
             user = None
 
         if user and user.is_authenticated:
-            redis_conn = get_redis_connection("cart")
-            cart = redis_conn.hgetall("cart_%s" % user.id)
-            sku_id_list = cart.keys()
-
-            if selected:
-                redis_conn.sadd("cart_selected_%s" % user.id, *sku_id_list)
-            else:
-                redis_conn.srem("cart_selected_%s" % user.id, *sku_id_list)
+            CartRepository(user.id).select_all(selected)
 
             return Response({"message":"ok"})
         else:
-            cart = request.COOKIES.get("cart")
+            cart = decode_cart(request.COOKIES.get("cart"))
             response = Response({"message":"ok"})
             if cart:
-                cart = pickle.loads(base64.b64decode(cart.encode()))
                 for sku_id in cart:
                     cart[sku_id]["selected"] = selected
-                cookie_cart = base64.b64encode(pickle.dumps(cart)).decode()
+                cookie_cart = encode_cart(cart)
 
                 # 保存cookies
                 response.set_cookie("cart", cookie_cart, max_age=constants.CART_COOKIE_EXPIRES)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ContentsConfig(AppConfig):
     name = 'contents'
+
+    def ready(self):
+        # 注册信号
+        from contents import signals
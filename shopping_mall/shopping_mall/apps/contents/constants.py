@@ -0,0 +1,2 @@
+# 首页内容变化后重新生成静态主页的延迟，单位秒，期间的多次修改只生成一次
+INDEX_HTML_REBUILD_DELAY = 60
@@ -1,13 +1,58 @@
+"""
+静态主页生成
+
+广告内容、商品频道和分类修改时由信号标记主页过期，并延迟 INDEX_HTML_REBUILD_DELAY 秒调度一次生成任务，
+期间的多次修改只生成一次；定时任务只检查过期标记，主页没有变化时不查询数据库
+"""
+import logging
 import time
-from collections import OrderedDict
 
 import os
 
 from django.conf import settings
+from django.db.models import Prefetch
 from django.template import loader
+from django_redis import get_redis_connection
+
+from contents import constants
+from contents.models import ContentCategory, Content
+from goods.utils import get_categories
+
+logger = logging.getLogger("django")
 
-from contents.models import ContentCategory
-from goods.models import GoodsChannel
+INDEX_HTML_STALE_KEY = "index_html_stale"
+INDEX_HTML_SCHEDULED_KEY = "index_html_scheduled"
+
+
+def mark_index_stale():
+    """标记主页过期，窗口期内只调度一次生成任务"""
+    redis_conn = get_redis_connection("default")
+    redis_conn.set(INDEX_HTML_STALE_KEY, 1)
+    if redis_conn.set(INDEX_HTML_SCHEDULED_KEY, 1, nx=True, ex=constants.INDEX_HTML_REBUILD_DELAY):
+        try:
+            from celery_tasks.html.tasks import regenerate_stale_index_html
+            regenerate_stale_index_html.apply_async(countdown=constants.INDEX_HTML_REBUILD_DELAY)
+        except Exception as e:
+            # 调度失败时由定时任务根据过期标记生成
+            logger.error("调度生成主页任务[异常][ message: %s ]" % e)
+
+
+def regenerate_stale_index_html():
+    """
+    主页过期时重新生成
+    :return: 是否生成了主页
+    """
+    redis_conn = get_redis_connection("default")
+    # 先允许调度新的任务，生成期间的修改会再触发一次生成
+    redis_conn.delete(INDEX_HTML_SCHEDULED_KEY)
+    if not redis_conn.delete(INDEX_HTML_STALE_KEY):
+        return False
+    try:
+        generate_static_index_html()
+    except Exception:
+        redis_conn.set(INDEX_HTML_STALE_KEY, 1)
+        raise
+    return True
 
 
 def generate_static_index_html():
@@ -16,35 +61,14 @@ def generate_static_index_html():
     """
     print("%ss:generate_static_index_html" % time.ctime())
     # 商品频道及分类菜单
-    # 使用有序字典保存类别的顺序
-    categories = OrderedDict()
-    channels = GoodsChannel.objects.order_by("group_id", "sequence")
-    for channel in channels:
-        group_id = channel.group_id   # 当前组
-
-        if group_id not in categories:
-            categories[group_id] = {"channels":[], "sub_cats":[]}
-
-        cat1 = channel.category  # 当前频道的类别
-
-        # 追加当前频道
-        categories[group_id]["channels"].append({
-            "id":cat1.id,
-            "name":cat1.name,
-            "url":channel.url,
-        })
-        # 构建当前类别的主类别
-        for cat2 in cat1.goodscategory_set.all():
-            cat2.sub_cats = []
-            for cat3 in cat2.goodscategory_set.all():
-                cat2.sub_cats.append(cat3)
-            categories[group_id]["sub_cats"].append(cat2)
-
-    # 广告内容
+    categories = get_categories()
+
+    # 广告内容，一次查询取出所有展示的内容
     contents = {}
-    content_categories = ContentCategory.objects.all()
+    content_categories = ContentCategory.objects.prefetch_related(
+        Prefetch("content_set", queryset=Content.objects.filter(status=True).order_by("sequence")))
     for cat in content_categories:
-        contents[cat.key] = cat.content_set.filter(status=True).order_by('sequence')
+        contents[cat.key] = cat.content_set.all()
 
     # 渲染模板
     context = {
@@ -54,6 +78,8 @@ def generate_static_index_html():
     template = loader.get_template('index.html')
     html_text = template.render(context)
     file_path = os.path.join(settings.GENERATED_STATIC_HTML_FILES_DIR, 'index.html')
-    with open(file_path, 'w') as f:
+    # 先写临时文件再改名，不会出现写了一半的主页
+    tmp_path = "%s.%d.tmp" % (file_path, os.getpid())
+    with open(tmp_path, 'w') as f:
         f.write(html_text)
-
+    os.replace(tmp_path, file_path)
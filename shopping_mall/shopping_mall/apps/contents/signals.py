@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from contents.crons import mark_index_stale
+from contents.models import Content, ContentCategory
+from goods.models import GoodsChannel, GoodsCategory
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+@receiver(post_save, sender=ContentCategory)
+@receiver(post_delete, sender=ContentCategory)
+@receiver(post_save, sender=GoodsChannel)
+@receiver(post_delete, sender=GoodsChannel)
+@receiver(post_save, sender=GoodsCategory)
+@receiver(post_delete, sender=GoodsCategory)
+def index_content_changed(sender, **kwargs):
+    """主页展示的内容修改后标记主页过期，包括后台(admin/xadmin)的编辑"""
+    mark_index_stale()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GoodsConfig(AppConfig):
     name = 'goods'
     verbose_name="商品管理"
+
+    def ready(self):
+        # 注册信号
+        from goods import signals
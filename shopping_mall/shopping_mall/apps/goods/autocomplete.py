@@ -0,0 +1,131 @@
+"""
+sku名称自动补全
+
+上架sku名称的每个词开始的后缀，规范化后按 "<后缀>\\x01<名称>\\x01<sku_id>" 存入有序集合 sku_name_prefix，
+分数都为0，用 ZRANGEBYLEX 按字典序范围取出以输入内容开头的成员，一次redis查询完成；
+sku_name_prefix_names 哈希记录每个sku的成员，sku修改后由信号删除旧名称的成员再加入新名称
+有序集合不存在时从数据库整体重建
+"""
+import json
+import uuid
+
+from django_redis import get_redis_connection
+
+from goods import constants
+from goods.models import SKU
+from goods.search_cache import normalize_query
+from shopping_mall.utils.redis_script import RedisScript
+
+PREFIX_KEY = "sku_name_prefix"
+NAMES_KEY = "sku_name_prefix_names"
+SEPARATOR = "\x01"
+
+# 替换一个sku的成员，有序集合不存在时不处理
+# KEYS: 有序集合, 名称哈希  ARGV: sku_id, 新名称(为空表示删除), 新成员1, 新成员2, ...
+UPDATE_SCRIPT = RedisScript("default", """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+local old = redis.call('hget', KEYS[2], ARGV[1])
+if old then
+    local old_members = cjson.decode(old)
+    for i = 1, #old_members do
+        redis.call('zrem', KEYS[1], old_members[i])
+    end
+    redis.call('hdel', KEYS[2], ARGV[1])
+end
+if ARGV[2] ~= '' then
+    local members = {}
+    for i = 3, #ARGV do
+        redis.call('zadd', KEYS[1], 0, ARGV[i])
+        members[#members + 1] = ARGV[i]
+    end
+    redis.call('hset', KEYS[2], ARGV[1], cjson.encode(members))
+end
+return 1
+""")
+
+
+def get_prefix_connection():
+    return get_redis_connection("default")
+
+
+def name_members(sku_id, name):
+    """sku名称中每个词开始的后缀对应的成员"""
+    words = normalize_query(name).split(" ")
+    members = []
+    for i in range(len(words)):
+        suffix = " ".join(words[i:])
+        if suffix:
+            members.append(SEPARATOR.join([suffix, name, str(sku_id)]))
+    return members
+
+
+def build_prefix_index(redis_conn=None):
+    """从数据库重建自动补全索引，先写临时key再改名"""
+    redis_conn = redis_conn or get_prefix_connection()
+    tag = uuid.uuid4().hex
+    tmp_prefix_key = "%s_building_%s" % (PREFIX_KEY, tag)
+    tmp_names_key = "%s_building_%s" % (NAMES_KEY, tag)
+    pl = redis_conn.pipeline(transaction=False)
+    # 占位成员，保证没有商品时有序集合也存在，不会被前缀查询匹配
+    pl.zadd(tmp_prefix_key, {"": 0})
+    queryset = SKU.objects.filter(is_launched=True).values_list("id", "name").order_by("id")
+    for i, (sku_id, name) in enumerate(queryset.iterator(), 1):
+        members = name_members(sku_id, name)
+        if members:
+            pl.zadd(tmp_prefix_key, {member: 0 for member in members})
+            pl.hset(tmp_names_key, sku_id, json.dumps(members))
+        if i % constants.AUTOCOMPLETE_BUILD_BATCH_SIZE == 0:
+            pl.execute()
+    pl.execute()
+
+    pl = redis_conn.pipeline()
+    pl.rename(tmp_prefix_key, PREFIX_KEY)
+    if redis_conn.exists(tmp_names_key):
+        pl.rename(tmp_names_key, NAMES_KEY)
+    else:
+        pl.delete(NAMES_KEY)
+    pl.execute()
+
+
+def complete(text, limit=constants.AUTOCOMPLETE_LIMIT):
+    """
+    以输入内容开头的sku名称
+    :return: [{"id":, "name":}, ...]
+    """
+    prefix = normalize_query(text)
+    if not prefix:
+        return []
+    redis_conn = get_prefix_connection()
+    if not redis_conn.exists(PREFIX_KEY):
+        build_prefix_index(redis_conn)
+
+    start = b"[" + prefix.encode()
+    # 0xff 不会出现在utf-8编码中，大于所有以prefix开头的成员
+    end = b"[" + prefix.encode() + b"\xff"
+    # 同一个sku的多个后缀可能同时匹配，多取一些再去重
+    members = redis_conn.zrangebylex(PREFIX_KEY, start, end, start=0, num=limit * 3)
+
+    results = []
+    seen = set()
+    for member in members:
+        _, name, sku_id = member.decode().split(SEPARATOR)
+        if sku_id in seen:
+            continue
+        seen.add(sku_id)
+        results.append({"id": int(sku_id), "name": name})
+        if len(results) >= limit:
+            break
+    return results
+
+
+def update_sku_name(sku):
+    """sku保存后更新自动补全索引，下架的sku移出"""
+    members = name_members(sku.id, sku.name) if sku.is_launched else []
+    UPDATE_SCRIPT(
+        keys=[PREFIX_KEY, NAMES_KEY], args=[sku.id, sku.name if members else ""] + members)
+
+
+def remove_sku_name(sku_id):
+    UPDATE_SCRIPT(keys=[PREFIX_KEY, NAMES_KEY], args=[sku_id, ""])
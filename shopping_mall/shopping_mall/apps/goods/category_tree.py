@@ -0,0 +1,97 @@
+"""
+商品分类菜单
+
+两条sql查出所有分类和频道，在内存中构建三级菜单，以json缓存在 category_tree_<version> 中；
+分类或频道修改后由信号增加版本号 category_tree_version，旧版本的缓存自然过期；
+进程内再保存一份当前版本的菜单，版本号未变时不再读取和解析缓存
+详情页、主页和接口都从这里读取菜单
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from goods import constants
+from goods.models import GoodsCategory, GoodsChannel
+
+logger = logging.getLogger("django")
+
+CATEGORY_TREE_VERSION_KEY = "category_tree_version"
+CATEGORY_TREE_KEY = "category_tree_%s"
+
+# 进程内缓存的 (版本号, 菜单)
+_local = {"version": None, "tree": None}
+_local_lock = threading.Lock()
+
+
+def get_cache_connection():
+    return get_redis_connection("default")
+
+
+def build_category_tree():
+    """
+    从数据库构建分类菜单
+    :return: [
+        {
+            "group_id": 组号,
+            "channels": [{"id":, "name":, "url":}, ...],
+            "sub_cats": [{"id":, "name":, "sub_cats": [{"id":, "name":}, ...]}, ...]
+        },
+        ...
+    ]
+    """
+    children = {}
+    for category in GoodsCategory.objects.order_by("id").values("id", "name", "parent_id"):
+        children.setdefault(category["parent_id"], []).append(category)
+
+    groups = OrderedDict()
+    channels = GoodsChannel.objects.select_related("category").order_by("group_id", "sequence")
+    for channel in channels:
+        group = groups.setdefault(channel.group_id, {"group_id": channel.group_id, "channels": [], "sub_cats": []})
+        cat1 = channel.category
+        group["channels"].append({"id": cat1.id, "name": cat1.name, "url": channel.url})
+        for cat2 in children.get(cat1.id, []):
+            group["sub_cats"].append({
+                "id": cat2["id"],
+                "name": cat2["name"],
+                "sub_cats": [{"id": cat3["id"], "name": cat3["name"]} for cat3 in children.get(cat2["id"], [])],
+            })
+    return list(groups.values())
+
+
+def get_category_tree():
+    """
+    获取分类菜单，json可序列化的列表，格式见 build_category_tree
+    缓存命中时不查询数据库
+    """
+    try:
+        redis_conn = get_cache_connection()
+        version = int(redis_conn.get(CATEGORY_TREE_VERSION_KEY) or 0)
+    except RedisError as e:
+        logger.warning("读取分类菜单版本失败: %s" % e)
+        return build_category_tree()
+
+    with _local_lock:
+        if _local["version"] == version:
+            return _local["tree"]
+
+    key = CATEGORY_TREE_KEY % version
+    value = redis_conn.get(key)
+    if value is not None:
+        tree = json.loads(value.decode())
+    else:
+        tree = build_category_tree()
+        redis_conn.setex(key, constants.CATEGORY_TREE_CACHE_EXPIRES, json.dumps(tree))
+
+    with _local_lock:
+        _local["version"] = version
+        _local["tree"] = tree
+    return tree
+
+
+def bump_category_tree_version():
+    """分类或频道修改后增加版本号，下次读取时重新构建"""
+    get_cache_connection().incr(CATEGORY_TREE_VERSION_KEY)
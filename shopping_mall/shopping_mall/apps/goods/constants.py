@@ -0,0 +1,72 @@
+# sku卡片缓存有效期，单位秒
+SKU_CARD_CACHE_EXPIRES = 60 * 60
+
+# 重建sku id集合时每次写入redis的数量
+SKU_IDS_BUILD_BATCH_SIZE = 5000
+
+# sku id集合的有效期，过期后从数据库整体重建
+SKU_IDS_CACHE_EXPIRES = 24 * 60 * 60
+
+# 重建sku id集合时持有锁的超时时间，超时后可以再次调度重建，单位秒
+SKU_IDS_BUILD_LOCK_TIMEOUT = 10 * 60
+
+# 不存在的sku id的记录有效期，单位秒
+SKU_MISSING_CACHE_EXPIRES = 60
+
+# 生成详情页时每次查询的SPU数量
+DETAIL_HTML_GOODS_BATCH_SIZE = 100
+
+# 全量生成详情页时每个进程每次处理的SPU数量
+DETAIL_HTML_CHUNK_SIZE = 200
+
+# 分类菜单缓存有效期，单位秒，分类修改后版本号变化，旧版本的缓存到期删除
+CATEGORY_TREE_CACHE_EXPIRES = 24 * 60 * 60
+
+# 分类下上架sku数量的缓存有效期，单位秒，sku修改时删除，sku改换分类时旧分类的数量到期后更新
+CATEGORY_SKU_COUNT_CACHE_EXPIRES = 10 * 60
+
+# 分类商品列表响应缓存：未变化时的最长使用时间、过期后仍可返回旧数据的最长时间、重新生成时持有锁的超时时间，单位秒
+SKU_LIST_CACHE_FRESH = 5 * 60
+SKU_LIST_CACHE_EXPIRES = 60 * 60
+SKU_LIST_LOCK_TIMEOUT = 10
+
+# 重建销量排行时每次写入redis的数量
+SALES_RANK_BUILD_BATCH_SIZE = 5000
+
+# 没有上架sku的分类的空排行标记有效期，单位秒，分类下有sku保存为上架时由信号删除
+SALES_RANK_EMPTY_EXPIRES = 10 * 60
+
+# 分类热销商品默认返回的数量和最大数量
+HOT_SKUS_LIMIT = 10
+HOT_SKUS_MAX_LIMIT = 50
+
+# 搜索结果的价格区间分面，(最低价, 最高价)，不包含最高价，None表示不限
+SEARCH_PRICE_RANGES = (
+    (0, 100),
+    (100, 500),
+    (500, 1000),
+    (1000, 2000),
+    (2000, 5000),
+    (5000, None),
+)
+
+# 搜索结果支持的排序，请求参数 -> 索引字段
+SEARCH_ORDERINGS = {
+    "sales": "sales",
+    "-sales": "-sales",
+    "price": "price_value",
+    "-price": "-price_value",
+}
+
+# 搜索结果返回分面统计的字段
+SEARCH_FACET_FIELDS = ("category", "brand", "price_range", "in_stock")
+
+# 搜索结果缓存的有效期，搜索索引更新后立即失效
+SEARCH_CACHE_EXPIRES = 60
+
+# 自动补全默认返回的数量和最大数量
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+# 重建自动补全索引时每次写入redis的sku数量
+AUTOCOMPLETE_BUILD_BATCH_SIZE = 1000
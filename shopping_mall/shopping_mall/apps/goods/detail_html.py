@@ -0,0 +1,152 @@
+"""
+商品详情页静态化
+
+一次生成过程中分类菜单只查询一次、模板只加载一次；
+每个SPU用一次prefetch取出全部SKU、图片、规格和选项，spec_sku_map每个SPU只构建一次，
+同一SPU的所有SKU页面一起渲染；渲染结果与已有文件的hash相同时不再写文件，
+写文件时先写临时文件再改名，不会出现写了一半的页面
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.template import loader
+
+from goods import constants
+from goods.models import Goods, GoodsSpecification, SpecificationOption, SKU, SKUSpecification
+from goods.utils import get_categories
+
+logger = logging.getLogger("django")
+
+
+def get_goods_queryset():
+    """生成详情页需要的SPU数据，固定数量的查询取出所有关联数据"""
+    return Goods.objects.select_related("category1", "category2", "category3").prefetch_related(
+        "category1__goodschannel_set",
+        Prefetch("goodsspecification_set", queryset=GoodsSpecification.objects.order_by("id").prefetch_related(
+            Prefetch("specificationoption_set", queryset=SpecificationOption.objects.order_by("id")))),
+        Prefetch("sku_set", queryset=SKU.objects.order_by("id").prefetch_related(
+            "skuimage_set",
+            Prefetch("skuspecification_set", queryset=SKUSpecification.objects.order_by("spec_id")))),
+    )
+
+
+def file_digest(file_path):
+    """已有静态文件的hash，文件不存在时返回None"""
+    try:
+        with open(file_path, "rb") as f:
+            return hashlib.md5(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class DetailPageBuilder(object):
+    """商品详情页生成器，一个实例对应一次生成过程"""
+
+    def __init__(self, output_dir=None, categories=None):
+        self.output_dir = os.path.join(output_dir or settings.GENERATED_STATIC_HTML_FILES_DIR, "goods")
+        # 商品分类菜单，一次生成过程只查询一次
+        self.categories = categories if categories is not None else get_categories()
+        self.template = loader.get_template("detail.html")
+        self.rendered = 0
+        self.written = 0
+        self.skipped = 0
+        # 生成失败的SPU id
+        self.failed = []
+
+    def build_goods(self, goods_id_list):
+        """生成多个SPU下所有SKU的详情页"""
+        goods_id_list = list(goods_id_list)
+        for i in range(0, len(goods_id_list), constants.DETAIL_HTML_GOODS_BATCH_SIZE):
+            batch = goods_id_list[i:i + constants.DETAIL_HTML_GOODS_BATCH_SIZE]
+            for goods in get_goods_queryset().filter(id__in=batch):
+                try:
+                    self.build(goods)
+                except Exception as e:
+                    logger.error("生成详情页[异常][ goods_id: %s, message: %s ]" % (goods.id, e))
+                    self.failed.append(goods.id)
+
+    def build_skus(self, sku_id_list):
+        """
+        生成指定SKU所属SPU的所有详情页
+        SKU的规格变化会影响同一SPU其他SKU页面中的规格链接，未变化的页面不会重写
+        """
+        goods_id_list = SKU.objects.filter(id__in=list(sku_id_list)).values_list("goods_id", flat=True).distinct()
+        self.build_goods(goods_id_list)
+
+    def build(self, goods):
+        """
+        生成一个SPU下所有SKU的详情页
+        :param goods: get_goods_queryset() 查询出的SPU
+        """
+        # 面包屑导航信息中的频道
+        goods.channel = goods.category1.goodschannel_set.all()[0]
+
+        skus = goods.sku_set.all()
+        specs = goods.goodsspecification_set.all()
+
+        # 构建不同规格参数（选项）的sku字典
+        # spec_sku_map = {
+        #     (规格1参数id, 规格2参数id, 规格3参数id, ...): sku_id,
+        #     ...
+        # }
+        spec_sku_map = {}
+        sku_keys = {}
+        for sku in skus:
+            key = tuple(spec.option_id for spec in sku.skuspecification_set.all())
+            spec_sku_map[key] = sku.id
+            sku_keys[sku.id] = key
+
+        for sku in skus:
+            # 若当前sku的规格信息不完整，则不生成
+            sku_key = sku_keys[sku.id]
+            if len(sku_key) < len(specs):
+                continue
+
+            sku.images = sku.skuimage_set.all()
+            context = {
+                "categories": self.categories,
+                "goods": goods,
+                "specs": self.get_sku_specs(specs, sku_key, spec_sku_map),
+                "sku": sku,
+            }
+            self.write(sku.id, self.template.render(context))
+
+    @staticmethod
+    def get_sku_specs(specs, sku_key, spec_sku_map):
+        """当前sku的规格信息，每个选项对应切换到的sku"""
+        sku_specs = []
+        for index, spec in enumerate(specs):
+            # 复制当前sku的规格键
+            key = list(sku_key)
+            options = []
+            for option in spec.specificationoption_set.all():
+                # 在规格参数sku字典中查找符合当前规格的sku
+                key[index] = option.id
+                options.append({"value": option.value, "sku_id": spec_sku_map.get(tuple(key))})
+            sku_specs.append({"name": spec.name, "options": options})
+        return sku_specs
+
+    def write(self, sku_id, html_text):
+        """内容有变化时才写文件，先写临时文件再原子地改名"""
+        self.rendered += 1
+        data = html_text.encode()
+        file_path = os.path.join(self.output_dir, str(sku_id) + ".html")
+        if file_digest(file_path) == hashlib.md5(data).hexdigest():
+            self.skipped += 1
+            return
+        # 临时文件名随机，同一台机器上的多个进程、多台机器共享目录时都不会互相覆盖
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", prefix=str(sku_id) + ".html.", dir=self.output_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # mkstemp创建的文件只有属主可读，改为与普通静态文件相同的权限
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self.written += 1
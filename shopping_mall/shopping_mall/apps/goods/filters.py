@@ -0,0 +1,49 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from goods import constants
+
+
+def _get_number(params, name, convert):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValidationError({name: "参数格式错误"})
+
+
+class SKUSearchFilter(BaseFilterBackend):
+    """
+    sku搜索结果的过滤和排序，条件都交给搜索引擎计算
+    ?category=分类id&brand=品牌id&price_min=最低价&price_max=最高价&in_stock=1&ordering=-sales|sales|-price|price
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        category = _get_number(params, "category", int)
+        if category is not None:
+            queryset = queryset.filter(category=category)
+        brand = _get_number(params, "brand", int)
+        if brand is not None:
+            queryset = queryset.filter(brand=brand)
+
+        # 价格区间包含最低价，不包含最高价，与 SEARCH_PRICE_RANGES 一致
+        price_min = _get_number(params, "price_min", float)
+        if price_min is not None:
+            queryset = queryset.filter(price_value__gte=price_min)
+        price_max = _get_number(params, "price_max", float)
+        if price_max is not None:
+            queryset = queryset.filter(price_value__lt=price_max)
+
+        if params.get("in_stock") in ("1", "true"):
+            queryset = queryset.filter(in_stock=True)
+
+        ordering = params.get("ordering")
+        if ordering:
+            if ordering not in constants.SEARCH_ORDERINGS:
+                raise ValidationError({"ordering": "不支持的排序"})
+            queryset = queryset.order_by(constants.SEARCH_ORDERINGS[ordering])
+        return queryset
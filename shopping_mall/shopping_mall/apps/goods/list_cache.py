@@ -0,0 +1,103 @@
+"""
+分类商品列表响应缓存
+
+按 分类 + 协议和域名 + 排序/页码/每页数量/游标 缓存序列化好的json（上一页/下一页链接是绝对地址），命中时不查询数据库也不序列化
+每个分类一个代数计数 sku_list_gen_<category_id>，分类下sku的价格、库存、上架状态或销量变化时加1，
+缓存中记录生成时的代数，代数不同或超过 SKU_LIST_CACHE_FRESH 秒即为过期
+过期的缓存只由抢到锁的一个请求重新生成，其他请求继续返回旧数据，热门页面失效时不会同时查询数据库
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from goods import constants
+from shopping_mall.utils.stats import incr_counters
+
+logger = logging.getLogger("django")
+
+SKU_LIST_KEY = "sku_list_%s_%s"
+SKU_LIST_LOCK_KEY = "sku_list_lock_%s_%s"
+SKU_LIST_GENERATION_KEY = "sku_list_gen_%s"
+
+# 参与缓存键的查询参数
+SKU_LIST_PARAMS = ("ordering", "page", "page_size", "cursor")
+
+
+def get_cache_connection():
+    return get_redis_connection("default")
+
+
+def get_cached_list(category_id, query_params, build, origin=""):
+    """
+    获取分类商品列表的响应
+    :param category_id: 分类id
+    :param query_params: 请求的查询参数
+    :param build: 生成响应的函数，返回json bytes，返回None时不缓存
+    :param origin: 请求的协议和域名，如 http://www.example.com/
+    :return: json bytes
+    """
+    params = json.dumps([origin] + [query_params.get(name) for name in SKU_LIST_PARAMS])
+    params_hash = hashlib.md5(params.encode()).hexdigest()
+    key = SKU_LIST_KEY % (category_id, params_hash)
+
+    redis_conn = get_cache_connection()
+    try:
+        pl = redis_conn.pipeline(transaction=False)
+        pl.get(SKU_LIST_GENERATION_KEY % category_id)
+        pl.get(key)
+        generation, value = pl.execute()
+    except RedisError as e:
+        logger.warning("读取商品列表缓存失败: %s" % e)
+        return build()
+    generation = int(generation or 0)
+
+    lock_key = SKU_LIST_LOCK_KEY % (category_id, params_hash)
+    locked = False
+    if value is not None:
+        # 缓存格式: 代数\n生成时间\njson
+        cached_generation, created, body = value.split(b"\n", 2)
+        if int(cached_generation) == generation and time.time() - float(created) < constants.SKU_LIST_CACHE_FRESH:
+            incr_counters({"sku_list.hit": 1})
+            return body
+        # 已过期，只有一个请求重新生成，其他请求返回旧数据
+        try:
+            locked = redis_conn.set(lock_key, 1, nx=True, ex=constants.SKU_LIST_LOCK_TIMEOUT)
+        except RedisError as e:
+            logger.warning("获取商品列表缓存锁失败: %s" % e)
+            return body
+        if not locked:
+            incr_counters({"sku_list.stale": 1})
+            return body
+
+    incr_counters({"sku_list.miss": 1})
+    pl = redis_conn.pipeline(transaction=False)
+    try:
+        body = build()
+        if body is not None:
+            # 生成前读取的代数，生成期间代数变化时下次读取即为过期
+            value = b"%d\n%f\n" % (generation, time.time()) + body
+            pl.setex(key, constants.SKU_LIST_CACHE_EXPIRES, value)
+    finally:
+        # 生成失败时也释放锁，下一个请求可以立即重新生成，不必等锁超时
+        if locked:
+            pl.delete(lock_key)
+        try:
+            pl.execute()
+        except RedisError as e:
+            logger.warning("写入商品列表缓存失败: %s" % e)
+    return body
+
+
+def bump_sku_list_generation(category_id_list):
+    """分类下的sku变化后增加代数，该分类的列表缓存全部过期"""
+    category_id_list = set(category_id_list)
+    if not category_id_list:
+        return
+    pl = get_cache_connection().pipeline(transaction=False)
+    for category_id in category_id_list:
+        pl.incr(SKU_LIST_GENERATION_KEY % category_id)
+    pl.execute()
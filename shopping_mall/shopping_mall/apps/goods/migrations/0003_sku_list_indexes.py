@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0002_auto_20190708_1934'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sku',
+            index=models.Index(fields=['category', 'is_launched', 'create_time', 'id'], name='tb_sku_cat_create_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sku',
+            index=models.Index(fields=['category', 'is_launched', 'price', 'id'], name='tb_sku_cat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sku',
+            index=models.Index(fields=['category', 'is_launched', 'sales', 'id'], name='tb_sku_cat_sales_idx'),
+        ),
+    ]
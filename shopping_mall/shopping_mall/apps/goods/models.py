@@ -134,6 +134,12 @@ class SKU(BaseModel):
         db_table = 'tb_sku'
         verbose_name = '商品SKU'
         verbose_name_plural = verbose_name
+        # 分类商品列表按三种排序分页时使用的索引，id用于排序字段值相同时定位游标
+        indexes = [
+            models.Index(fields=['category', 'is_launched', 'create_time', 'id'], name='tb_sku_cat_create_time_idx'),
+            models.Index(fields=['category', 'is_launched', 'price', 'id'], name='tb_sku_cat_price_idx'),
+            models.Index(fields=['category', 'is_launched', 'sales', 'id'], name='tb_sku_cat_sales_idx'),
+        ]
 
     def __str__(self):
         return '%s: %s' % (self.id, self.name)
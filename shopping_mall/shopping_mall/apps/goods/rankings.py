@@ -0,0 +1,171 @@
+"""
+分类sku销量排行
+
+每个分类一个有序集合 sku_sales_rank_<category_id>，成员为上架的sku id，分数为销量
+下单后由订单后续处理累加销量，sku上架/下架时由信号增删成员；
+有序集合不存在时从数据库整体重建，每天定时全量重建一次修正偏差；
+分类下没有上架的sku时有序集合不存在，用 sku_sales_rank_empty_<category_id> 标记一段时间，期间不再查询数据库
+分类商品列表按销量排序时从有序集合中按名次取sku id，不再由mysql对分类下所有sku排序
+"""
+import uuid
+
+from django_redis import get_redis_connection
+
+from goods import constants
+from goods.models import SKU
+from shopping_mall.utils.redis_script import RedisScript
+
+SALES_RANK_KEY = "sku_sales_rank_%s"
+SALES_RANK_EMPTY_KEY = "sku_sales_rank_empty_%s"
+
+# 有序集合存在时才累加销量，不存在时由下一次读取整体重建
+# KEYS: 有序集合1, 有序集合2, ...  ARGV: sku_id1, count1, sku_id2, count2, ...
+INCR_SALES_SCRIPT = RedisScript("default", """
+for i = 1, #KEYS do
+    if redis.call('exists', KEYS[i]) == 1 then
+        redis.call('zincrby', KEYS[i], ARGV[i * 2], ARGV[i * 2 - 1])
+    end
+end
+return 1
+""")
+
+# 上架时加入排行（已在排行中的保持原销量），下架时移出；上架时删除空排行标记，下一次读取重建
+# KEYS: 有序集合, 空排行标记  ARGV: sku_id, 是否上架, 销量
+UPDATE_MEMBER_SCRIPT = RedisScript("default", """
+if ARGV[2] == '1' then
+    redis.call('del', KEYS[2])
+end
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[2] == '1' then
+    if not redis.call('zscore', KEYS[1], ARGV[1]) then
+        redis.call('zadd', KEYS[1], ARGV[3], ARGV[1])
+    end
+else
+    redis.call('zrem', KEYS[1], ARGV[1])
+end
+return 1
+""")
+
+
+def get_rank_connection():
+    return get_redis_connection("default")
+
+
+def build_sales_ranking(category_id, redis_conn=None):
+    """从数据库重建一个分类的销量排行，先写临时key再改名，不会读到不完整的排行"""
+    redis_conn = redis_conn or get_rank_connection()
+    key = SALES_RANK_KEY % category_id
+    tmp_key = "%s_building_%s" % (key, uuid.uuid4().hex)
+    scores = {}
+    queryset = SKU.objects.filter(category_id=category_id, is_launched=True).values_list("id", "sales")
+    for sku_id, sales in queryset.iterator():
+        scores[sku_id] = sales
+        if len(scores) >= constants.SALES_RANK_BUILD_BATCH_SIZE:
+            redis_conn.zadd(tmp_key, scores)
+            scores = {}
+    if scores:
+        redis_conn.zadd(tmp_key, scores)
+    pl = redis_conn.pipeline()
+    if redis_conn.exists(tmp_key):
+        pl.rename(tmp_key, key)
+        pl.delete(SALES_RANK_EMPTY_KEY % category_id)
+    else:
+        # 分类下没有上架的sku，标记为空排行，不必每次读取都重建
+        pl.delete(key)
+        pl.setex(SALES_RANK_EMPTY_KEY % category_id, constants.SALES_RANK_EMPTY_EXPIRES, 1)
+    pl.execute()
+
+
+def rebuild_sales_rankings():
+    """全量重建所有分类的销量排行，修正累加产生的偏差"""
+    redis_conn = get_rank_connection()
+    category_id_list = SKU.objects.order_by("category_id").values_list("category_id", flat=True).distinct()
+    for category_id in category_id_list:
+        build_sales_ranking(category_id, redis_conn)
+
+
+def _ensure_ranking(redis_conn, category_id):
+    """排行不存在且没有空排行标记时重建，空排行的key不存在，读取时按空集合处理"""
+    key = SALES_RANK_KEY % category_id
+    pl = redis_conn.pipeline(transaction=False)
+    pl.exists(key)
+    pl.exists(SALES_RANK_EMPTY_KEY % category_id)
+    exists, is_empty = pl.execute()
+    if not exists and not is_empty:
+        build_sales_ranking(category_id, redis_conn)
+    return key
+
+
+def get_ranked_sku_ids(category_id, start, stop, descending=True):
+    """
+    按销量名次获取分类下的sku id
+    :param start: 起始名次，从0开始
+    :param stop: 结束名次（包含）
+    :param descending: 是否按销量从高到低
+    """
+    redis_conn = get_rank_connection()
+    key = _ensure_ranking(redis_conn, category_id)
+    if descending:
+        sku_ids = redis_conn.zrevrange(key, start, stop)
+    else:
+        sku_ids = redis_conn.zrange(key, start, stop)
+    return [int(sku_id) for sku_id in sku_ids]
+
+
+def get_ranking_size(category_id):
+    """分类销量排行中的sku数量"""
+    redis_conn = get_rank_connection()
+    return redis_conn.zcard(_ensure_ranking(redis_conn, category_id))
+
+
+def incr_sales_rankings(sku_sales):
+    """
+    下单后累加销量排行
+    :param sku_sales: {sku_id: (category_id, count)}
+    """
+    if not sku_sales:
+        return
+    keys, args = [], []
+    for sku_id, (category_id, count) in sku_sales.items():
+        keys.append(SALES_RANK_KEY % category_id)
+        args.extend([sku_id, count])
+    INCR_SALES_SCRIPT(keys=keys, args=args)
+
+
+def update_ranking_member(sku):
+    """sku保存后按上架状态加入或移出排行"""
+    UPDATE_MEMBER_SCRIPT(
+        keys=[SALES_RANK_KEY % sku.category_id, SALES_RANK_EMPTY_KEY % sku.category_id], args=[sku.id, 1 if sku.is_launched else 0, sku.sales])
+
+
+def remove_ranking_member(sku):
+    get_rank_connection().zrem(SALES_RANK_KEY % sku.category_id, sku.id)
+
+
+class RankedSKUList(object):
+    """
+    按销量名次排列的分类sku，供分页器切片使用
+    切片时从有序集合按名次取出sku id，再按id查询一页sku
+    """
+
+    def __init__(self, category_id, descending=True):
+        self.category_id = category_id
+        self.descending = descending
+
+    def count(self):
+        return get_ranking_size(self.category_id)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None or index.start is None or index.stop is None:
+            raise TypeError("只支持 [start:stop] 切片")
+        if index.stop <= index.start:
+            return []
+        sku_ids = get_ranked_sku_ids(self.category_id, index.start, index.stop - 1, self.descending)
+        skus = SKU.objects.in_bulk(sku_ids)
+        # 排行与数据库短暂不一致时跳过已下架的sku
+        return [skus[sku_id] for sku_id in sku_ids if sku_id in skus and skus[sku_id].is_launched]
@@ -0,0 +1,62 @@
+"""
+sku搜索结果缓存
+
+按 协议和域名 + 查询词规范化后的全部查询参数 缓存序列化好的json（上一页/下一页链接是绝对地址），有效期 SEARCH_CACHE_EXPIRES 秒；
+查询参数都可能被过滤后端使用，全部参与缓存键，不会出现参数不同的请求命中同一个缓存；
+缓存键中包含搜索索引版本号，索引更新后旧的缓存不再使用
+"""
+import hashlib
+import json
+import logging
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from goods import constants
+from shopping_mall.utils.search.signals import get_index_version
+from shopping_mall.utils.stats import incr_counters
+
+logger = logging.getLogger("django")
+
+SEARCH_CACHE_KEY = "sku_search_%s_%s"
+
+
+def normalize_query(text):
+    """查询词规范化：去掉首尾和重复的空白，英文转小写"""
+    return " ".join((text or "").lower().split())
+
+
+def get_cached_search(query_params, build, origin=""):
+    """
+    获取搜索结果的响应
+    :param query_params: 请求的查询参数
+    :param build: 生成响应的函数，返回json bytes
+    :param origin: 请求的协议和域名，如 http://www.example.com/
+    :return: json bytes
+    """
+    params = [origin]
+    for name, values in sorted(query_params.lists()):
+        if name == "text":
+            values = [normalize_query(value) for value in values]
+        params.append([name, values])
+    params_hash = hashlib.md5(json.dumps(params).encode()).hexdigest()
+
+    try:
+        redis_conn = get_redis_connection("default")
+        key = SEARCH_CACHE_KEY % (get_index_version(), params_hash)
+        body = redis_conn.get(key)
+    except RedisError as e:
+        logger.warning("读取搜索结果缓存失败: %s" % e)
+        return build()
+
+    if body is not None:
+        incr_counters({"sku_search.hit": 1})
+        return body
+
+    incr_counters({"sku_search.miss": 1})
+    body = build()
+    try:
+        redis_conn.setex(key, constants.SEARCH_CACHE_EXPIRES, body)
+    except RedisError as e:
+        logger.warning("写入搜索结果缓存失败: %s" % e)
+    return body
@@ -1,5 +1,6 @@
 from haystack import indexes
 
+from goods import constants
 from goods.models import SKU
 
 
@@ -12,6 +13,14 @@ class SKUIndex(indexes.SearchIndex, indexes.Indexable):
     price = indexes.DecimalField(model_attr="price")
     default_image_url = indexes.CharField(model_attr="default_image_url")
     comments = indexes.IntegerField(model_attr="comments")
+    # 以下字段用于过滤、分面统计和排序
+    # price是字符串类型，价格区间过滤和按价格排序使用数值类型的price_value
+    price_value = indexes.FloatField(model_attr="price")
+    price_range = indexes.IntegerField(faceted=True)
+    category = indexes.IntegerField(model_attr="category_id", faceted=True)
+    brand = indexes.IntegerField(model_attr="goods__brand_id", faceted=True)
+    sales = indexes.IntegerField(model_attr="sales")
+    in_stock = indexes.BooleanField(faceted=True)
 
     def get_model(self):
         """返回建立索引的模型类"""
@@ -19,5 +28,14 @@ class SKUIndex(indexes.SearchIndex, indexes.Indexable):
 
     def index_queryset(self, using=None):
         """返回要建立索引的数据查询集"""
-        return self.get_model().objects.filter(is_launched=True)
+        return self.get_model().objects.filter(is_launched=True).select_related("goods")
 
+    def prepare_price_range(self, obj):
+        """价格所在的区间序号，见 constants.SEARCH_PRICE_RANGES"""
+        for index, (low, high) in enumerate(constants.SEARCH_PRICE_RANGES):
+            if high is None or obj.price < high:
+                return index
+        return len(constants.SEARCH_PRICE_RANGES) - 1
+
+    def prepare_in_stock(self, obj):
+        return obj.stock > 0
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from goods.autocomplete import update_sku_name, remove_sku_name
+from goods.category_tree import bump_category_tree_version
+from goods.list_cache import bump_sku_list_generation
+from goods.models import SKU, GoodsCategory, GoodsChannel
+from goods.rankings import update_ranking_member, remove_ranking_member
+from goods.sku_cache import invalidate_sku_cards, add_sku_id, remove_sku_id, invalidate_category_sku_count
+
+
+@receiver(post_save, sender=SKU)
+def sku_saved(sender, instance, created, **kwargs):
+    """sku修改后删除卡片缓存和所属分类的数量缓存、列表缓存，更新销量排行和自动补全，包括后台(admin/xadmin)的编辑"""
+    # 事务提交后才删除，提交前的并发读取不会把旧数据重新写入缓存
+    transaction.on_commit(lambda: invalidate_sku_cards([instance.id]))
+    transaction.on_commit(lambda: invalidate_category_sku_count([instance.category_id]))
+    transaction.on_commit(lambda: bump_sku_list_generation([instance.category_id]))
+    update_ranking_member(instance)
+    update_sku_name(instance)
+    if created:
+        add_sku_id(instance.id)
+
+
+@receiver(post_delete, sender=SKU)
+def sku_deleted(sender, instance, **kwargs):
+    """sku删除后删除卡片缓存、分类数量缓存、列表缓存、销量排行、自动补全和id"""
+    # 事务提交后才删除，提交前的并发读取不会把旧数据重新写入缓存
+    transaction.on_commit(lambda: invalidate_sku_cards([instance.id]))
+    transaction.on_commit(lambda: invalidate_category_sku_count([instance.category_id]))
+    transaction.on_commit(lambda: bump_sku_list_generation([instance.category_id]))
+    remove_ranking_member(instance)
+    remove_sku_name(instance.id)
+    remove_sku_id(instance.id)
+
+
+@receiver(post_save, sender=GoodsCategory)
+@receiver(post_delete, sender=GoodsCategory)
+@receiver(post_save, sender=GoodsChannel)
+@receiver(post_delete, sender=GoodsChannel)
+def category_changed(sender, **kwargs):
+    """分类或频道修改后更新分类菜单版本，事务提交后才更新，避免读到旧数据的菜单缓存成新版本"""
+    transaction.on_commit(bump_category_tree_version)
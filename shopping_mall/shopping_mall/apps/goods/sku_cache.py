@@ -0,0 +1,193 @@
+"""
+sku卡片缓存
+
+购物车、结算页、浏览记录只用到sku的少数几个字段，按 sku_card_<sku_id> 缓存为json，
+一次MGET批量读取，未命中的一条sql查询后回填；sku保存或删除时由信号删除缓存
+另外在 sku_ids 集合中缓存所有sku id，用于不查数据库判断sku是否存在，集合中没有的id再查询一次数据库，
+查询不到的id短时间记录在 sku_missing_<sku_id> 中，重复请求不存在的id不会每次都查询数据库；
+集合有过期时间，过期后由异步任务整体重建，重建完成前按id查询数据库，漏加的id（批量导入、重建期间新增等）不会一直被判断为不存在；
+在 category_sku_count_<category_id> 中缓存分类下上架的sku数量，列表分页不再每页执行COUNT(*)
+"""
+import json
+import logging
+import uuid
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from goods import constants
+from goods.models import SKU
+from shopping_mall.utils.redis_script import RedisScript
+from shopping_mall.utils.stats import latency, incr_counters
+
+logger = logging.getLogger("django")
+
+SKU_CARD_KEY = "sku_card_%s"
+SKU_CARD_FIELDS = ("id", "name", "price", "default_image_url", "comments", "is_launched")
+SKU_IDS_KEY = "sku_ids"
+SKU_IDS_BUILD_LOCK_KEY = "sku_ids_building"
+SKU_MISSING_KEY = "sku_missing_%s"
+CATEGORY_SKU_COUNT_KEY = "category_sku_count_%s"
+
+# 集合存在时才添加，集合不存在时由下一次查询调度整体重建；同时删除不存在的标记
+ADD_SKU_ID_SCRIPT = RedisScript("default", """
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('sadd', KEYS[1], ARGV[1])
+end
+redis.call('del', KEYS[2])
+return 1
+""")
+
+
+def get_cache_connection():
+    return get_redis_connection("default")
+
+
+def _to_card(values):
+    card = dict(values)
+    card["price"] = str(card["price"])
+    return card
+
+
+def get_sku_cards(sku_id_list):
+    """
+    批量获取sku卡片
+    :param sku_id_list: sku id列表
+    :return: {sku_id: {"id":, "name":, "price":, "default_image_url":, "comments":, "is_launched":}}
+             不存在的sku不在结果中
+    """
+    sku_id_list = [int(sku_id) for sku_id in sku_id_list]
+    if not sku_id_list:
+        return {}
+
+    with latency("sku_card.get"):
+        redis_conn = get_cache_connection()
+        cards = {}
+        try:
+            values = redis_conn.mget([SKU_CARD_KEY % sku_id for sku_id in sku_id_list])
+        except RedisError as e:
+            # 缓存不可用时直接查数据库
+            logger.warning("读取sku卡片缓存失败: %s" % e)
+            values = [None] * len(sku_id_list)
+
+        misses = []
+        for sku_id, value in zip(sku_id_list, values):
+            if value is None:
+                misses.append(sku_id)
+            else:
+                cards[sku_id] = json.loads(value.decode())
+
+        if misses:
+            pl = redis_conn.pipeline(transaction=False)
+            for values in SKU.objects.filter(id__in=misses).values(*SKU_CARD_FIELDS):
+                card = _to_card(values)
+                cards[card["id"]] = card
+                pl.setex(SKU_CARD_KEY % card["id"], constants.SKU_CARD_CACHE_EXPIRES, json.dumps(card))
+            try:
+                pl.execute()
+            except RedisError as e:
+                logger.warning("回填sku卡片缓存失败: %s" % e)
+
+    incr_counters({"sku_card.hit": len(sku_id_list) - len(misses), "sku_card.miss": len(misses)})
+    return cards
+
+
+def invalidate_sku_cards(sku_id_list):
+    """删除sku卡片缓存，redis不可用时只记录日志，不影响sku的保存"""
+    if not sku_id_list:
+        return
+    try:
+        get_cache_connection().delete(*[SKU_CARD_KEY % sku_id for sku_id in sku_id_list])
+    except RedisError as e:
+        logger.error("删除sku卡片缓存[异常][ sku_id: %s, message: %s ]" % (list(sku_id_list), e))
+
+
+def build_sku_ids():
+    """从数据库重建sku id集合，先写临时key再改名，不会读到不完整的集合，完成后释放重建锁"""
+    redis_conn = get_cache_connection()
+    tmp_key = "%s_building_%s" % (SKU_IDS_KEY, uuid.uuid4().hex)
+    try:
+        # 0作为占位，保证没有商品时集合也存在
+        batch = [0]
+        for sku_id in SKU.objects.values_list("id", flat=True).order_by("id").iterator():
+            batch.append(sku_id)
+            if len(batch) >= constants.SKU_IDS_BUILD_BATCH_SIZE:
+                redis_conn.sadd(tmp_key, *batch)
+                batch = []
+        if batch:
+            redis_conn.sadd(tmp_key, *batch)
+        pl = redis_conn.pipeline()
+        pl.rename(tmp_key, SKU_IDS_KEY)
+        pl.expire(SKU_IDS_KEY, constants.SKU_IDS_CACHE_EXPIRES)
+        pl.execute()
+    finally:
+        redis_conn.delete(tmp_key, SKU_IDS_BUILD_LOCK_KEY)
+
+
+def schedule_build_sku_ids(redis_conn):
+    """调度重建sku id集合的任务，重建完成或锁超时前只调度一次"""
+    if not redis_conn.set(SKU_IDS_BUILD_LOCK_KEY, 1, nx=True, ex=constants.SKU_IDS_BUILD_LOCK_TIMEOUT):
+        return
+    try:
+        from celery_tasks.goods.tasks import build_sku_ids as build_task
+        build_task.delay()
+    except Exception as e:
+        redis_conn.delete(SKU_IDS_BUILD_LOCK_KEY)
+        logger.error("调度重建sku id集合[异常][ message: %s ]" % e)
+
+
+def sku_exists(sku_id):
+    """
+    判断sku是否存在，先查询缓存的id集合，集合中没有时查询数据库，存在则补充到集合，不存在则短时间记录
+    集合不存在时调度异步重建，本次按id查询数据库
+    """
+    redis_conn = get_cache_connection()
+    pl = redis_conn.pipeline()
+    pl.exists(SKU_IDS_KEY)
+    pl.sismember(SKU_IDS_KEY, sku_id)
+    pl.exists(SKU_MISSING_KEY % sku_id)
+    exists, is_member, is_missing = pl.execute()
+    if is_member:
+        return True
+    if is_missing:
+        return False
+    if not exists:
+        schedule_build_sku_ids(redis_conn)
+        return SKU.objects.filter(id=sku_id).exists()
+    if not SKU.objects.filter(id=sku_id).exists():
+        redis_conn.setex(SKU_MISSING_KEY % sku_id, constants.SKU_MISSING_CACHE_EXPIRES, 1)
+        return False
+    # 没有经过信号添加的sku，或者在重建集合期间新增、被改名覆盖的sku
+    incr_counters({"sku_ids.repair": 1})
+    add_sku_id(sku_id)
+    return True
+
+
+def add_sku_id(sku_id):
+    ADD_SKU_ID_SCRIPT(keys=[SKU_IDS_KEY, SKU_MISSING_KEY % sku_id], args=[sku_id])
+
+
+def remove_sku_id(sku_id):
+    get_cache_connection().srem(SKU_IDS_KEY, sku_id)
+
+
+def get_category_sku_count(category_id):
+    """分类下上架的sku数量，缓存未命中时查询一次"""
+    redis_conn = get_cache_connection()
+    key = CATEGORY_SKU_COUNT_KEY % category_id
+    count = redis_conn.get(key)
+    if count is not None:
+        return int(count)
+    count = SKU.objects.filter(category_id=category_id, is_launched=True).count()
+    redis_conn.setex(key, constants.CATEGORY_SKU_COUNT_CACHE_EXPIRES, count)
+    return count
+
+
+def invalidate_category_sku_count(category_id_list):
+    """删除分类sku数量缓存，redis不可用时只记录日志，不影响sku的保存"""
+    if not category_id_list:
+        return
+    try:
+        get_cache_connection().delete(*[CATEGORY_SKU_COUNT_KEY % category_id for category_id in category_id_list])
+    except RedisError as e:
+        logger.error("删除分类sku数量缓存[异常][ category_id: %s, message: %s ]" % (list(category_id_list), e))
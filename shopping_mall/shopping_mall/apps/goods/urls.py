@@ -4,7 +4,10 @@ from rest_framework.routers import DefaultRouter
 from . import views
 
 urlpatterns = [
-    url(r"^categories/(?P<category_id>\d+)/skus/$", views.SKUListView.as_view())
+    url(r"^categories/$", views.CategoryTreeView.as_view()),
+    url(r"^categories/(?P<category_id>\d+)/skus/$", views.SKUListView.as_view()),
+    url(r"^categories/(?P<category_id>\d+)/hotskus/$", views.HotSKUListView.as_view()),
+    url(r"^skus/autocomplete/$", views.SKUAutocompleteView.as_view()),
 ]
 router = DefaultRouter()
 router.register("skus/search", views.SKUSearchViewSet, base_name="skus_search")
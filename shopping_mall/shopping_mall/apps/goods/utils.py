@@ -1,11 +1,11 @@
 from collections import OrderedDict
 
-from .models import GoodsChannel
+from goods.category_tree import get_category_tree
 
 
 def get_categories():
     """
-    获取商城商品分类菜单
+    获取商城商品分类菜单，供模板渲染使用，数据来自缓存的分类菜单
     :return 菜单字典
     """
     # 商品频道及分类菜单
@@ -20,25 +20,6 @@ def get_categories():
     #     }
     # }
     categories = OrderedDict()
-    channels = GoodsChannel.objects.order_by('group_id', 'sequence')
-    for channel in channels:
-        group_id = channel.group_id  # 当前组
-
-        if group_id not in categories:
-            categories[group_id] = {'channels': [], 'sub_cats': []}
-
-        cat1 = channel.category  # 当前频道的类别
-
-        # 追加当前频道
-        categories[group_id]['channels'].append({
-            'id': cat1.id,
-            'name': cat1.name,
-            'url': channel.url
-        })
-        # 构建当前类别的子类别
-        for cat2 in cat1.goodscategory_set.all():
-            cat2.sub_cats = []
-            for cat3 in cat2.goodscategory_set.all():
-                cat2.sub_cats.append(cat3)
-            categories[group_id]['sub_cats'].append(cat2)
-    return categories
\ No newline at end of file
+    for group in get_category_tree():
+        categories[group['group_id']] = group
+    return categories
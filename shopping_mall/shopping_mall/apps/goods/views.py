@@ -1,16 +1,39 @@
 from django.db.models import Q
+from django.http import HttpResponse
 from django.shortcuts import render
 
 # Create your views here.
+from drf_haystack.filters import HaystackFilter
 from drf_haystack.viewsets import HaystackViewSet
 from rest_framework.filters import OrderingFilter
 from rest_framework.generics import ListAPIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from goods import constants
+from goods.autocomplete import complete
+from goods.category_tree import get_category_tree
+from goods.filters import SKUSearchFilter
+from goods.list_cache import get_cached_list
 from goods.models import SKU
+from goods.rankings import RankedSKUList
+from goods.search_cache import get_cached_search
 from goods.serializers import SKUSerializer, SKUIndexSerializer
+from goods.sku_cache import get_category_sku_count
+from shopping_mall.utils.pagination import KeysetPagination, CachedCountPagination
+
+
+# /categories/
+class CategoryTreeView(APIView):
+    """商品分类菜单"""
+
+    def get(self, request):
+        return Response(get_category_tree())
 
 
 # /categories/(?P<category_id>\d+)/skus?page=xxx&page_size=xxx&
+# /categories/(?P<category_id>\d+)/skus?cursor=xxx&page_size=xxx&   游标分页，第一页cursor为空
 class SKUListView(ListAPIView):
     serializer_class = SKUSerializer
     # 分页操作  直接在配置文件中设置
@@ -18,19 +41,134 @@ class SKUListView(ListAPIView):
     # 排序
     filter_backends = (OrderingFilter,)
     ordering_fields = ("create_time", "price", "sales")
+    # 游标分页没有指定排序时的默认排序
+    keyset_ordering = "-create_time"
+
+    @property
+    def paginator(self):
+        """请求中有cursor参数时使用游标分页，否则使用页码分页，两者的总数都来自缓存"""
+        if not hasattr(self, "_paginator"):
+            if KeysetPagination.cursor_query_param in self.request.query_params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = CachedCountPagination()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        """内容协商选择json时使用缓存的响应，命中时直接返回；其他格式正常生成"""
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return super(SKUListView, self).list(request, *args, **kwargs)
+
+        def build():
+            response = super(SKUListView, self).list(request, *args, **kwargs)
+            return request.accepted_renderer.render(response.data, renderer_context=self.get_renderer_context())
+
+        body = get_cached_list(self.kwargs["category_id"], request.query_params, build,
+                               request.build_absolute_uri("/"))
+        return HttpResponse(body, content_type=request.accepted_renderer.media_type)
 
     def get_queryset(self):
         category_id = self.kwargs["category_id"]
-        # a = SKU.objects.filter(is_launched=True)[0]
-        # b = a.category_id
-        # b = type(b)
-        # c = a.category
         return SKU.objects.filter(category_id=category_id, is_launched=True)
 
+    def filter_queryset(self, queryset):
+        """页码分页按销量排序时按销量排行的名次取sku"""
+        queryset = super(SKUListView, self).filter_queryset(queryset)
+        if isinstance(self.paginator, CachedCountPagination):
+            ordering = OrderingFilter().get_ordering(self.request, queryset, self)
+            if ordering and ordering[0] in ("sales", "-sales"):
+                return RankedSKUList(self.kwargs["category_id"], descending=ordering[0] == "-sales")
+        return queryset
+
+    def get_total_count(self):
+        return get_category_sku_count(self.kwargs["category_id"])
+
+    def get_keyset_ordering(self):
+        """游标分页只支持一个排序字段"""
+        ordering = OrderingFilter().get_ordering(self.request, self.get_queryset(), self)
+        return ordering[0] if ordering else self.keyset_ordering
+
+
+# /categories/(?P<category_id>\d+)/hotskus/?limit=xxx
+class HotSKUListView(ListAPIView):
+    """分类热销商品，按销量排行取前limit个"""
+    serializer_class = SKUSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        try:
+            limit = int(self.request.query_params.get("limit", constants.HOT_SKUS_LIMIT))
+        except ValueError:
+            limit = constants.HOT_SKUS_LIMIT
+        limit = max(1, min(limit, constants.HOT_SKUS_MAX_LIMIT))
+        return RankedSKUList(self.kwargs["category_id"])[0:limit]
+
+
+# /skus/autocomplete/?q=xxx&limit=xxx
+class SKUAutocompleteView(APIView):
+    """sku名称自动补全，返回名称中有词以输入内容开头的上架sku"""
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", constants.AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = constants.AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, constants.AUTOCOMPLETE_MAX_LIMIT))
+        return Response(complete(request.query_params.get("q", ""), limit))
+
 
 class SKUSearchViewSet(HaystackViewSet):
     """
     SKU搜索
+    /skus/search/?text=xxx&category=&brand=&price_min=&price_max=&in_stock=1&ordering=-sales&page=&page_size=
     """
     index_models = [SKU]
-    serializer_class = SKUIndexSerializer
\ No newline at end of file
+    serializer_class = SKUIndexSerializer
+    filter_backends = [HaystackFilter, SKUSearchFilter]
+
+    def list(self, request, *args, **kwargs):
+        """
+        搜索结果和分面统计一起返回，分面统计在查询结果的同一次搜索中计算；
+        内容协商选择json时，相同的查询短时间内使用缓存的响应
+        """
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return self.build_response(request)
+
+        def build():
+            response = self.build_response(request)
+            return request.accepted_renderer.render(response.data, renderer_context=self.get_renderer_context())
+
+        body = get_cached_search(request.query_params, build, request.build_absolute_uri("/"))
+        return HttpResponse(body, content_type=request.accepted_renderer.media_type)
+
+    def build_response(self, request):
+        """查询搜索结果和分面统计"""
+        queryset = self.filter_queryset(self.get_queryset())
+        for field in constants.SEARCH_FACET_FIELDS:
+            queryset = queryset.facet(field)
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data["facets"] = self.get_facets(queryset)
+        return response
+
+    @staticmethod
+    def get_facets(queryset):
+        """
+        分面统计
+        :return: {"category": [{"value":, "count":}, ...], "price_range": [{"value":, "min":, "max":, "count":}, ...], ...}
+        """
+        facets = {}
+        for field, counts in queryset.facet_counts().get("fields", {}).items():
+            # 分面字段在索引中的名称为 <字段名>_exact
+            if field.endswith("_exact"):
+                field = field[:-len("_exact")]
+            items = []
+            for value, count in counts:
+                item = {"value": value, "count": count}
+                if field == "price_range":
+                    item["min"], item["max"] = constants.SEARCH_PRICE_RANGES[int(value)]
+                items.append(item)
+            facets[field] = items
+        return facets
\ No newline at end of file
@@ -0,0 +1,35 @@
+# 下单遇到数据库死锁/锁等待超时时的最大重试次数
+ORDER_SAVE_MAX_RETRIES = 3
+
+# 重试退避基数，单位秒，第n次重试等待 基数 * 2^n 加随机抖动
+ORDER_SAVE_RETRY_BACKOFF = 0.05
+
+# 需要重试的mysql错误码：1213 死锁，1205 锁等待超时
+ORDER_SAVE_RETRY_ERROR_CODES = (1213, 1205)
+
+# 热点商品库存：redis中库存预扣后，累计的扣减量同步回数据库的时间间隔，单位秒
+HOT_STOCK_FLUSH_INTERVAL = 5
+
+# 同步回数据库时每条update语句包含的商品数
+HOT_STOCK_FLUSH_BATCH_SIZE = 200
+
+# 同步/对账时持有的redis锁的超时时间，单位秒
+HOT_STOCK_LOCK_TIMEOUT = 60
+
+# 数据库中保留的已同步批次记录数
+HOT_STOCK_FLUSH_RECORDS_KEEP = 1000
+
+# 下单后续处理：SPU销量累计后写回数据库的时间间隔，单位秒
+GOODS_SALES_FLUSH_INTERVAL = 10
+
+# SPU销量写回数据库时每条update语句包含的SPU数
+GOODS_SALES_FLUSH_BATCH_SIZE = 200
+
+# SPU销量写回时持有的redis锁的超时时间，单位秒
+GOODS_SALES_LOCK_TIMEOUT = 60
+
+# 订单号机器号在redis中的租期，单位秒，进程退出后超过租期未续租的机器号可以重新分配
+ORDER_ID_WORKER_LEASE = 60
+
+# 生成订单号时距上次续租超过此时间则续租，单位秒
+ORDER_ID_WORKER_RENEW_INTERVAL = 20
@@ -0,0 +1,260 @@
+"""
+热点商品库存
+
+配置 HOT_STOCK_ENABLED 为True时启用：被标记为热点的sku，库存镜像保存在redis中，下单时用lua脚本原子预扣，
+扣减量累计在 hot_stock_delta 哈希中，由celery任务批量同步回数据库；未启用时下单不访问redis
+    hot_sku_ids             热点sku id集合
+    hot_stock_<sku_id>      redis中的可售库存
+    hot_stock_delta         尚未同步到数据库的扣减量 {sku_id: count}
+    hot_stock_delta_flushing 正在同步中的扣减量，字段 flush_id 为同步批次，与库存更新在同一个事务中记录到数据库
+"""
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+from django.db import transaction
+from django.db.models import Case, When, F, IntegerField
+from django_redis import get_redis_connection
+
+from goods.list_cache import bump_sku_list_generation
+from goods.models import SKU, Goods
+from orders import constants
+from orders.models import HotStockFlush
+from shopping_mall.utils.redis_script import RedisScript
+from shopping_mall.utils.search.signals import enqueue as enqueue_search_update
+
+HOT_SKU_IDS_KEY = "hot_sku_ids"
+HOT_STOCK_DELTA_KEY = "hot_stock_delta"
+HOT_STOCK_FLUSHING_KEY = "hot_stock_delta_flushing"
+HOT_STOCK_LOCK_KEY = "hot_stock_lock"
+HOT_STOCK_FLUSH_FLAG_KEY = "hot_stock_flush_flag"
+HOT_STOCK_KEY = "hot_stock_%s"
+# 同步中扣减量哈希中记录同步批次的字段
+FLUSH_ID_FIELD = "flush_id"
+
+# 预扣库存：只处理购物车中的热点商品，任一热点商品库存不足则一个都不扣
+# KEYS: 热点集合, 扣减量哈希, hot_stock_<sku_id1>, hot_stock_<sku_id2>, ...  ARGV: sku_id1, count1, sku_id2, count2, ...
+# 返回 -1 表示库存不足，否则返回预扣成功的热点sku id列表
+RESERVE_SCRIPT = RedisScript("hot_stock", """
+local hot = {}
+for i = 1, #ARGV, 2 do
+    if redis.call('sismember', KEYS[1], ARGV[i]) == 1 then
+        local stock = tonumber(redis.call('get', KEYS[2 + (i + 1) / 2]) or '0')
+        if stock < tonumber(ARGV[i + 1]) then
+            return -1
+        end
+        table.insert(hot, i)
+    end
+end
+local ids = {}
+for _, i in ipairs(hot) do
+    redis.call('decrby', KEYS[2 + (i + 1) / 2], ARGV[i + 1])
+    redis.call('hincrby', KEYS[2], ARGV[i], ARGV[i + 1])
+    table.insert(ids, ARGV[i])
+end
+return ids
+""")
+
+# 归还预扣的库存
+# KEYS: 扣减量哈希, hot_stock_<sku_id1>, hot_stock_<sku_id2>, ...  ARGV: sku_id1, count1, sku_id2, count2, ...
+RELEASE_SCRIPT = RedisScript("hot_stock", """
+for i = 1, #ARGV, 2 do
+    redis.call('incrby', KEYS[1 + (i + 1) / 2], ARGV[i + 1])
+    redis.call('hincrby', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+end
+return 1
+""")
+
+# 用数据库库存重置redis库存：redis库存 = 数据库库存 - 尚未同步的扣减量
+# KEYS: 扣减量哈希, 同步中扣减量哈希, hot_stock_<sku_id>  ARGV: sku_id, 数据库库存
+RESET_SCRIPT = RedisScript("hot_stock", """
+local pending = tonumber(redis.call('hget', KEYS[1], ARGV[1]) or '0')
+    + tonumber(redis.call('hget', KEYS[2], ARGV[1]) or '0')
+local stock = tonumber(ARGV[2]) - pending
+redis.call('set', KEYS[3], stock)
+return stock
+""")
+
+
+class HotStockNotEnough(Exception):
+    """热点商品库存不足"""
+    pass
+
+
+def get_hot_stock_connection():
+    return get_redis_connection("hot_stock")
+
+
+def _pairs(cart):
+    """{sku_id: count} 转为 [sku_id1, count1, sku_id2, count2, ...]"""
+    args = []
+    for sku_id, count in cart.items():
+        args.extend([sku_id, count])
+    return args
+
+
+def reserve_hot_stock(cart):
+    """
+    在redis中预扣购物车内热点商品的库存
+    :param cart: 购买的商品 {sku_id: count}
+    :return: 预扣成功的热点商品 {sku_id: count}，未启用热点商品库存时为空
+    """
+    if not settings.HOT_STOCK_ENABLED:
+        return {}
+    keys = [HOT_SKU_IDS_KEY, HOT_STOCK_DELTA_KEY] + [HOT_STOCK_KEY % sku_id for sku_id in cart]
+    ret = RESERVE_SCRIPT(keys=keys, args=_pairs(cart))
+    if ret == -1:
+        raise HotStockNotEnough
+    return {int(sku_id): cart[int(sku_id)] for sku_id in ret}
+
+
+def release_hot_stock(hot_cart):
+    """
+    订单保存失败时归还预扣的热点商品库存
+    :param hot_cart: reserve_hot_stock的返回值
+    """
+    if not hot_cart:
+        return
+    keys = [HOT_STOCK_DELTA_KEY] + [HOT_STOCK_KEY % sku_id for sku_id in hot_cart]
+    RELEASE_SCRIPT(keys=keys, args=_pairs(hot_cart))
+
+
+def schedule_flush():
+    """每个同步周期内最多提交一次同步任务"""
+    redis_conn = get_hot_stock_connection()
+    if redis_conn.set(HOT_STOCK_FLUSH_FLAG_KEY, 1, nx=True, ex=constants.HOT_STOCK_FLUSH_INTERVAL):
+        from celery_tasks.stock.tasks import flush_hot_stock
+        flush_hot_stock.apply_async(countdown=constants.HOT_STOCK_FLUSH_INTERVAL)
+
+
+def _case(deltas, field, sign):
+    return Case(*[When(id=pk, then=F(field) + sign * count) for pk, count in deltas.items()],
+                output_field=IntegerField())
+
+
+def _take_flushing(redis_conn):
+    """
+    取得正在同步的扣减量，没有时把当前扣减量整体换到同步中的key并分配同步批次，之后的扣减写入新的哈希
+    上次同步已写入数据库但没有删除的扣减量直接删除
+    :return: (同步批次, {sku_id: count})，没有需要同步的扣减量时返回 (None, {})
+    """
+    while True:
+        if not redis_conn.exists(HOT_STOCK_FLUSHING_KEY):
+            if not redis_conn.exists(HOT_STOCK_DELTA_KEY):
+                return None, {}
+            redis_conn.rename(HOT_STOCK_DELTA_KEY, HOT_STOCK_FLUSHING_KEY)
+        # 改名后没有来得及记录批次时重新分配，这部分扣减量还没有写入数据库
+        redis_conn.hsetnx(HOT_STOCK_FLUSHING_KEY, FLUSH_ID_FIELD, uuid.uuid4().hex)
+        flushing = redis_conn.hgetall(HOT_STOCK_FLUSHING_KEY)
+        flush_id = flushing.pop(FLUSH_ID_FIELD.encode()).decode()
+        if not HotStockFlush.objects.filter(flush_id=flush_id).exists():
+            return flush_id, {int(sku_id): int(count) for sku_id, count in flushing.items() if int(count)}
+        redis_conn.delete(HOT_STOCK_FLUSHING_KEY)
+
+
+def flush_hot_stock():
+    """
+    把redis中累计的扣减量批量同步到数据库的 SKU.stock/SKU.sales 和 Goods.sales
+    同步批次与库存更新在同一个事务中保存，重试时不会重复累加
+    :return: 同步的sku数量
+    """
+    redis_conn = get_hot_stock_connection()
+    with redis_conn.lock(HOT_STOCK_LOCK_KEY, timeout=constants.HOT_STOCK_LOCK_TIMEOUT):
+        flush_id, sku_deltas = _take_flushing(redis_conn)
+        if flush_id is None:
+            return 0
+
+        sku_id_list = sorted(sku_deltas.keys())
+        category_id_list = set()
+        with transaction.atomic():
+            for i in range(0, len(sku_id_list), constants.HOT_STOCK_FLUSH_BATCH_SIZE):
+                batch = {sku_id: sku_deltas[sku_id] for sku_id in
+                         sku_id_list[i:i + constants.HOT_STOCK_FLUSH_BATCH_SIZE]}
+                SKU.objects.filter(id__in=batch.keys()).update(
+                    stock=_case(batch, "stock", -1), sales=_case(batch, "sales", 1))
+
+                goods_deltas = defaultdict(int)
+                for sku_id, goods_id, category_id in SKU.objects.filter(id__in=batch.keys()).values_list(
+                        "id", "goods_id", "category_id"):
+                    goods_deltas[goods_id] += batch[sku_id]
+                    category_id_list.add(category_id)
+                Goods.objects.filter(id__in=goods_deltas.keys()).update(sales=_case(goods_deltas, "sales", 1))
+            record = HotStockFlush.objects.create(flush_id=flush_id)
+            # 只需要保留最近的批次，用于判断没有删除的扣减量是否已经同步
+            HotStockFlush.objects.filter(id__lte=record.id - constants.HOT_STOCK_FLUSH_RECORDS_KEEP).delete()
+
+        # 数据库提交后才删除，删除失败时下次同步发现批次已记录，直接删除
+        redis_conn.delete(HOT_STOCK_FLUSHING_KEY)
+        # 库存和销量变化，分类商品列表缓存过期
+        bump_sku_list_generation(category_id_list)
+        # 数据库已更新，再更新搜索索引中的销量和库存状态，售罄的商品重新生成详情页
+        # （批量update不触发post_save，需要手动加入搜索更新队列）
+        for sku_id in sku_id_list:
+            enqueue_search_update(SKU, sku_id)
+        sold_out = list(SKU.objects.filter(id__in=sku_id_list, stock__lte=0).values_list("id", flat=True))
+        if sold_out:
+            from celery_tasks.html.tasks import generate_static_skus_detail_html
+            generate_static_skus_detail_html.delay(sold_out)
+        return len(sku_id_list)
+
+
+def reset_hot_stock(redis_conn, sku_id, stock):
+    """用数据库库存重置一个热点商品的redis库存"""
+    RESET_SCRIPT(keys=[HOT_STOCK_DELTA_KEY, HOT_STOCK_FLUSHING_KEY, HOT_STOCK_KEY % sku_id],
+                 args=[sku_id, stock], client=redis_conn)
+
+
+def enable_hot_stock(sku_id_list):
+    """把sku标记为热点商品，库存镜像到redis；需要配置 HOT_STOCK_ENABLED 为True，否则下单不使用redis中的库存"""
+    redis_conn = get_hot_stock_connection()
+    with redis_conn.lock(HOT_STOCK_LOCK_KEY, timeout=constants.HOT_STOCK_LOCK_TIMEOUT):
+        for sku_id, stock in SKU.objects.filter(id__in=sku_id_list).values_list("id", "stock"):
+            reset_hot_stock(redis_conn, sku_id, stock)
+            redis_conn.sadd(HOT_SKU_IDS_KEY, sku_id)
+
+
+def disable_hot_stock(sku_id_list):
+    """
+    取消热点标记，新的订单直接扣数据库库存
+    先把扣减量同步回数据库再取消标记，新订单检查数据库库存时已包含之前的扣减；
+    同步期间仍在redis中预扣的少量扣减量在取消标记后再同步一次
+    """
+    redis_conn = get_hot_stock_connection()
+    flush_hot_stock()
+    redis_conn.srem(HOT_SKU_IDS_KEY, *sku_id_list)
+    flush_hot_stock()
+    redis_conn.delete(*[HOT_STOCK_KEY % sku_id for sku_id in sku_id_list])
+
+
+def reconcile_hot_stock(repair=False):
+    """
+    对账：redis库存应等于 数据库库存 - 尚未同步的扣减量
+    :param repair: 是否用数据库库存修复redis库存
+    :return: 有偏差的商品 [(sku_id, redis库存, 期望库存)]
+    """
+    redis_conn = get_hot_stock_connection()
+    drifts = []
+    with redis_conn.lock(HOT_STOCK_LOCK_KEY, timeout=constants.HOT_STOCK_LOCK_TIMEOUT):
+        # 已写入数据库的同步中扣减量先删除，不重复计算
+        _take_flushing(redis_conn)
+        sku_id_list = [int(sku_id) for sku_id in redis_conn.smembers(HOT_SKU_IDS_KEY)]
+        db_stocks = dict(SKU.objects.filter(id__in=sku_id_list).values_list("id", "stock"))
+        for sku_id in sku_id_list:
+            if sku_id not in db_stocks:
+                # 商品已被删除
+                redis_conn.srem(HOT_SKU_IDS_KEY, sku_id)
+                continue
+
+            pl = redis_conn.pipeline(transaction=True)
+            pl.get(HOT_STOCK_KEY % sku_id)
+            pl.hget(HOT_STOCK_DELTA_KEY, sku_id)
+            pl.hget(HOT_STOCK_FLUSHING_KEY, sku_id)
+            redis_stock, pending, flushing = pl.execute()
+            redis_stock = int(redis_stock or 0)
+            expected = db_stocks[sku_id] - int(pending or 0) - int(flushing or 0)
+            if redis_stock != expected:
+                drifts.append((sku_id, redis_stock, expected))
+                if repair:
+                    reset_hot_stock(redis_conn, sku_id, db_stocks[sku_id])
+    return drifts
@@ -77,3 +77,17 @@ class OrderGoods(BaseModel):
         db_table = "tb_order_goods"
         verbose_name = '订单商品'
         verbose_name_plural = verbose_name
+
+
+class HotStockFlush(models.Model):
+    """
+    已同步到数据库的热点商品扣减量批次，与库存更新在同一个事务中保存，
+    同步后删除redis中的扣减量失败时，下次同步不会重复累加
+    """
+    flush_id = models.CharField(max_length=32, unique=True, verbose_name="同步批次")
+    create_time = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    class Meta:
+        db_table = "tb_hot_stock_flush"
+        verbose_name = '热点库存同步批次'
+        verbose_name_plural = verbose_name
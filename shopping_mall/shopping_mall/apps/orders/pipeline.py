@@ -0,0 +1,153 @@
+"""
+下单后续处理
+
+下单请求只负责在事务中保存订单和扣减库存，提交后发布“订单已创建”事件，
+由celery异步处理（ORDER_PIPELINE_EAGER 为True或celery不可用时在当前进程内处理）：
+    1. SPU销量累计到redis的 goods_sales_delta 哈希，定期批量用F()累加回数据库
+    2. 删除购物车中已购买的商品
+    3. 库存售罄的商品重新生成详情页，更新搜索索引中的库存状态
+    4. 库存和销量变化的分类商品列表缓存过期
+    热点商品的库存在同步回数据库之前数据库中仍是旧值，3、4 由热点库存同步在写入数据库后处理
+    5. 累加分类sku销量排行
+"""
+import time
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Case, When, F, IntegerField
+from django_redis import get_redis_connection
+
+from carts.repository import CartRepository
+from goods.list_cache import bump_sku_list_generation
+from goods.models import SKU, Goods
+from goods.rankings import incr_sales_rankings
+from orders import constants
+from shopping_mall.utils.search.signals import enqueue as enqueue_search_update
+from shopping_mall.utils.stats import latency, record_latency
+
+logger = logging.getLogger("django")
+
+GOODS_SALES_DELTA_KEY = "goods_sales_delta"
+GOODS_SALES_FLUSHING_KEY = "goods_sales_delta_flushing"
+GOODS_SALES_LOCK_KEY = "goods_sales_lock"
+GOODS_SALES_FLUSH_FLAG_KEY = "goods_sales_flush_flag"
+
+
+def get_orders_connection():
+    return get_redis_connection("orders")
+
+
+def publish_order_placed(order, skus, cart, hot_cart):
+    """
+    订单事务提交后发布订单已创建事件
+    :param order: 订单对象
+    :param skus: 订单商品sku列表
+    :param cart: 购买的商品 {sku_id: count}
+    :param hot_cart: redis中预扣库存的热点商品 {sku_id: count}，其SPU销量由热点库存同步负责
+    """
+    goods_sales = defaultdict(int)
+    category_ids = set()
+    for sku in skus:
+        if sku.id not in hot_cart:
+            goods_sales[sku.goods_id] += cart[sku.id]
+            category_ids.add(sku.category_id)
+
+    # celery使用json序列化，字典的键统一用字符串
+    event = {
+        "order_id": order.order_id,
+        "user_id": order.user_id,
+        "goods_sales": {str(goods_id): count for goods_id, count in goods_sales.items()},
+        "sku_ids": [sku_id for sku_id in cart if sku_id not in hot_cart],
+        "purchased": {str(sku_id): count for sku_id, count in cart.items()},
+        "category_ids": list(category_ids),
+        "sku_categories": {str(sku.id): sku.category_id for sku in skus},
+        "published": time.time(),
+    }
+
+    if not settings.ORDER_PIPELINE_EAGER:
+        try:
+            from celery_tasks.orders.tasks import handle_order_placed as handle_task
+            handle_task.delay(event)
+            return
+        except Exception as e:
+            logger.error("发布订单事件[异常][ order_id: %s, message: %s ]" % (order.order_id, e))
+
+    # 同步执行，或celery不可用时退化为同步执行
+    handle_order_placed(event)
+
+
+def handle_order_placed(event):
+    """处理订单已创建事件"""
+    record_latency("pipeline.lag", time.time() - event["published"])
+
+    with latency("pipeline.goods_sales"):
+        add_goods_sales(event["goods_sales"])
+
+    with latency("pipeline.cart"):
+        purchased = {int(sku_id): count for sku_id, count in event["purchased"].items()}
+        CartRepository(event["user_id"]).remove_purchased(purchased)
+
+    with latency("pipeline.sku_list"):
+        bump_sku_list_generation(event.get("category_ids", []))
+
+    with latency("pipeline.rankings"):
+        incr_sales_rankings({int(sku_id): (category_id, event["purchased"][sku_id])
+                             for sku_id, category_id in event.get("sku_categories", {}).items()})
+
+    with latency("pipeline.sold_out"):
+        sold_out = list(SKU.objects.filter(id__in=event["sku_ids"], stock__lte=0).values_list("id", flat=True))
+        if sold_out:
+            from celery_tasks.html.tasks import generate_static_skus_detail_html
+            generate_static_skus_detail_html.delay(sold_out)
+            # 搜索索引中的库存状态
+            for sku_id in sold_out:
+                enqueue_search_update(SKU, sku_id)
+
+
+def add_goods_sales(goods_sales):
+    """
+    SPU销量先累计在redis中，每个同步周期批量写回一次数据库
+    :param goods_sales: {goods_id: count}
+    """
+    if not goods_sales:
+        return
+    redis_conn = get_orders_connection()
+    pl = redis_conn.pipeline()
+    for goods_id, count in goods_sales.items():
+        pl.hincrby(GOODS_SALES_DELTA_KEY, goods_id, count)
+    pl.execute()
+
+    if settings.ORDER_PIPELINE_EAGER:
+        flush_goods_sales()
+    elif redis_conn.set(GOODS_SALES_FLUSH_FLAG_KEY, 1, nx=True, ex=constants.GOODS_SALES_FLUSH_INTERVAL):
+        from celery_tasks.orders.tasks import flush_goods_sales as flush_task
+        flush_task.apply_async(countdown=constants.GOODS_SALES_FLUSH_INTERVAL)
+
+
+def flush_goods_sales():
+    """
+    把redis中累计的SPU销量批量累加到数据库
+    :return: 更新的SPU数量
+    """
+    redis_conn = get_orders_connection()
+    with redis_conn.lock(GOODS_SALES_LOCK_KEY, timeout=constants.GOODS_SALES_LOCK_TIMEOUT):
+        # 上次失败残留的数据优先处理
+        if not redis_conn.exists(GOODS_SALES_FLUSHING_KEY):
+            if not redis_conn.exists(GOODS_SALES_DELTA_KEY):
+                return 0
+            redis_conn.rename(GOODS_SALES_DELTA_KEY, GOODS_SALES_FLUSHING_KEY)
+
+        deltas = {int(goods_id): int(count) for goods_id, count in
+                  redis_conn.hgetall(GOODS_SALES_FLUSHING_KEY).items()}
+        goods_id_list = sorted(deltas.keys())
+        for i in range(0, len(goods_id_list), constants.GOODS_SALES_FLUSH_BATCH_SIZE):
+            batch = goods_id_list[i:i + constants.GOODS_SALES_FLUSH_BATCH_SIZE]
+            Goods.objects.filter(id__in=batch).update(
+                sales=Case(*[When(id=goods_id, then=F("sales") + deltas[goods_id]) for goods_id in batch],
+                           output_field=IntegerField()))
+            # 每批提交后从哈希中删除，失败时只重试未完成的部分
+            redis_conn.hdel(GOODS_SALES_FLUSHING_KEY, *batch)
+
+        redis_conn.delete(GOODS_SALES_FLUSHING_KEY)
+        return len(goods_id_list)
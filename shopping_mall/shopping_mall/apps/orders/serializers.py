@@ -1,12 +1,17 @@
 from decimal import Decimal
-from django.db import transaction
-from django.utils import timezone
-from django_redis import get_redis_connection
+from django.db import transaction, DatabaseError
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from carts.repository import CartRepository
 from goods.models import SKU
-from orders.models import OrderInfo, OrderGoods
+from orders import constants
+from orders.models import OrderInfo
+from orders.hot_stock import reserve_hot_stock, release_hot_stock, schedule_flush, HotStockNotEnough
+from orders.pipeline import publish_order_placed
+from orders.utils import generate_order_id, get_skus, reserve_stock, save_order_goods, StockNotEnough, \
+    is_retryable_error, retry_backoff
+from shopping_mall.utils.stats import latency
 import logging
 
 logger = logging.getLogger("django")
@@ -55,9 +60,67 @@ class SaveOrderSerializer(serializers.ModelSerializer):
         pay_method = validated_data["pay_method"]
 
         # 生成订单编号
-        order_id = timezone.now().strftime("%Y%m%d%H%M%S") + ("%09d" % user.id)
+        order_id = generate_order_id()
+
+        # 从redis中获取购物车结算商品的数据
+        cart = CartRepository(user.id).get_selected()
+
+        if not cart:
+            raise serializers.ValidationError("没有需要结算的商品")
+
+        # 热点商品先在redis中预扣库存，不再争抢数据库中的同一行
+        try:
+            hot_cart = reserve_hot_stock(cart)
+        except HotStockNotEnough:
+            raise serializers.ValidationError("商品库存不足")
+
+        # 死锁或锁等待超时时整单重试，重试次数有上限
+        attempt = 0
+        while True:
+            try:
+                with latency("order.save"):
+                    order, skus = self.save_order(order_id, user, address, pay_method, cart, hot_cart)
+            except DatabaseError as e:
+                if attempt >= constants.ORDER_SAVE_MAX_RETRIES or not is_retryable_error(e):
+                    release_hot_stock(hot_cart)
+                    raise
+                retry_backoff(attempt)
+                attempt += 1
+            except Exception:
+                # 订单没有保存成功，归还预扣的热点商品库存
+                release_hot_stock(hot_cart)
+                raise
+            else:
+                break
+
+        # 热点商品的扣减量异步同步回数据库
+        # 订单已经提交，调度失败时不能返回错误，否则用户会重复下单；扣减量保留在redis中，由下一次调度同步
+        if hot_cart:
+            try:
+                schedule_flush()
+            except Exception as e:
+                logger.error("调度热点库存同步[异常][ order_id: %s, message: %s ]" % (order_id, e))
+
+        # SPU销量、删除购物车中已购买的商品等后续处理异步完成
+        # 订单已经提交，后续处理失败只记录日志，不返回错误
+        try:
+            with latency("order.publish"):
+                publish_order_placed(order, skus, cart, hot_cart)
+        except Exception as e:
+            logger.error("订单后续处理[异常][ order_id: %s, message: %s ]" % (order_id, e))
+
+        return order
+
+    @staticmethod
+    def save_order(order_id, user, address, pay_method, cart, hot_cart):
+        """
+        在一个事务中保存订单、扣减库存
+        :param cart: 购买的商品 {sku_id: count}
+        :param hot_cart: 已在redis中预扣库存的热点商品 {sku_id: count}
+        :return: 订单对象, 订单商品sku列表
+        """
+        db_cart = {sku_id: count for sku_id, count in cart.items() if sku_id not in hot_cart}
 
-        # 保存订单基本信息到orderInfo
         with transaction.atomic():
             # 创建一个保存点
             save_id = transaction.savepoint()
@@ -76,74 +139,33 @@ class SaveOrderSerializer(serializers.ModelSerializer):
                         'CASH'] else OrderInfo.ORDER_STATUS_ENUM['UNPAID']
                 )
 
-                # 从redis中获取购物车结算商品的数据
-                redis_conn = get_redis_connection("cart")
-                redis_cart = redis_conn.hgetall("cart_%s" % user.id)
-                cart_selected = redis_conn.smembers("cart_selected_%s" % user.id)
-
-                # 创建一个空字典存储购买的商品
-                cart = {}
-                for sku_id in cart_selected:
-                    cart[int(sku_id)] = int(redis_cart[sku_id])
-
-                # 从数据库中查询所购买的所有商品的数据
-                skus = SKU.objects.filter(id__in = cart.keys())
-
-                # 遍历结算的商品：
-                sku_id_list = cart.keys()
-                for sku_id in sku_id_list:
-                    while True:
-                        sku = SKU.objects.get(id=sku_id)
-                        sku_count = cart[sku.id]
-
-                        # 判断商品库粗是否充足
-                        origin_stock = sku.stock   # 原始库存
-                        origin_sales = sku.sales   # 原始销量
-                        if sku_count > origin_stock:
-                            transaction.savepoint_rollback(save_id)
-                            raise serializers.ValidationError("商品库存不足")
-
-                        # 用于演示并发下单
-                        # import time
-                        # time.sleep(5)
-
-                        # 减少库存,增加商品销量
-                        # 保存订单商品数据
-                        new_stock = origin_stock - sku_count
-                        new_sales = origin_sales + sku_count
-
-                        sku.stock = new_stock
-                        sku.sales = new_sales
-                        # sku.save()
-                        ret = SKU.objects.filter(id=sku.id, stock=origin_stock).update(stock=new_stock, sales=new_sales)
-
-                        if ret == 0:
-                            continue
-
-                        # 累计商品SPU的销量信息
-                        sku.goods.sales += sku_count
-                        sku.goods.save()
-
-                        # 累计订单基本信息的数据
-                        order.total_count += sku_count  # 累计总金额
-                        order.total_amount += (sku.price * sku_count)  # 累计总额
-
-                        # 保存订单商品
-                        OrderGoods.objects.create(
-                            order=order,
-                            sku=sku,
-                            count=sku_count,
-                            price=sku.price,
-                        )
-
-                        # 更新成功
-                        break
+                # 一条语句扣减所有非热点商品库存、增加销量
+                try:
+                    skus = reserve_stock(db_cart) if db_cart else []
+                    if hot_cart:
+                        skus += get_skus(sorted(hot_cart.keys()))
+                except SKU.DoesNotExist:
+                    transaction.savepoint_rollback(save_id)
+                    raise serializers.ValidationError("商品不存在")
+                except StockNotEnough:
+                    transaction.savepoint_rollback(save_id)
+                    raise serializers.ValidationError("商品库存不足")
+
+                # 批量保存订单商品，SPU销量在事务提交后异步累计
+                save_order_goods(order, skus, cart)
 
                 # 更新订单金额数目信息
                 order.total_amount += order.freight
                 order.save()
             except ValidationError:
                 raise
+            except DatabaseError as e:
+                # 死锁时mysql已回滚整个事务，保存点已不存在，直接抛出由外层重试
+                if is_retryable_error(e):
+                    raise
+                logger.error(e)
+                transaction.savepoint_rollback(save_id)
+                raise
             except Exception as e:
                 logger.error(e)
                 transaction.savepoint_rollback(save_id)
@@ -152,11 +174,4 @@ class SaveOrderSerializer(serializers.ModelSerializer):
             # 提交事务
             transaction.savepoint_commit(save_id)
 
-            # 在redis中,删除已购买的商品数据
-            pl = redis_conn.pipeline()
-            pl.hdel("cart_%s" % user.id, * cart_selected)
-            pl.srem("cart_selected_%s" % user.id, *cart_selected)
-            pl.execute()
-
-            return order
-
+            return order, skus
@@ -1,3 +1,70 @@
-from django.test import TestCase
+import multiprocessing
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from django_redis import get_redis_connection
+
+from orders import utils
+from orders.utils import ORDER_ID_WORKER_KEY, ORDER_ID_WORKER_SEQ_KEY, SnowflakeOrderIdGenerator, WorkerIdLease
+
+PROCESSES = 8
+IDS_PER_PROCESS = 2000
+
+
+def generate_ids(count):
+    """子进程中生成订单号，fork后重新租用机器号"""
+    return [utils.generate_order_id() for _ in range(count)]
+
+
+@override_settings(ORDER_ID_WORKER_ID=None,
+                   ORDER_ID_GENERATOR="orders.utils.SnowflakeOrderIdGenerator")
+class OrderIdTest(SimpleTestCase):
+    """订单号生成器"""
+
+    def setUp(self):
+        self.redis_conn = get_redis_connection("orders")
+        self.clear_leases()
+
+    def tearDown(self):
+        self.clear_leases()
+
+    def clear_leases(self):
+        keys = list(self.redis_conn.scan_iter(ORDER_ID_WORKER_KEY % "*"))
+        if keys:
+            self.redis_conn.delete(*keys)
+        self.redis_conn.delete(ORDER_ID_WORKER_SEQ_KEY)
+
+    def test_unique_across_processes(self):
+        """多个进程同时生成的订单号不重复"""
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(PROCESSES) as pool:
+            results = pool.map(generate_ids, [IDS_PER_PROCESS] * PROCESSES)
+        ids = [order_id for result in results for order_id in result]
+        self.assertEqual(len(ids), PROCESSES * IDS_PER_PROCESS)
+        self.assertEqual(len(set(ids)), len(ids))
+        for result in results:
+            self.assertEqual(result, sorted(result))
+
+    def test_held_worker_id_not_reallocated(self):
+        """自增序号绕回一圈后，仍被租用的机器号不会分配给新进程"""
+        held = WorkerIdLease(self.redis_conn)
+        worker_id = held.ensure()
+        # 模拟启动过 MAX_WORKER_ID 个进程，下一次自增正好落在已租用的机器号上
+        self.redis_conn.set(ORDER_ID_WORKER_SEQ_KEY, worker_id + SnowflakeOrderIdGenerator.MAX_WORKER_ID - 1)
+        other = WorkerIdLease(self.redis_conn)
+        self.assertNotEqual(other.ensure(), worker_id)
+
+    def test_lost_lease_allocates_new_worker_id(self):
+        """租约过期并被其他进程租用后，重新租用一个机器号"""
+        lease = WorkerIdLease(self.redis_conn)
+        worker_id = lease.ensure()
+        self.redis_conn.set(ORDER_ID_WORKER_KEY % worker_id, "other")
+        # 距上次续租已超过续租间隔
+        lease._renewed -= 3600
+        self.assertNotEqual(lease.ensure(), worker_id)
+
+    def test_renew_keeps_worker_id(self):
+        lease = WorkerIdLease(self.redis_conn)
+        worker_id = lease.ensure()
+        lease._renewed -= 3600
+        self.assertEqual(lease.ensure(), worker_id)
+        self.assertEqual(self.redis_conn.get(ORDER_ID_WORKER_KEY % worker_id).decode(), lease.token)
@@ -0,0 +1,240 @@
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import OperationalError
+from django.db.models import Case, When, F, Q, IntegerField
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+from goods.models import SKU, Goods
+from orders import constants
+from orders.models import OrderGoods
+from shopping_mall.utils.redis_script import RedisScript
+
+ORDER_ID_WORKER_KEY = "order_id_worker_%s"
+ORDER_ID_WORKER_SEQ_KEY = "order_id_worker_seq"
+
+# 续租机器号：仍由自己持有时延长租期，已过期且没有被其他进程租用时重新租用
+# KEYS: order_id_worker_<机器号>  ARGV: 租用标识, 租期
+# 返回 1 续租成功，0 机器号已被其他进程租用
+RENEW_WORKER_SCRIPT = RedisScript("orders", """
+local owner = redis.call('get', KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+""")
+
+
+class StockNotEnough(Exception):
+    """商品库存不足"""
+    pass
+
+
+def get_skus(sku_id_list):
+    """
+    按id顺序查询订单商品
+    :param sku_id_list: sku id列表
+    :return: sku列表，有商品不存在时抛出SKU.DoesNotExist
+    """
+    skus = list(SKU.objects.filter(id__in=sku_id_list).order_by("id"))
+    if len(skus) != len(sku_id_list):
+        raise SKU.DoesNotExist
+    return skus
+
+
+def reserve_stock(cart):
+    """
+    一次性扣减订单内所有商品的库存
+    条件更新语句按主键顺序加行锁，所有订单加锁顺序一致，不会互相死锁
+    :param cart: 购买的商品 {sku_id: count}
+    :return: 按id排序的sku列表
+    """
+    sku_id_list = sorted(cart.keys())
+    skus = get_skus(sku_id_list)
+
+    # 每个商品的库存都必须足够，库存条件和扣减在同一条语句里判断
+    condition = reduce(or_, [Q(id=sku_id, stock__gte=cart[sku_id]) for sku_id in sku_id_list])
+    ret = SKU.objects.filter(condition).update(
+        stock=Case(*[When(id=sku_id, then=F("stock") - cart[sku_id]) for sku_id in sku_id_list],
+                   output_field=IntegerField()),
+        sales=Case(*[When(id=sku_id, then=F("sales") + cart[sku_id]) for sku_id in sku_id_list],
+                   output_field=IntegerField()),
+    )
+    # 有商品没有更新成功，说明库存不足，已更新的行由调用方回滚保存点
+    if ret != len(sku_id_list):
+        raise StockNotEnough
+
+    return skus
+
+
+def save_order_goods(order, skus, cart):
+    """
+    批量保存订单商品，并累计订单的商品总数和总金额
+    :param order: 订单对象
+    :param skus: reserve_stock返回的sku列表
+    :param cart: 购买的商品 {sku_id: count}
+    """
+    order_goods = []
+    for sku in skus:
+        count = cart[sku.id]
+        order.total_count += count
+        order.total_amount += (sku.price * count)
+        order_goods.append(OrderGoods(order=order, sku=sku, count=count, price=sku.price))
+    OrderGoods.objects.bulk_create(order_goods)
+
+
+def incr_goods_sales(skus, cart):
+    """
+    按SPU合并销量后一条语句累加
+    :param skus: sku列表
+    :param cart: 购买的商品 {sku_id: count}
+    """
+    goods_sales = defaultdict(int)
+    for sku in skus:
+        goods_sales[sku.goods_id] += cart[sku.id]
+    if not goods_sales:
+        return
+
+    Goods.objects.filter(id__in=goods_sales.keys()).update(
+        sales=Case(*[When(id=goods_id, then=F("sales") + count) for goods_id, count in goods_sales.items()],
+                   output_field=IntegerField())
+    )
+
+
+def is_retryable_error(e):
+    """是否是可以重试的数据库错误（死锁、锁等待超时）"""
+    return isinstance(e, OperationalError) and bool(e.args) and e.args[0] in constants.ORDER_SAVE_RETRY_ERROR_CODES
+
+
+def retry_backoff(attempt):
+    """第attempt次重试前等待，指数退避加随机抖动"""
+    delay = constants.ORDER_SAVE_RETRY_BACKOFF * (2 ** attempt)
+    time.sleep(delay + random.uniform(0, delay))
+
+
+class SnowflakeOrderIdGenerator(object):
+    """
+    订单号生成器：毫秒时间 + 机器号 + 毫秒内序号，不访问数据库
+    格式 yyyymmddHHMMSS + 毫秒(3位) + 机器号(4位) + 序号(4位)，共25位，按时间有序
+    每个进程每毫秒最多生成 10000 个订单号
+    """
+    MAX_WORKER_ID = 10000
+    MAX_SEQUENCE = 10000
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id < self.MAX_WORKER_ID:
+            raise ValueError("worker_id超出范围: %s" % worker_id)
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now_ms = int(time.time() * 1000)
+            # 时钟回拨时沿用上次的时间，保证不重复且有序
+            if now_ms <= self._last_ms:
+                self._sequence += 1
+                if self._sequence >= self.MAX_SEQUENCE:
+                    # 本毫秒序号用完，借用下一毫秒
+                    self._last_ms += 1
+                    self._sequence = 0
+            else:
+                self._last_ms = now_ms
+                self._sequence = 0
+            ms = self._last_ms
+            sequence = self._sequence
+
+        return "%s%03d%04d%04d" % (datetime.utcfromtimestamp(ms // 1000).strftime("%Y%m%d%H%M%S"),
+                                   ms % 1000, self.worker_id, sequence)
+
+
+class WorkerIdLease(object):
+    """
+    在redis中租用的订单号机器号 order_id_worker_<机器号>，租期 ORDER_ID_WORKER_LEASE 秒
+    使用机器号前按 ORDER_ID_WORKER_RENEW_INTERVAL 续租，只有租约有效的进程使用该机器号，
+    同时在线的进程不超过 MAX_WORKER_ID 个即不会重复；租约过期后被其他进程租用时重新租用一个机器号
+    redis不可用且租约已过期时无法生成订单号，此时可以配置固定的 ORDER_ID_WORKER_ID
+    """
+
+    def __init__(self, redis_conn=None):
+        self.redis_conn = redis_conn or get_redis_connection("orders")
+        self.token = "%s:%s" % (os.getpid(), uuid.uuid4().hex)
+        self.worker_id = None
+        self._renewed = None
+
+    def acquire(self):
+        """从自增序号的位置开始找一个空闲的机器号"""
+        max_worker_id = SnowflakeOrderIdGenerator.MAX_WORKER_ID
+        start = self.redis_conn.incr(ORDER_ID_WORKER_SEQ_KEY)
+        for i in range(max_worker_id):
+            worker_id = (start + i) % max_worker_id
+            if self.redis_conn.set(ORDER_ID_WORKER_KEY % worker_id, self.token,
+                                   nx=True, ex=constants.ORDER_ID_WORKER_LEASE):
+                return worker_id
+        raise RuntimeError("没有空闲的订单号机器号")
+
+    def ensure(self):
+        """
+        返回租约有效的机器号，需要时续租或重新租用
+        续租失败（redis不可用）时，上次续租后的租期内继续使用原机器号，超过租期则抛出异常
+        """
+        now = time.monotonic()
+        if self.worker_id is not None and now - self._renewed < constants.ORDER_ID_WORKER_RENEW_INTERVAL:
+            return self.worker_id
+        try:
+            if self.worker_id is None or not RENEW_WORKER_SCRIPT(
+                    keys=[ORDER_ID_WORKER_KEY % self.worker_id], args=[self.token, constants.ORDER_ID_WORKER_LEASE],
+                    client=self.redis_conn):
+                self.worker_id = self.acquire()
+        except Exception:
+            if self.worker_id is None or now - self._renewed >= constants.ORDER_ID_WORKER_LEASE:
+                raise
+            return self.worker_id
+        self._renewed = now
+        return self.worker_id
+
+
+def allocate_worker_id(lease=None):
+    """
+    当前进程的机器号
+    优先使用配置ORDER_ID_WORKER_ID，否则使用在redis中租用的机器号，见 WorkerIdLease
+    """
+    worker_id = getattr(settings, "ORDER_ID_WORKER_ID", None)
+    if worker_id is not None:
+        return worker_id
+    return lease.ensure()
+
+
+_generator = None
+_generator_pid = None
+_lease = None
+_generator_lock = threading.Lock()
+
+
+def generate_order_id():
+    """
+    使用配置ORDER_ID_GENERATOR指定的生成器生成订单号，fork出的子进程重新租用机器号
+    没有配置ORDER_ID_WORKER_ID时依赖orders的redis租用机器号
+    """
+    global _generator, _generator_pid, _lease
+    with _generator_lock:
+        if _generator_pid != os.getpid():
+            _generator, _generator_pid = None, os.getpid()
+            _lease = WorkerIdLease() if getattr(settings, "ORDER_ID_WORKER_ID", None) is None else None
+        worker_id = allocate_worker_id(_lease)
+        if _generator is None or _generator.worker_id != worker_id:
+            generator_class = import_string(settings.ORDER_ID_GENERATOR)
+            _generator = generator_class(worker_id)
+        generator = _generator
+    return generator.next_id()
@@ -2,14 +2,15 @@ from decimal import Decimal
 from django.shortcuts import render
 
 # Create your views here.
-from django_redis import get_redis_connection
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from goods.models import SKU
+from carts.repository import CartRepository
+from goods.sku_cache import get_sku_cards
 from orders.serializers import OrderSettlementSerializer, SaveOrderSerializer
+from shopping_mall.utils.stats import latency
 
 
 class OrderSettlementView(APIView):
@@ -21,19 +22,15 @@ class OrderSettlementView(APIView):
         user = request.user
 
         # 从订单中获取用户勾选的商品
-        redis_conn = get_redis_connection("cart")
-        redis_cart = redis_conn.hgetall("cart_%s" % user.id)
-        cart_selected = redis_conn.smembers("cart_selected_%s" % user.id)
-
-        # 定义一个字典.用户勾选的商品
-        cart = {}
-        for sku_id in cart_selected:
-            cart[int(sku_id)] = int(redis_cart[sku_id])
+        cart = CartRepository(user.id).get_selected()
 
         # 查询商品信息
-        skus = SKU.objects.filter(id__in=cart.keys())
-        for sku in skus:
-            sku.count = cart[sku.id]
+        cards = get_sku_cards(cart.keys())
+        skus = []
+        for sku_id in sorted(cards):
+            card = cards[sku_id]
+            card["count"] = cart[sku_id]
+            skus.append(card)
 
         # 运费
         freight = Decimal("10.00")
@@ -46,3 +43,8 @@ class SaveOrderView(CreateAPIView):
     """保存订单"""
     serializer_class = SaveOrderSerializer
     permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        # 统计下单接口整体耗时
+        with latency("order.checkout"):
+            return super().create(request, *args, **kwargs)
@@ -5,4 +5,7 @@ VERIFY_EMAIL_TOKEN_EXPIRES = 24 * 60 * 60
 USER_ADDRESS_COUNTS_LIMIT = 20
 
 # 浏览记录保存
-USER_BROWSE_HISTORY_MAX_LIMIT = 5
\ No newline at end of file
+USER_BROWSE_HISTORY_MAX_LIMIT = 5
+
+# 浏览记录最多保存的条数，大于USER_BROWSE_HISTORY_MAX_LIMIT时可以分页查看
+USER_BROWSE_HISTORY_STORE_LIMIT = 100
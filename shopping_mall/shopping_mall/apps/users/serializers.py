@@ -4,8 +4,10 @@ from django_redis import get_redis_connection
 from rest_framework import serializers
 from rest_framework_jwt.settings import api_settings
 
+from areas.area_tree import get_area_tree
 from celery_tasks.email.tasks import send_verify_email
 from goods.models import SKU
+from goods.sku_cache import sku_exists
 from users import constants
 from users.models import User, Address
 
@@ -148,6 +150,14 @@ class UserAddressSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("手机号格式错误")
         return value
 
+    def validate(self, attrs):
+        """验证省市区依次从属，使用进程内的行政区划表，不查询数据库"""
+        ids = [attrs.get(name, getattr(self.instance, name, None))
+               for name in ("province_id", "city_id", "district_id")]
+        if not get_area_tree().is_valid_address(*ids):
+            raise serializers.ValidationError("省市区信息错误")
+        return attrs
+
     def create(self, validated_data):
         """保存信息"""
         validated_data["user"] = self.context["request"].user
@@ -166,9 +176,8 @@ class AddUserBrowsingHistorySerializer(serializers.Serializer):
     sku_id = serializers.IntegerField(label="商品sku编号", min_value=1)
 
     def validate_sku_id(self, value):
-        try:
-            SKU.objects.get(id=value)
-        except SKU.DoesNotExist:
+        # 在缓存的sku id集合中判断是否存在,不查询数据库
+        if not sku_exists(value):
             raise serializers.ValidationError("该商品不存在")
         return value
 
@@ -187,7 +196,7 @@ class AddUserBrowsingHistorySerializer(serializers.Serializer):
         pl.lpush(redis_key, sku_id)
 
         # 截断
-        pl.ltrim(redis_key, 0, constants.USER_BROWSE_HISTORY_MAX_LIMIT-1)
+        pl.ltrim(redis_key, 0, constants.USER_BROWSE_HISTORY_STORE_LIMIT-1)
 
         # redis管道处理任务
         pl.execute()
@@ -1,3 +1,102 @@
 from django.test import TestCase
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from goods.models import GoodsCategory, Brand, Goods, SKU
+from goods.sku_cache import SKU_IDS_KEY, SKU_MISSING_KEY, build_sku_ids, invalidate_sku_cards
+from users import constants
+from users.models import User
+
+
+class UserBrowsingHistoryTest(TestCase):
+    """浏览记录接口的sql查询次数、顺序和跳过下架或已删除的商品"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("history_test", password="12345678", mobile="13800000000")
+        category = GoodsCategory.objects.create(name="测试分类")
+        brand = Brand.objects.create(name="测试品牌", logo="logo.png", first_letter="C")
+        goods = Goods.objects.create(name="测试商品", brand=brand, category1=category, category2=category,
+                                     category3=category)
+
+        def create_sku(name, is_launched=True):
+            return SKU.objects.create(name=name, caption=name, goods=goods, category=category, price=10,
+                                      cost_price=8, market_price=12, is_launched=is_launched)
+
+        cls.skus = [create_sku("sku%s" % i) for i in range(8)]
+        cls.delisted = create_sku("delisted", is_launched=False)
+        deleted = create_sku("deleted")
+        cls.deleted_id = deleted.id
+        deleted.delete()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.history_key = "history_%s" % self.user.id
+        self.history_conn = get_redis_connection("history")
+        self.history_conn.delete(self.history_key)
+        build_sku_ids()
+
+    def tearDown(self):
+        self.history_conn.delete(self.history_key)
+        # 集合按测试数据库重建过，删除后由正常请求重新调度重建
+        get_redis_connection("default").delete(SKU_IDS_KEY, SKU_MISSING_KEY % self.deleted_id)
+        invalidate_sku_cards([sku.id for sku in self.skus] + [self.delisted.id, self.deleted_id])
+
+    def save_history(self, sku_id_list):
+        """按浏览顺序保存，最近浏览的在前"""
+        self.history_conn.rpush(self.history_key, *sku_id_list)
+        invalidate_sku_cards(sku_id_list)
+
+    def test_get_latest(self):
+        # 下架和已删除的商品夹在中间
+        history = [self.skus[0].id, self.delisted.id, self.skus[1].id, self.deleted_id] + \
+                  [sku.id for sku in self.skus[2:]]
+        self.save_history(history)
+        expected = [sku.id for sku in self.skus[:constants.USER_BROWSE_HISTORY_MAX_LIMIT]]
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/browse_histories/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["id"] for item in response.data], expected)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/browse_histories/")
+        self.assertEqual([item["id"] for item in response.data], expected)
+
+    def test_get_page(self):
+        history = [self.skus[2].id, self.deleted_id, self.skus[0].id, self.delisted.id, self.skus[1].id]
+        self.save_history(history)
+        expected = [self.skus[2].id, self.skus[0].id, self.skus[1].id]
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/browse_histories/", {"page": 1, "page_size": 10})
+        self.assertEqual(response.status_code, 200)
+        # 总数按保存的记录条数计算
+        self.assertEqual(response.data["count"], len(history))
+        self.assertEqual([item["id"] for item in response.data["results"]], expected)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/browse_histories/", {"page": 1, "page_size": 10})
+        self.assertEqual([item["id"] for item in response.data["results"]], expected)
+
+    def test_add(self):
+        self.save_history([self.skus[0].id, self.skus[1].id])
+
+        with self.assertNumQueries(0):
+            response = self.client.post("/browse_histories/", {"sku_id": self.skus[1].id}, format="json")
+        self.assertEqual(response.status_code, 201)
+        # 重复浏览的商品移到最前
+        history = [int(sku_id) for sku_id in self.history_conn.lrange(self.history_key, 0, -1)]
+        self.assertEqual(history, [self.skus[1].id, self.skus[0].id])
+
+    def test_add_deleted(self):
+        # 集合中没有的id查询一次数据库，不存在的结果短时间记录，再次请求不查询
+        with self.assertNumQueries(1):
+            response = self.client.post("/browse_histories/", {"sku_id": self.deleted_id}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        with self.assertNumQueries(0):
+            response = self.client.post("/browse_histories/", {"sku_id": self.deleted_id}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.history_conn.llen(self.history_key), 0)
@@ -14,7 +14,7 @@ from rest_framework.viewsets import GenericViewSet
 from rest_framework_jwt.views import ObtainJSONWebToken
 
 from carts.utils import merge_cart_cookie_to_redis
-from goods.models import SKU
+from goods.sku_cache import get_sku_cards
 from users import constants
 from users.models import User
 
@@ -161,22 +161,39 @@ class UserBrowsingHistoryView(CreateAPIView):
 
 
     def get(self, request):
-        """获取浏览记录"""
+        """
+        获取浏览记录
+        不传page参数时返回最近的USER_BROWSE_HISTORY_MAX_LIMIT条
+        传page(和page_size)参数时分页返回保存的全部浏览记录
+        """
         user_id = request.user.id
 
         # 查询redis  list
         redis_conn = get_redis_connection("history")
-        sku_id_list = redis_conn.lrange("history_%s" % user_id, 0, constants.USER_BROWSE_HISTORY_MAX_LIMIT)
 
-        # 遍历获取数据
+        if self.paginator.page_query_param not in request.query_params:
+            # 多取一些,跳过下架或已删除的商品后仍能凑满
+            sku_id_list = redis_conn.lrange("history_%s" % user_id, 0, constants.USER_BROWSE_HISTORY_MAX_LIMIT * 2 - 1)
+            skus = self.get_history_skus(sku_id_list)[:constants.USER_BROWSE_HISTORY_MAX_LIMIT]
+            serializer = SKUSerializer(skus, many=True)
+            return Response(serializer.data)
+
+        # 先对sku id分页,只获取当前页商品的数据
+        sku_id_list = redis_conn.lrange("history_%s" % user_id, 0, -1)
+        page = self.paginate_queryset(sku_id_list)
+        serializer = SKUSerializer(self.get_history_skus(page), many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def get_history_skus(sku_id_list):
+        """从sku卡片缓存中批量获取数据,保持浏览顺序,跳过下架或已删除的商品"""
+        cards = get_sku_cards(sku_id_list)
         skus = []
         for sku_id in sku_id_list:
-            sku = SKU.objects.get(id=sku_id)
-            skus.append(sku)
-
-        # 序列化返回
-        serializer = SKUSerializer(skus, many=True)
-        return Response(serializer.data)
+            card = cards.get(int(sku_id))
+            if card and card["is_launched"]:
+                skus.append(card)
+        return skus
 
 
 class UserAuthorizeView(ObtainJSONWebToken):
@@ -0,0 +1,110 @@
+"""
+图片验证码池
+
+由celery任务预先生成验证码，以 "<文本>:<图片>" 存入redis列表 captcha_pool_<图片格式>，最多 CAPTCHA_POOL_SIZE 个；
+请求时用lua脚本一次完成 取出一个验证码 + 以 img_<image_code_id> 保存文本，请求中不渲染图片
+剩余数量低于 CAPTCHA_POOL_LOW_WATER 时调度补充，拆成多个任务由多个worker进程并行生成；
+池为空或redis出错时在请求中直接生成；每个验证码只使用一次
+"""
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from shopping_mall.libs.captcha.captcha import captcha
+from shopping_mall.utils.redis_script import RedisScript
+from shopping_mall.utils.stats import incr_counters
+from verifications import constants
+
+logger = logging.getLogger("django")
+
+# 修改图片格式后不会取出旧格式的图片
+CAPTCHA_POOL_KEY = "captcha_pool_%s" % constants.IMAGE_CODE_FORMAT.lower()
+CAPTCHA_REFILL_FLAG_KEY = "captcha_pool_refilling"
+IMAGE_CODE_KEY = "img_%s"
+
+# 取出一个验证码并保存文本
+# KEYS: 验证码池, img_<image_code_id>  ARGV: 文本有效期
+# 返回: {图片(池为空时为空字符串), 剩余数量}
+TAKE_SCRIPT = RedisScript("verify_codes", """
+local item = redis.call('lpop', KEYS[1])
+local remaining = redis.call('llen', KEYS[1])
+if not item then
+    return {'', remaining}
+end
+local sep = string.find(item, ':', 1, true)
+redis.call('setex', KEYS[2], ARGV[1], string.sub(item, 1, sep - 1))
+return {string.sub(item, sep + 1), remaining}
+""")
+
+
+def get_pool_connection():
+    return get_redis_connection("verify_codes")
+
+
+def fill_captcha_pool(count):
+    """
+    生成验证码放入池中，池满时停止
+    :param count: 最多生成的数量
+    :return: 实际放入池中的数量
+    """
+    redis_conn = get_pool_connection()
+    added = 0
+    while added < count:
+        # 生成前先检查池中的空位，池已满时不再生成图片
+        free = constants.CAPTCHA_POOL_SIZE - redis_conn.llen(CAPTCHA_POOL_KEY)
+        if free <= 0:
+            break
+        batch = min(constants.CAPTCHA_POOL_PUSH_BATCH, count - added, free)
+        items = []
+        for _ in range(batch):
+            text, image = captcha.generate_captcha(constants.IMAGE_CODE_FORMAT)
+            items.append(text.encode() + b":" + image)
+        pl = redis_conn.pipeline()
+        pl.rpush(CAPTCHA_POOL_KEY, *items)
+        pl.ltrim(CAPTCHA_POOL_KEY, 0, constants.CAPTCHA_POOL_SIZE - 1)
+        length = pl.execute()[0]
+        # 并发补充时超出池大小的部分在列表末尾被截掉，即本批最后放入的几个，不计入
+        added += batch - min(batch, max(0, length - constants.CAPTCHA_POOL_SIZE))
+        if length >= constants.CAPTCHA_POOL_SIZE:
+            break
+    return added
+
+
+def schedule_refill(remaining):
+    """调度补充验证码池的任务，一段时间内只调度一次"""
+    redis_conn = get_pool_connection()
+    if not redis_conn.set(CAPTCHA_REFILL_FLAG_KEY, 1, nx=True, ex=constants.CAPTCHA_POOL_REFILL_INTERVAL):
+        return
+    missing = constants.CAPTCHA_POOL_SIZE - remaining
+    try:
+        from celery_tasks.captcha.tasks import fill_captcha_pool as fill_task
+        for start in range(0, missing, constants.CAPTCHA_POOL_TASK_SIZE):
+            fill_task.delay(min(constants.CAPTCHA_POOL_TASK_SIZE, missing - start))
+    except Exception as e:
+        logger.error("调度补充图片验证码池[异常][ message: %s ]" % e)
+
+
+def take_captcha(image_code_id):
+    """
+    取出一个图片验证码，文本以 img_<image_code_id> 保存到redis
+    :return: 图片
+    """
+    if settings.CAPTCHA_POOL_ENABLED:
+        try:
+            image, remaining = TAKE_SCRIPT(
+                keys=[CAPTCHA_POOL_KEY, IMAGE_CODE_KEY % image_code_id], args=[constants.IMAGE_CODE_REDIS_EXPIRES])
+            if remaining < constants.CAPTCHA_POOL_LOW_WATER:
+                schedule_refill(remaining)
+        except RedisError as e:
+            logger.warning("读取图片验证码池失败: %s" % e)
+        else:
+            if image:
+                return image
+            incr_counters({"captcha_pool.miss": 1})
+
+    # 池为空，在请求中生成
+    text, image = captcha.generate_captcha(constants.IMAGE_CODE_FORMAT)
+    get_pool_connection().setex(IMAGE_CODE_KEY % image_code_id, constants.IMAGE_CODE_REDIS_EXPIRES, text)
+    return image
@@ -1,10 +1,28 @@
 # 图片验证码redis有效期，单位秒
 IMAGE_CODE_REDIS_EXPIRES = 5 * 60
 
+# 图片验证码的图片格式 JPEG / PNG / WEBP
+IMAGE_CODE_FORMAT = "JPEG"
+
 # 短信验证码有效期
 SMS_CODE_REDIS_EXPIRES = 5 * 60
 
 # 发送间隔
 SEND_SMS_CODE_INTERVAL = 60
 
-SMS_CODE_TEMP_ID = 1
\ No newline at end of file
+SMS_CODE_TEMP_ID = 1
+
+# 图片验证码池的容量
+CAPTCHA_POOL_SIZE = 2000
+
+# 验证码池剩余数量低于此值时补充
+CAPTCHA_POOL_LOW_WATER = 500
+
+# 补充验证码池时每个celery任务生成的数量，多个任务由多个worker进程并行生成
+CAPTCHA_POOL_TASK_SIZE = 200
+
+# 生成验证码时每次写入redis的数量
+CAPTCHA_POOL_PUSH_BATCH = 20
+
+# 调度补充任务后，此时间内不再重复调度，单位秒
+CAPTCHA_POOL_REFILL_INTERVAL = 30
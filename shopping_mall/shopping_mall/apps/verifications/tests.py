@@ -1,3 +1,33 @@
-from django.test import TestCase
+import random
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from shopping_mall.libs.captcha.captcha import captcha
+
+CAPTCHA_COUNT = 1000
+THREADS = 32
+
+
+def render(seed):
+    text, image = captcha.generate_captcha(seed=seed)
+    return seed, text, image
+
+
+class CaptchaThreadTest(SimpleTestCase):
+    """多线程同时生成图片验证码，每个验证码的文本与图片对应"""
+
+    def test_text_matches_image(self):
+        seeds = random.sample(range(1 << 30), CAPTCHA_COUNT)
+        with ThreadPoolExecutor(THREADS) as executor:
+            results = list(executor.map(render, seeds))
+
+        # 全部生成后在单线程中用相同种子重新生成，文本和图片都应相同
+        for seed, text, image in results:
+            expected_text, expected_image = captcha.generate_captcha(seed=seed)
+            self.assertEqual(text, expected_text, "seed %d" % seed)
+            self.assertEqual(image, expected_image, "seed %d" % seed)
+
+    def test_seed_renders_same_captcha(self):
+        self.assertEqual(captcha.generate_captcha(seed=1), captcha.generate_captcha(seed=1))
+        self.assertNotEqual(captcha.generate_captcha(seed=1)[1], captcha.generate_captcha(seed=2)[1])
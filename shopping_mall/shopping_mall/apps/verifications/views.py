@@ -11,11 +11,11 @@ from rest_framework.response import Response
 
 from rest_framework.views import APIView
 import logging
-from celery_tasks.sms.tasks import send_sms_code
 
-from shopping_mall.libs.captcha.captcha import captcha
-from shopping_mall.utils.yuntongxun.sms import CCP
+from shopping_mall.libs.captcha.captcha import CONTENT_TYPES
+from shopping_mall.utils.sms.sender import enqueue_sms
 from verifications import constants
+from verifications.captcha_pool import take_captcha
 from verifications.serializers import ImageCodeCheckSerializer
 
 
@@ -29,17 +29,11 @@ class ImageCodeView(APIView):
         # 校验参数       （校验图片验证码）
         # 由于参数image_code_id在url路由中正则可以校验,所以不用考虑接受参数和校验参数
 
-        # 生成图片验证码
-        text, image = captcha.generate_captcha()
-
-        # 保存图片验证码到redis中～文本格式
-        # 1.连接redis
-        redis_conn = get_redis_connection('verify_codes')
-        # 2.保存图片验证码到redis中
-        redis_conn.setex("img_%s" % image_code_id, constants.IMAGE_CODE_REDIS_EXPIRES, text)
+        # 从验证码池取出图片验证码，文本保存到redis中
+        image = take_captcha(image_code_id)
 
         # 返回图片验证码     （返回图片验证码获取成功响应）
-        return HttpResponse(image, content_type="images/jpg")
+        return HttpResponse(image, content_type=CONTENT_TYPES[constants.IMAGE_CODE_FORMAT])
 
 
 class SMSCodeView(GenericAPIView):
@@ -87,8 +81,8 @@ class SMSCodeView(GenericAPIView):
         #         logger.warning("发送验证码短信[失败][ mobile: %s ]" % mobile)
         #         return Response({'message': 'failed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # 使用celery发送短信验证码
+        # 加入短信队列，由celery任务批量发送
         expires = constants.SMS_CODE_REDIS_EXPIRES // 60
-        send_sms_code.delay(mobile, sms_code, expires, constants.SMS_CODE_TEMP_ID)
+        enqueue_sms(mobile, [sms_code, expires], constants.SMS_CODE_TEMP_ID)
 
         return Response({'message': 'OK'})
\ No newline at end of file
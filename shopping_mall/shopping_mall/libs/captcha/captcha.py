@@ -13,6 +13,55 @@ from PIL import ImageFilter
 from PIL.ImageDraw import Draw
 from PIL.ImageFont import truetype
 
+# 字符遮罩的放大表，与 point(lambda i: i * 1.97) 结果相同，不再为每个遮罩调用python函数
+MASK_TABLE = [min(255, int(i * 1.97)) for i in range(256)]
+
+# 缓存的字符灰度图数量上限，默认字符集和字体只有几百个
+GLYPH_CACHE_SIZE = 2048
+
+# 各图片格式的保存参数，验证码只使用一次，优先编码速度
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 75},
+    'PNG': {'compress_level': 1},
+    'WEBP': {'quality': 70, 'method': 0},
+}
+
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+# 每个进程只加载一次的字体 {(字体文件, 字号): 字体}
+_fonts = {}
+
+# 字符灰度图（黑底白字，裁剪到字符边界） {(字体文件, 字号, 字符): Image}
+_glyphs = {}
+
+
+def get_font(name, size):
+    """字体对象每个进程只加载一次"""
+    font = _fonts.get((name, size))
+    if font is None:
+        font = _fonts.setdefault((name, size), truetype(name, size))
+    return font
+
+
+def get_glyph(name, size, c):
+    """
+    字符的灰度图，按 字体/字号/字符 缓存，颜色在使用时再上色
+    缓存的图片不能修改，变形操作都返回新图片
+    """
+    glyph = _glyphs.get((name, size, c))
+    if glyph is None:
+        font = get_font(name, size)
+        glyph = Image.new('L', font.getsize(c), 0)
+        Draw(glyph).text((0, 0), c, font=font, fill=255)
+        glyph = glyph.crop(glyph.getbbox())
+        if len(_glyphs) < GLYPH_CACHE_SIZE:
+            _glyphs[(name, size, c)] = glyph
+    return glyph
+
 
 class Bezier:
     def __init__(self):
@@ -55,6 +104,11 @@ class Bezier:
 
 
 class Captcha(object):
+    """
+    验证码生成器，实例上只有字体目录等不变的数据
+    每次生成的文本、颜色、随机数等都是调用中的局部变量，多个线程可以同时使用同一个实例
+    """
+
     def __init__(self):
         self._bezier = Bezier()
         self._dir = os.path.dirname(__file__)
@@ -66,77 +120,65 @@ class Captcha(object):
             Captcha._instance = Captcha()
         return Captcha._instance
 
-    def initialize(self, width=200, height=75, color=None, text=None, fonts=None):
-        # self.image = Image.new('RGB', (width, height), (255, 255, 255))
-        self._text = text if text else random.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4)
-        self.fonts = fonts if fonts else \
-            [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
-        self.width = width
-        self.height = height
-        self._color = color if color else self.random_color(0, 200, random.randint(220, 255))
-
     @staticmethod
-    def random_color(start, end, opacity=None):
-        red = random.randint(start, end)
-        green = random.randint(start, end)
-        blue = random.randint(start, end)
+    def random_color(start, end, opacity=None, rand=random):
+        red = rand.randint(start, end)
+        green = rand.randint(start, end)
+        blue = rand.randint(start, end)
         if opacity is None:
             return red, green, blue
         return red, green, blue, opacity
 
     # draw image
 
-    def background(self, image):
-        Draw(image).rectangle([(0, 0), image.size], fill=self.random_color(238, 255))
+    def background(self, image, rand=random):
+        Draw(image).rectangle([(0, 0), image.size], fill=self.random_color(238, 255, rand=rand))
         return image
 
     @staticmethod
     def smooth(image):
         return image.filter(ImageFilter.SMOOTH)
 
-    def curve(self, image, width=4, number=6, color=None):
+    def curve(self, image, color, width=4, number=6, rand=random):
         dx, height = image.size
         dx /= number
-        path = [(dx * i, random.randint(0, height))
-                for i in range(1, number)]
+        xs = [dx * i for i in range(1, number)]
+        ys = [rand.randint(0, height) for _ in xs]
         bcoefs = self._bezier.make_bezier(number - 1)
-        points = []
-        for coefs in bcoefs:
-            points.append(tuple(sum([coef * p for coef, p in zip(coefs, ps)])
-                                for ps in zip(*path)))
-        Draw(image).line(points, fill=color if color else self._color, width=width)
+        points = [(sum(c * x for c, x in zip(coefs, xs)), sum(c * y for c, y in zip(coefs, ys)))
+                  for coefs in bcoefs]
+        Draw(image).line(points, fill=color, width=width)
         return image
 
-    def noise(self, image, number=50, level=2, color=None):
+    def noise(self, image, color, number=50, level=2, rand=random):
+        """噪点为 (level + 1) x level 的小块，所有像素一次画出"""
         width, height = image.size
         dx = width / 10
         width -= dx
         dy = height / 10
         height -= dy
-        draw = Draw(image)
-        for i in range(number):
-            x = int(random.uniform(dx, width))
-            y = int(random.uniform(dy, height))
-            draw.line(((x, y), (x + level, y)), fill=color if color else self._color, width=level)
+        block = [(i, j) for i in range(level + 1) for j in range(level)]
+        points = []
+        for _ in range(number):
+            x = int(rand.uniform(dx, width))
+            y = int(rand.uniform(dy, height))
+            points.extend([(x + i, y + j) for i, j in block])
+        Draw(image).point(points, fill=color)
         return image
 
-    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None):
-        color = color if color else self._color
-        fonts = tuple([truetype(name, size)
+    def text(self, image, text, fonts, color, font_sizes=None, drawings=None, squeeze_factor=0.75, rand=random):
+        """字符灰度图从缓存取出，变形后再上色，遮罩由查找表放大"""
+        color = color[:3]
+        fonts = tuple([(name, size)
                        for name in fonts
                        for size in font_sizes or (65, 70, 75)])
-        draw = Draw(image)
         char_images = []
-        for c in self._text:
-            font = random.choice(fonts)
-            c_width, c_height = draw.textsize(c, font=font)
-            char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
-            char_draw = Draw(char_image)
-            char_draw.text((0, 0), c, font=font, fill=color)
-            char_image = char_image.crop(char_image.getbbox())
-            for drawing in drawings:
+        for c in text:
+            name, size = rand.choice(fonts)
+            char_image = get_glyph(name, size, c)
+            for drawing in drawings or ():
                 d = getattr(self, drawing)
-                char_image = d(char_image)
+                char_image = d(char_image, rand=rand)
             char_images.append(char_image)
         width, height = image.size
         offset = int((width - sum(int(i.size[0] * squeeze_factor)
@@ -144,8 +186,11 @@ class Captcha(object):
                       char_images[-1].size[0]) / 2)
         for char_image in char_images:
             c_width, c_height = char_image.size
-            mask = char_image.convert('L').point(lambda i: i * 1.97)
-            image.paste(char_image,
+            # 黑底上按灰度画出字符颜色，与直接用该颜色画字相同
+            colored = Image.new('RGB', char_image.size, (0, 0, 0))
+            colored.paste(color, (0, 0, c_width, c_height), char_image)
+            mask = colored.convert('L').point(MASK_TABLE)
+            image.paste(colored,
                         (offset, int((height - c_height) / 2)),
                         mask)
             offset += int(c_width * squeeze_factor)
@@ -153,15 +198,15 @@ class Captcha(object):
 
     # draw text
     @staticmethod
-    def warp(image, dx_factor=0.27, dy_factor=0.21):
+    def warp(image, dx_factor=0.27, dy_factor=0.21, rand=random):
         width, height = image.size
         dx = width * dx_factor
         dy = height * dy_factor
-        x1 = int(random.uniform(-dx, dx))
-        y1 = int(random.uniform(-dy, dy))
-        x2 = int(random.uniform(-dx, dx))
-        y2 = int(random.uniform(-dy, dy))
-        image2 = Image.new('RGB',
+        x1 = int(rand.uniform(-dx, dx))
+        y1 = int(rand.uniform(-dy, dy))
+        x2 = int(rand.uniform(-dx, dx))
+        y2 = int(rand.uniform(-dy, dy))
+        image2 = Image.new(image.mode,
                            (width + abs(x1) + abs(x2),
                             height + abs(y1) + abs(y2)))
         image2.paste(image, (abs(x1), abs(y1)))
@@ -174,45 +219,58 @@ class Captcha(object):
              width2 - x2, -y1))
 
     @staticmethod
-    def offset(image, dx_factor=0.1, dy_factor=0.2):
+    def offset(image, dx_factor=0.1, dy_factor=0.2, rand=random):
         width, height = image.size
-        dx = int(random.random() * width * dx_factor)
-        dy = int(random.random() * height * dy_factor)
-        image2 = Image.new('RGB', (width + dx, height + dy))
+        dx = int(rand.random() * width * dx_factor)
+        dy = int(rand.random() * height * dy_factor)
+        image2 = Image.new(image.mode, (width + dx, height + dy))
         image2.paste(image, (dx, dy))
         return image2
 
     @staticmethod
-    def rotate(image, angle=25):
+    def rotate(image, angle=25, rand=random):
         return image.rotate(
-            random.uniform(-angle, angle), Image.BILINEAR, expand=1)
+            rand.uniform(-angle, angle), Image.BILINEAR, expand=1)
 
-    def captcha(self, path=None, fmt='JPEG'):
+    def captcha(self, path=None, fmt='JPEG', rand=random, width=200, height=75, color=None, text=None, fonts=None):
         """Create a captcha.
 
         Args:
             path: save path, default None.
-            fmt: image format, PNG / JPEG.
+            fmt: image format, JPEG / PNG / WEBP.
+            rand: random source, random.Random(seed) renders the same captcha for the same seed.
+            width, height: image size.
+            color: text color, default random.
+            text: captcha text, default 4 random characters.
+            fonts: font file paths, default the bundled fonts.
         Returns:
             A tuple, (text, StringIO.value).
             For example:
                 ('JGW9', '\x89PNG\r\n\x1a\n\x00\x00\x00\r...')
 
         """
-        image = Image.new('RGB', (self.width, self.height), (255, 255, 255))
-        image = self.background(image)
-        image = self.text(image, self.fonts, drawings=['warp', 'rotate', 'offset'])
-        image = self.curve(image)
-        image = self.noise(image)
+        text = text if text else rand.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4)
+        fonts = fonts if fonts else \
+            [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
+        color = color if color else self.random_color(0, 200, rand.randint(220, 255), rand=rand)
+
+        image = Image.new('RGB', (width, height), (255, 255, 255))
+        image = self.background(image, rand=rand)
+        image = self.text(image, text, fonts, color, drawings=['warp', 'rotate', 'offset'], rand=rand)
+        image = self.curve(image, color, rand=rand)
+        image = self.noise(image, color, rand=rand)
         image = self.smooth(image)
-        text = "".join(self._text)
+        text = "".join(text)
         out = BytesIO()
-        image.save(out, format=fmt)
+        image.save(out, format=fmt, **SAVE_OPTIONS.get(fmt.upper(), {}))
         return text, out.getvalue()
 
-    def generate_captcha(self):
-        self.initialize()
-        return self.captcha("")
+    def generate_captcha(self, fmt='JPEG', seed=None):
+        """
+        生成一个验证码，返回 (文本, 图片)
+        每次调用使用自己的随机数生成器，指定seed时相同的seed生成相同的验证码
+        """
+        return self.captcha("", fmt, random.Random(seed))
 
 captcha = Captcha.instance()
 
@@ -158,6 +158,27 @@ CACHES = {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
         }
     },
+    "hot_stock": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/5",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        }
+    },
+    "orders": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/6",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        }
+    },
+    "stats": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/7",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        }
+    },
 }
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "session"
@@ -330,8 +351,10 @@ GENERATED_STATIC_HTML_FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(B
 
 # 定时任务
 CRONJOBS = [
-    # 每5分钟执行一次生成主页静态文件
-    ('*/1 * * * *', 'contents.crons.generate_static_index_html', '>> '+ os.path.join(os.path.dirname(BASE_DIR), "logs/crontab.log"))
+    # 每分钟检查一次主页是否过期，过期时生成主页静态文件（正常由修改内容时调度的celery任务生成）
+    ('*/1 * * * *', 'contents.crons.regenerate_stale_index_html', '>> '+ os.path.join(os.path.dirname(BASE_DIR), "logs/crontab.log")),
+    # 每天凌晨全量重建分类销量排行
+    ('0 3 * * *', 'goods.rankings.rebuild_sales_rankings', '>> '+ os.path.join(os.path.dirname(BASE_DIR), "logs/crontab.log")),
 ]
 # 解决crontab中文问题
 CRONTAB_COMMAND_PREFIX = 'LANG_ALL=zh_cn.UTF-8'
@@ -340,19 +363,57 @@ CRONTAB_COMMAND_PREFIX = 'LANG_ALL=zh_cn.UTF-8'
 HAYSTACK_CONNECTIONS = {
     'default': {
         'ENGINE': 'haystack.backends.elasticsearch_backend.ElasticsearchSearchEngine',
-        'URL': 'http://192.168.65.147:9200/',  # 此处为elasticsearch运行的服务器ip地址，端口号固定为9200
+        # 此处为elasticsearch运行的服务器ip地址，端口号固定为9200，可以用环境变量 ELASTICSEARCH_URL 指定
+        'URL': os.getenv('ELASTICSEARCH_URL', 'http://192.168.65.147:9200/'),
         'INDEX_NAME': 'shopping',  # 指定elasticsearch建立的索引库的名称
     },
 }
+# 本地开发和测试时设置环境变量 SEARCH_ENGINE=local，使用进程内的搜索后端，不依赖elasticsearch
+if os.getenv('SEARCH_ENGINE') == 'local':
+    HAYSTACK_CONNECTIONS['default'] = {
+        'ENGINE': 'shopping_mall.utils.search.memory_backend.MemoryEngine',
+    }
 
-# 当添加、修改、删除数据时，自动生成索引
-HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'
+# 当添加、修改、删除数据时，记录修改并由celery任务批量更新索引
+HAYSTACK_SIGNAL_PROCESSOR = 'shopping_mall.utils.search.signals.QueuedSignalProcessor'
 
 # 支付宝
 ALIPAY_APPID = "2016101000655107"
 ALIPAY_URL = "https://openapi.alipaydev.com/gateway.do"
 ALIPAY_DEBUG = True
 
+# 热点商品库存模式，为True时下单先在redis中预扣被标记为热点的商品的库存（见 orders.hot_stock）
+# 为False时下单不访问hot_stock的redis
+HOT_STOCK_ENABLED = False
+
+# 下单后续处理（SPU销量、清理购物车、售罄商品详情页）是否在当前进程内同步执行，不经过celery
+ORDER_PIPELINE_EAGER = False
+
+# 图片验证码从预先生成的验证码池中取出，为False时每次请求中生成
+CAPTCHA_POOL_ENABLED = True
+
+# 短信服务商，发送地址可以用环境变量 SMS_SERVER_URL 指定（本地压测时指向 scripts/fake_sms_server.py）
+# RATE: 每秒最多请求数，所有进程共享  BURST: 允许的突发请求数  POOL_SIZE: keep-alive连接数和批量发送的并发数
+SMS_PROVIDERS = {
+    'yuntongxun': {
+        'BACKEND': 'shopping_mall.utils.sms.providers.YuntongxunProvider',
+        'URL': os.getenv('SMS_SERVER_URL', 'https://app.cloopen.com:8883'),
+        'ACCOUNT_SID': '8aaf07086b211c22016b2b4cd7290759',
+        'ACCOUNT_TOKEN': 'f917f34e00044da296571815576154ab',
+        'APP_ID': '8aaf07086b211c22016b2b4cd7850760',
+        'RATE': 50,
+        'BURST': 100,
+        'POOL_SIZE': 10,
+        'TIMEOUT': 5,
+    },
+}
+SMS_DEFAULT_PROVIDER = 'yuntongxun'
+
+# 订单号生成器
+ORDER_ID_GENERATOR = 'orders.utils.SnowflakeOrderIdGenerator'
+# 当前进程的订单号机器号(0-9999)，为None时由redis自动分配
+ORDER_ID_WORKER_ID = None
+
 # 配置读写分离
 DsATABASE_ROUTERS = ['shopping_mall.utils.db_router.MasterSlaveDBRouter']
 #
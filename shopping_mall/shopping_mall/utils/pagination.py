@@ -1,7 +1,131 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from functools import partial
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 2
     page_size_query_param = 'page_size'
-    max_page_size = 10
\ No newline at end of file
+    max_page_size = 10
+
+
+class CountedPaginator(Paginator):
+    """总数由外部提供的分页器，不执行COUNT(*)"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @property
+    def count(self):
+        return self._count
+
+
+class CachedCountPagination(StandardResultsSetPagination):
+    """
+    页码分页，总数从视图的 get_total_count() 获取（一般是缓存的计数），不再每页执行COUNT(*)
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count = view.get_total_count()
+        self.django_paginator_class = partial(CountedPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """
+    键集（游标）分页
+    按 (排序字段, id) 定位下一页，不使用OFFSET，深分页的耗时与第一页相同；排序字段值相同时按id区分，结果稳定
+    游标为 base64url(json [排序, 上一页最后一条的排序字段值, 上一页最后一条的id])
+    视图需要提供 get_keyset_ordering() 返回排序，如 "-price"，以及 get_total_count() 返回总数
+    """
+    cursor_query_param = 'cursor'
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_param = StandardResultsSetPagination.page_size_query_param
+    max_page_size = StandardResultsSetPagination.max_page_size
+    invalid_cursor_message = '无效的游标'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(ordering, value, last_id):
+        data = json.dumps([ordering, value, last_id]).encode()
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            ordering, value, last_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # 游标由encode_cursor生成，值为字符串，id为整数，伪造的其他类型都视为无效
+        if not isinstance(value, str) or not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise NotFound(self.invalid_cursor_message)
+        return ordering, value, last_id
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = view.get_total_count()
+
+        ordering = view.get_keyset_ordering()
+        name = ordering.lstrip('-')
+        field = queryset.model._meta.get_field(name)
+        descending = ordering.startswith('-')
+        queryset = queryset.order_by(ordering, '-id' if descending else 'id')
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            cursor_ordering, value, last_id = cursor
+            if cursor_ordering != ordering:
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            # 写成 field <= value and (field < value or id < last_id) 的形式，前一个条件可以走索引范围扫描
+            if descending:
+                queryset = queryset.filter(Q(**{name + '__lte': value}),
+                                           Q(**{name + '__lt': value}) | Q(id__lt=last_id))
+            else:
+                queryset = queryset.filter(Q(**{name + '__gte': value}),
+                                           Q(**{name + '__gt': value}) | Q(id__gt=last_id))
+
+        # 多取一条判断是否有下一页
+        results = list(queryset[:self.page_size + 1])
+        self.next_cursor = None
+        if len(results) > self.page_size:
+            results = results[:self.page_size]
+            last = results[-1]
+            self.next_cursor = self.encode_cursor(ordering, field.value_to_string(last), last.id)
+        return results
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
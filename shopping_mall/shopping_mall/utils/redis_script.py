@@ -0,0 +1,25 @@
+"""
+lua脚本
+
+脚本在模块中声明一次，第一次执行时在对应的redis连接上注册，之后都用evalsha执行，
+不再每次调用时重新创建Script对象；脚本用到的key都由KEYS传入
+"""
+from django_redis import get_redis_connection
+
+
+class RedisScript(object):
+    """
+    :param alias: 默认使用的redis连接（CACHES中的名称）
+    :param script: lua脚本
+    """
+
+    def __init__(self, alias, script):
+        self.alias = alias
+        self.script = script
+        self._script = None
+
+    def __call__(self, keys=(), args=(), client=None):
+        """client为None时使用alias对应的连接"""
+        if self._script is None:
+            self._script = get_redis_connection(self.alias).register_script(self.script)
+        return self._script(keys=list(keys), args=list(args), client=client)
@@ -0,0 +1,678 @@
+"""
+进程内的搜索后端，用于不依赖elasticsearch的本地开发、测试和搜索性能测试
+
+文档保存在当前进程的内存中，按连接名区分，文档字段的内容建立倒排索引：
+英文和数字按词切分，中文按相邻两字切分（与elasticsearch的cjk分词相同），查询单个汉字时匹配包含该字的词；
+包含全部查询词的文档为匹配，按BM25得分从高到低排序
+支持 filter 条件（exact/gt/gte/lt/lte/in/range/startswith/contains）、字段分面统计和排序，
+与elasticsearch一样在后端中计算，结果只返回请求的一页
+查询词和等值条件由倒排索引和字段值索引求交集得到候选文档，其余条件逐个检查候选文档
+每个进程第一次使用时从各索引的 index_queryset 加载全部文档，之后只包含本进程内的更新
+配置: HAYSTACK_CONNECTIONS = {'default': {'ENGINE': 'shopping_mall.utils.search.memory_backend.MemoryEngine'}}
+"""
+import heapq
+import math
+import operator
+import re
+from collections import Counter
+from functools import partial
+from itertools import compress
+
+from haystack import connections
+from haystack.backends import BaseEngine, BaseSearchBackend, BaseSearchQuery, SearchNode, log_query
+from haystack.constants import ID, DJANGO_CT, DJANGO_ID, FILTER_SEPARATOR, VALID_FILTERS
+from haystack.inputs import PythonData
+from haystack.models import SearchResult
+from haystack.utils import get_identifier, get_model_ct
+
+# 未指定结束位置时返回的结果数，与elasticsearch默认的size相同
+DEFAULT_SIZE = 10
+
+# BM25参数，与elasticsearch的默认值相同
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 英文和数字连续的一段，或中文连续的一段
+TOKEN_RE = re.compile("[a-z0-9]+|[\u4e00-\u9fff]+")
+
+# filter条件的比较方式，(文档中的值, 查询的值)
+COMPARATORS = {
+    "content": operator.eq,
+    "exact": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "in": lambda doc_value, values: doc_value in values,
+    "range": lambda doc_value, values: values[0] <= doc_value <= values[1],
+    "startswith": lambda doc_value, value: str(doc_value).startswith(str(value)),
+    "contains": lambda doc_value, value: str(value) in str(doc_value),
+}
+
+# 可以对一批文档的字段值一起比较的条件，test(查询的值, 文档中的值)
+BATCH_COMPARATORS = {
+    "gt": operator.lt,
+    "gte": operator.le,
+    "lt": operator.gt,
+    "lte": operator.ge,
+}
+
+# {连接名: 倒排索引}
+_indexes = {}
+
+
+def _is_cjk(term):
+    return term[0] >= "\u4e00"
+
+
+def tokenize(text):
+    """
+    分词，建立索引和查询使用相同的规则
+    英文转小写，英文和数字按词；中文按相邻两字，只有一个字时为单字
+    """
+    tokens = []
+    for run in TOKEN_RE.findall(text.lower()):
+        if len(run) == 1 or not _is_cjk(run):
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _select(doc_ids, column, test):
+    """字段值满足test的文档，没有该字段的文档不满足；比较在C中完成，不逐个调用python函数"""
+    doc_ids = list(filter(column.__contains__, doc_ids))
+    return list(compress(doc_ids, map(test, map(column.__getitem__, doc_ids))))
+
+
+def _insort(doc_ids, doc_id, key, reverse):
+    """把文档插入按key排好序的文档列表，值相同时排在后面，与按加入索引的顺序稳定排序的结果相同"""
+    value = key(doc_id)
+    low, high = 0, len(doc_ids)
+    while low < high:
+        mid = (low + high) // 2
+        other = key(doc_ids[mid])
+        if (other < value) if reverse else (value < other):
+            high = mid
+        else:
+            low = mid + 1
+    doc_ids.insert(low, doc_id)
+
+
+def _coerce(value, field_type):
+    """把查询参数中的值转换为与索引字段相同的类型"""
+    if hasattr(value, "input_type_name"):
+        value = value.query_string
+    if field_type == "boolean":
+        return value in (True, 1, "1", "true", "True")
+    if field_type == "integer":
+        return int(value)
+    if field_type == "float":
+        return float(value)
+    return str(value)
+
+
+class InvertedIndex(object):
+    """
+    倒排索引
+    postings: {词: {文档id: 词频}}，文档id按加入索引的顺序排列，查询结果的顺序在各进程中相同
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.postings = {}
+        # 文档包含的词，删除文档时使用
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        # {汉字: 包含该字的两字词}，查询单个汉字时使用
+        self.char_terms = {}
+        # {模型: 文档数量}
+        self.model_counts = {}
+        # 由文档计算出的数据（BM25得分、单字的文档、字段值、按字段排序的文档），文档变化后只更新相关的部分
+        self._cache = {}
+
+    def add(self, doc_id, document, text):
+        self.remove(doc_id)
+        tokens = tokenize(text)
+        freqs = {}
+        for token in tokens:
+            freqs[token] = freqs.get(token, 0) + 1
+        for term, tf in freqs.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                if len(term) > 1 and _is_cjk(term):
+                    for char in term:
+                        self.char_terms.setdefault(char, set()).add(term)
+            postings[doc_id] = tf
+        self.documents[doc_id] = document
+        self.doc_terms[doc_id] = tuple(freqs)
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+        self.model_counts[document[DJANGO_CT]] = self.model_counts.get(document[DJANGO_CT], 0) + 1
+        self._update_cache(doc_id, document, freqs, True)
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        terms = self.doc_terms.pop(doc_id)
+        for term in terms:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if postings:
+                continue
+            del self.postings[term]
+            if len(term) > 1 and _is_cjk(term):
+                for char in term:
+                    char_terms = self.char_terms[char]
+                    char_terms.discard(term)
+                    if not char_terms:
+                        del self.char_terms[char]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        self.model_counts[document[DJANGO_CT]] -= 1
+        if not self.model_counts[document[DJANGO_CT]]:
+            del self.model_counts[document[DJANGO_CT]]
+        self._update_cache(doc_id, document, terms, False)
+
+    def clear(self):
+        self.__init__()
+
+    def _update_cache(self, doc_id, document, terms, added):
+        """
+        文档加入或删除后更新缓存的数据，不整体清空，更新后的第一次查询不需要重新计算全部文档
+        单字的文档、字段值、字段值索引和按字段排序的文档增量更新；
+        BM25得分依赖文档总数和平均长度，全部删除，查询时只重新计算查询词匹配的文档
+        :param terms: 加入时为 {词: 词频}，删除时为文档包含的词
+        """
+        for key, data in list(self._cache.items()):
+            kind = key[0]
+            if kind == "score":
+                del self._cache[key]
+            elif kind == "char":
+                if not added:
+                    data.pop(doc_id, None)
+                    continue
+                tf = sum(freq for term, freq in terms.items() if key[1] in term)
+                if tf:
+                    data[doc_id] = tf
+            elif kind == "rows":
+                if added:
+                    data[doc_id] = tuple(document.get(field) for field in key[1])
+                else:
+                    data.pop(doc_id, None)
+            elif kind == "sort":
+                self._update_sorted(data, doc_id, key[1], key[2], added)
+            elif document.get(key[1]) is None:
+                # 没有该字段的文档不在字段值中
+                continue
+            elif kind == "column":
+                if added:
+                    data[doc_id] = document[key[1]]
+                else:
+                    data.pop(doc_id, None)
+            elif kind == "values":
+                value = document[key[1]]
+                if added:
+                    data.setdefault(value, {})[doc_id] = None
+                elif doc_id in data.get(value, ()):
+                    del data[value][doc_id]
+                    if not data[value]:
+                        del data[value]
+
+    def _update_sorted(self, doc_ids, doc_id, field, reverse, added):
+        if not added:
+            doc_ids.remove(doc_id)
+            return
+        documents = self.documents
+
+        def key(each):
+            value = documents[each].get(field)
+            return (value is None) != reverse, value
+        _insort(doc_ids, doc_id, key, reverse)
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def term_postings(self, term):
+        """一个查询词匹配的文档 {文档id: 词频}，单个汉字匹配包含该字的所有词"""
+        if len(term) > 1 or not _is_cjk(term):
+            return self.postings.get(term, {})
+        return self._cached(("char", term), lambda: self._char_postings(term))
+
+    def _char_postings(self, char):
+        terms = set(self.char_terms.get(char, ()))
+        if char in self.postings:
+            terms.add(char)
+        merged = {}
+        for term in terms:
+            for doc_id, tf in self.postings[term].items():
+                merged[doc_id] = merged.get(doc_id, 0) + tf
+        # 按文档加入索引的顺序排列
+        return {doc_id: merged[doc_id] for doc_id in self.documents if doc_id in merged}
+
+    def field_column(self, field):
+        """{文档id: 字段值}，不包含字段值为None的文档"""
+        def build():
+            column = {}
+            for doc_id, document in self.documents.items():
+                value = document.get(field)
+                if value is not None:
+                    column[doc_id] = value
+            return column
+        return self._cached(("column", field), build)
+
+    def field_values(self, field):
+        """{字段值: {文档id: None}}"""
+        def build():
+            values = {}
+            for doc_id, value in self.field_column(field).items():
+                values.setdefault(value, {})[doc_id] = None
+            return values
+        return self._cached(("values", field), build)
+
+    def field_rows(self, fields):
+        """{文档id: (字段1的值, 字段2的值, ...)}"""
+        return self._cached(("rows", fields), lambda: {
+            doc_id: tuple(document.get(field) for field in fields) for doc_id, document in self.documents.items()})
+
+    def sort_key(self, field, reverse=False):
+        """
+        按字段排序的key函数，没有该字段的文档与elasticsearch一样正序和倒序都排在最后
+        key为 (是否排在最后, 字段值)，没有该字段的文档之间不比较字段值，字符串字段也可以排序
+        """
+        column = self.field_column(field)
+        if len(column) == len(self.documents):
+            return column.__getitem__
+        get = column.get
+        return lambda doc_id: ((doc_id not in column) != reverse, get(doc_id))
+
+    def sorted_ids(self, field, reverse):
+        """按字段值排序的全部文档id"""
+        return self._cached(("sort", field, reverse),
+                            lambda: sorted(self.documents, key=self.sort_key(field, reverse), reverse=reverse))
+
+    def term_scores(self, term):
+        """一个查询词在每个匹配文档中的BM25得分 {文档id: 得分}"""
+        def build():
+            postings = self.term_postings(term)
+            idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            weight = idf * (BM25_K1 + 1)
+            # 文档的长度归一化系数 k1 * (1 - b + b * 长度 / 平均长度)，只计算匹配的文档
+            avg_length = self.total_length / len(self.doc_lengths) if self.doc_lengths else 1
+            base = BM25_K1 * (1 - BM25_B)
+            scale = BM25_K1 * BM25_B / avg_length
+            lengths = self.doc_lengths
+            return {doc_id: weight * tf / (tf + base + scale * lengths[doc_id]) for doc_id, tf in postings.items()}
+        return self._cached(("score", term), build)
+
+    def bm25(self, doc_ids, terms):
+        """
+        文档的BM25得分，即每个查询词得分的和
+        :param doc_ids: 包含全部查询词的文档
+        :return: {文档id: 得分}，可能包含doc_ids以外的文档
+        """
+        score_list = [self.term_scores(term) for term in set(terms)]
+        if len(score_list) == 1:
+            return score_list[0]
+        return {doc_id: sum(scores[doc_id] for scores in score_list) for doc_id in doc_ids}
+
+
+class QueryPlan(object):
+    """
+    拆分后的查询条件
+    terms: 查询词，用于求候选文档和计算得分
+    includes: 必须包含的文档（等值条件），与查询词匹配的文档求交集得到候选文档
+    excludes: 必须排除的文档（取反的文本条件、等值条件）
+    filters: 其余条件，每个条件是一个从文档id列表中选出满足条件的文档的函数
+    """
+
+    def __init__(self):
+        self.terms = []
+        self.includes = []
+        self.excludes = []
+        self.filters = []
+
+
+class MemorySearchBackend(BaseSearchBackend):
+    """文档保存在内存中的搜索后端"""
+
+    @property
+    def inverted_index(self):
+        if self.connection_alias not in _indexes:
+            inverted_index = _indexes[self.connection_alias] = InvertedIndex()
+            try:
+                self.load(inverted_index)
+            except Exception:
+                # 加载失败时下次使用再重新加载
+                del _indexes[self.connection_alias]
+                raise
+        return _indexes[self.connection_alias]
+
+    def load(self, inverted_index):
+        """进程内第一次使用时从数据库加载全部文档，否则runserver等进程中的索引为空"""
+        unified_index = connections[self.connection_alias].get_unified_index()
+        for index in unified_index.get_indexes().values():
+            for obj in index.index_queryset(using=self.connection_alias).iterator():
+                self.add_object(inverted_index, index, obj)
+
+    def add_object(self, inverted_index, index, obj):
+        document = index.full_prepare(obj)
+        inverted_index.add(document[ID], document, str(document.get(self.document_field, "")))
+
+    @property
+    def documents(self):
+        return self.inverted_index.documents
+
+    @property
+    def document_field(self):
+        return connections[self.connection_alias].get_unified_index().document_field
+
+    def update(self, index, iterable, commit=True):
+        inverted_index = self.inverted_index
+        for obj in iterable:
+            self.add_object(inverted_index, index, obj)
+
+    def remove(self, obj_or_string, commit=True):
+        self.inverted_index.remove(get_identifier(obj_or_string))
+
+    def clear(self, models=None, commit=True):
+        if models is None:
+            # 清空全部文档时不需要先从数据库加载
+            _indexes[self.connection_alias] = InvertedIndex()
+            return
+        model_cts = {get_model_ct(model) for model in models}
+        for doc_id in [doc_id for doc_id, document in self.documents.items() if document[DJANGO_CT] in model_cts]:
+            self.inverted_index.remove(doc_id)
+
+    def split_expression(self, expression):
+        """拆分filter条件的字段名和比较方式，如 price_value__gte -> (price_value, gte)"""
+        parts = expression.split(FILTER_SEPARATOR)
+        if len(parts) > 1 and parts[-1] in VALID_FILTERS:
+            return FILTER_SEPARATOR.join(parts[:-1]), parts[-1]
+        return expression, "content"
+
+    def is_text_field(self, field):
+        return field in ("content", self.document_field)
+
+    @staticmethod
+    def text_terms(value):
+        if hasattr(value, "input_type_name"):
+            value = value.query_string
+        return tokenize(str(value))
+
+    def prepare_value(self, field, lookup, value):
+        """把查询的值转换为与索引字段相同的类型"""
+        search_field = connections[self.connection_alias].get_unified_index().all_searchfields().get(field)
+        field_type = search_field.field_type if search_field is not None else None
+        if lookup in ("in", "range"):
+            return [_coerce(each, field_type) for each in value]
+        return _coerce(value, field_type)
+
+    def expression_ids(self, expression, value):
+        """文本条件和等值条件匹配的文档 {文档id: ...}，其他条件返回None"""
+        field, lookup = self.split_expression(expression)
+        index = self.inverted_index
+        if self.is_text_field(field):
+            postings_list = sorted((index.term_postings(term) for term in set(self.text_terms(value))), key=len)
+            if len(postings_list) < 2:
+                return postings_list[0] if postings_list else index.documents
+            ids = postings_list[0].keys()
+            for postings in postings_list[1:]:
+                ids = ids & postings.keys()
+            return dict.fromkeys(ids)
+        if lookup in ("content", "exact"):
+            return index.field_values(field).get(self.prepare_value(field, lookup, value), {})
+        return None
+
+    def compile_expression(self, expression, value):
+        """把一个filter条件转换为判断函数，如 ("price_value__gte", 100)"""
+        doc_ids = self.expression_ids(expression, value)
+        if doc_ids is not None:
+            return lambda doc_id, document: doc_id in doc_ids
+
+        field, lookup = self.split_expression(expression)
+        value = self.prepare_value(field, lookup, value)
+        compare = COMPARATORS.get(lookup, COMPARATORS["contains"])
+
+        def match(doc_id, document):
+            doc_value = document.get(field)
+            return doc_value is not None and compare(doc_value, value)
+        return match
+
+    def compile_filter(self, expression, value):
+        """把一个filter条件转换为从文档id列表中选出满足条件的文档的函数"""
+        field, lookup = self.split_expression(expression)
+        if lookup in BATCH_COMPARATORS or lookup == "in":
+            value = self.prepare_value(field, lookup, value)
+            if lookup == "in":
+                test = partial(operator.contains, set(value))
+            else:
+                test = partial(BATCH_COMPARATORS[lookup], value)
+            return lambda doc_ids: _select(doc_ids, self.inverted_index.field_column(field), test)
+        return self.node_filter(SearchNode([(expression, value)]))
+
+    def node_filter(self, node):
+        match = self.compile_node(node)
+        documents = self.documents
+        return lambda doc_ids: [doc_id for doc_id in doc_ids if match(doc_id, documents[doc_id])]
+
+    def compile_node(self, node):
+        """把filter条件树转换为判断函数"""
+        matchers = []
+        for child in node.children:
+            if isinstance(child, SearchNode):
+                matchers.append(self.compile_node(child))
+            else:
+                matchers.append(self.compile_expression(child[0], child[1]))
+        if len(matchers) == 1 and not node.negated:
+            return matchers[0]
+        combine = all if node.connector == SearchNode.AND else any
+        negated = node.negated
+
+        def match(doc_id, document):
+            matched = combine(matcher(doc_id, document) for matcher in matchers)
+            return not matched if negated else matched
+        return match
+
+    def tree_ids(self, children, connector):
+        """只由文本条件和等值条件组成的条件树匹配的文档 {文档id: ...}，包含其他条件或取反的条件时返回None"""
+        id_list = []
+        for child in children:
+            if isinstance(child, SearchNode):
+                ids = None if child.negated else self.tree_ids(child.children, child.connector)
+            else:
+                ids = self.expression_ids(child[0], child[1])
+            if ids is None:
+                return None
+            id_list.append(ids)
+        if not id_list:
+            return None
+        if len(id_list) == 1:
+            return id_list[0]
+        if connector == SearchNode.AND:
+            id_list.sort(key=len)
+            ids = id_list[0].keys()
+            for other in id_list[1:]:
+                ids = ids & other.keys()
+            return dict.fromkeys(doc_id for doc_id in id_list[0] if doc_id in ids)
+        merged = {}
+        for ids in id_list:
+            merged.update(ids)
+        return merged
+
+    def plan(self, node, query_plan):
+        """
+        拆分filter条件树：AND连接的文本条件合并为查询词，
+        只由文本条件和等值条件组成的部分转换为文档集合（如 exclude(brand=1)），其余条件转换为过滤函数
+        """
+        if node.negated or (node.connector != SearchNode.AND and len(node.children) > 1):
+            ids = self.tree_ids(node.children, node.connector)
+            if ids is None:
+                query_plan.filters.append(self.node_filter(node))
+            elif node.negated:
+                query_plan.excludes.append(ids)
+            else:
+                query_plan.includes.append(ids)
+            return
+
+        for child in node.children:
+            if isinstance(child, SearchNode):
+                self.plan(child, query_plan)
+                continue
+            if self.is_text_field(self.split_expression(child[0])[0]):
+                query_plan.terms.extend(self.text_terms(child[1]))
+                continue
+            included = self.expression_ids(child[0], child[1])
+            if included is not None:
+                query_plan.includes.append(included)
+            else:
+                query_plan.filters.append(self.compile_filter(child[0], child[1]))
+
+    def find_matches(self, query_plan, model_cts):
+        """满足全部条件的文档id，按加入索引的顺序"""
+        index = self.inverted_index
+        sources = [index.term_postings(term) for term in set(query_plan.terms)]
+        sources.extend(query_plan.includes)
+        sources.sort(key=len)
+        base = sources[0] if sources else index.documents
+
+        # 集合运算在C中完成，比逐个检查文档快得多
+        ids = None
+        for other in sources[1:]:
+            ids = (base.keys() if ids is None else ids) & other.keys()
+        for other in query_plan.excludes:
+            ids = (base.keys() if ids is None else ids) - other.keys()
+        matches = list(base) if ids is None else [doc_id for doc_id in base if doc_id in ids]
+
+        if model_cts is not None:
+            matches = _select(matches, index.field_column(DJANGO_CT), partial(operator.contains, model_cts))
+        for select in query_plan.filters:
+            if not matches:
+                break
+            matches = select(matches)
+        return matches
+
+    def count_facets(self, matches, facets):
+        """字段分面统计，按数量从多到少；所有字段的值组合在一起统计，只遍历一次匹配的文档"""
+        fields = tuple(facets)
+        rows = Counter(map(self.inverted_index.field_rows(fields).__getitem__, matches))
+        counts = {}
+        for i, field in enumerate(fields):
+            field_counts = {}
+            for row, count in rows.items():
+                if row[i] is not None:
+                    field_counts[row[i]] = field_counts.get(row[i], 0) + count
+            counts[field] = sorted(field_counts.items(), key=lambda item: (-item[1], str(item[0])))
+        return counts
+
+    def sort_matches(self, matches, sort_by, end):
+        """
+        按多个字段排序，字段前的 - 表示倒序，返回前end个
+        只有一个排序字段时，匹配的文档较多则从按该字段排好序的全部文档中依次取出，较少则只对前end个排序
+        """
+        index = self.inverted_index
+        if len(sort_by) == 1:
+            name = sort_by[0].lstrip("-")
+            reverse = sort_by[0].startswith("-")
+            if end * len(index.documents) < len(matches) ** 2:
+                match_ids = set(matches)
+                page = []
+                for doc_id in index.sorted_ids(name, reverse):
+                    if doc_id in match_ids:
+                        page.append(doc_id)
+                        if len(page) >= end:
+                            break
+                return page
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            return select(end, matches, key=index.sort_key(name, reverse))
+
+        for field in reversed(sort_by):
+            reverse = field.startswith("-")
+            matches.sort(key=index.sort_key(field.lstrip("-"), reverse), reverse=reverse)
+        return matches[:end]
+
+    @log_query
+    def search(self, query_string, **kwargs):
+        result_class = kwargs.get("result_class") or SearchResult
+        index = self.inverted_index
+        model_cts = None
+        if kwargs.get("models"):
+            model_cts = {get_model_ct(model) for model in kwargs["models"]}
+            if model_cts.issuperset(index.model_counts):
+                # 索引中只有要查询的模型，不需要逐个检查
+                model_cts = None
+
+        query_plan = QueryPlan()
+        if kwargs.get("query_filter"):
+            self.plan(kwargs["query_filter"], query_plan)
+        else:
+            query_plan.terms = self.text_terms(query_string)
+        matches = self.find_matches(query_plan, model_cts)
+
+        scores = index.bm25(matches, query_plan.terms) if query_plan.terms else {}
+
+        start = kwargs.get("start_offset") or 0
+        end = kwargs.get("end_offset")
+        if end is None:
+            end = start + DEFAULT_SIZE
+        if kwargs.get("sort_by"):
+            page = self.sort_matches(matches, kwargs["sort_by"], end)[start:]
+        elif scores:
+            # 按得分从高到低，只对需要的前end个排序，得分相同时按加入索引的顺序
+            page = heapq.nlargest(end, matches, key=scores.__getitem__)[start:]
+        else:
+            page = matches[start:end]
+
+        results = []
+        for doc_id in page:
+            document = index.documents[doc_id]
+            app_label, model_name = document[DJANGO_CT].split(".")
+            fields = {key: value for key, value in document.items() if key not in (ID, DJANGO_CT, DJANGO_ID)}
+            results.append(result_class(app_label, model_name, document[DJANGO_ID], scores.get(doc_id, 0), **fields))
+
+        response = {"results": results, "hits": len(matches)}
+        if kwargs.get("facets"):
+            response["facets"] = {"fields": self.count_facets(matches, kwargs["facets"]), "dates": {}, "queries": {}}
+        return response
+
+    def prep_value(self, db_field, value):
+        return value
+
+    def more_like_this(self, model_instance, additional_query_string=None, start_offset=0, end_offset=None,
+                       limit_to_registered_models=None, result_class=None, **kwargs):
+        return {"results": [], "hits": 0}
+
+
+class MemorySearchQuery(BaseSearchQuery):
+    """查询条件原样交给后端计算，查询字符串只用于日志"""
+
+    def build_params(self, spelling_query=None):
+        kwargs = super(MemorySearchQuery, self).build_params(spelling_query)
+        kwargs["query_filter"] = self.query_filter
+        return kwargs
+
+    def build_query(self):
+        if not self.query_filter:
+            return "*"
+        return self._build_sub_query(self.query_filter)
+
+    def _build_sub_query(self, search_node):
+        term_list = []
+        for child in search_node.children:
+            if isinstance(child, SearchNode):
+                term_list.append(self._build_sub_query(child))
+            else:
+                value = child[1]
+                if not hasattr(value, "input_type_name"):
+                    value = PythonData(value)
+                term_list.append(value.prepare(self))
+        return " ".join(str(term) for term in term_list)
+
+
+class MemoryEngine(BaseEngine):
+    backend = MemorySearchBackend
+    query = MemorySearchQuery
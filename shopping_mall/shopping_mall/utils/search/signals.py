@@ -0,0 +1,134 @@
+"""
+搜索索引的异步更新
+
+QueuedSignalProcessor 替代 RealtimeSignalProcessor：保存/删除建立了索引的模型时，
+只把主键加入redis集合 search_dirty_<app_label.model_name>（同一条数据多次修改只记录一次），
+并延迟 SEARCH_UPDATE_DELAY 秒调度一次celery任务；任务按批次从 index_queryset 查询后用bulk接口更新索引，
+已删除或不再满足 index_queryset 的数据从索引中删除
+每次更新后增加索引版本号 search_index_version，搜索结果缓存以版本号区分
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import signals
+from django_redis import get_redis_connection
+from haystack import connections
+from haystack.exceptions import NotHandled
+from haystack.signals import BaseSignalProcessor
+
+logger = logging.getLogger("django")
+
+SEARCH_DIRTY_KEY = "search_dirty_%s"
+SEARCH_FLUSHING_KEY = "search_dirty_flushing_%s"
+SEARCH_LOCK_KEY = "search_update_lock_%s"
+SEARCH_SCHEDULED_KEY = "search_update_scheduled"
+SEARCH_INDEX_VERSION_KEY = "search_index_version"
+
+# 修改后延迟更新索引的时间，期间的修改合并为一次更新，单位秒
+SEARCH_UPDATE_DELAY = 5
+# 每次bulk更新的文档数
+SEARCH_UPDATE_BATCH_SIZE = 500
+# 更新索引时持有的redis锁的超时时间，单位秒
+SEARCH_UPDATE_LOCK_TIMEOUT = 300
+
+
+def get_queue_connection():
+    return get_redis_connection("default")
+
+
+def get_index_version():
+    """搜索索引版本号，索引内容变化后增加"""
+    return int(get_queue_connection().get(SEARCH_INDEX_VERSION_KEY) or 0)
+
+
+def bump_index_version():
+    get_queue_connection().incr(SEARCH_INDEX_VERSION_KEY)
+
+
+def enqueue(model, pk):
+    """记录需要更新索引的数据，窗口期内只调度一次更新任务"""
+    redis_conn = get_queue_connection()
+    redis_conn.sadd(SEARCH_DIRTY_KEY % model._meta.label_lower, pk)
+    if redis_conn.set(SEARCH_SCHEDULED_KEY, 1, nx=True, ex=SEARCH_UPDATE_DELAY):
+        try:
+            from celery_tasks.search.tasks import update_search_index
+            update_search_index.apply_async(countdown=SEARCH_UPDATE_DELAY)
+        except Exception as e:
+            # 修改记录保留在redis中，下一次调度时一起更新
+            logger.error("调度更新搜索索引[异常][ message: %s ]" % e)
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """保存/删除时只记录主键，由celery任务批量更新索引"""
+
+    def setup(self):
+        signals.post_save.connect(self.handle_save)
+        signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.handle_save)
+        signals.post_delete.disconnect(self.handle_delete)
+
+    def handle_save(self, sender, instance, **kwargs):
+        self.enqueue(sender, instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        self.enqueue(sender, instance)
+
+    def enqueue(self, sender, instance):
+        try:
+            self.connections["default"].get_unified_index().get_index(sender)
+        except NotHandled:
+            # 没有建立索引的模型
+            return
+        pk = instance.pk
+        # 事务提交后再记录，更新任务不会读到未提交的数据
+        transaction.on_commit(lambda: enqueue(sender, pk))
+
+
+def flush_search_updates(using="default"):
+    """
+    批量更新记录的修改到搜索索引
+    :return: 更新的文档数
+    """
+    redis_conn = get_queue_connection()
+    # 先允许调度新的任务，更新期间的修改由下一次任务处理
+    redis_conn.delete(SEARCH_SCHEDULED_KEY)
+
+    unified_index = connections[using].get_unified_index()
+    backend = connections[using].get_backend()
+    count = 0
+    for model in unified_index.get_indexed_models():
+        count += _flush_model(redis_conn, backend, unified_index.get_index(model), model, using)
+    if count:
+        bump_index_version()
+    return count
+
+
+def _flush_model(redis_conn, backend, index, model, using):
+    label = model._meta.label_lower
+    dirty_key = SEARCH_DIRTY_KEY % label
+    flushing_key = SEARCH_FLUSHING_KEY % label
+    with redis_conn.lock(SEARCH_LOCK_KEY % label, timeout=SEARCH_UPDATE_LOCK_TIMEOUT):
+        # 上次失败残留的数据优先处理，否则把当前记录整体换到处理中的key，之后的修改写入新的集合
+        if not redis_conn.exists(flushing_key):
+            if not redis_conn.exists(dirty_key):
+                return 0
+            redis_conn.rename(dirty_key, flushing_key)
+
+        pk_list = sorted(int(pk) for pk in redis_conn.smembers(flushing_key))
+        for i in range(0, len(pk_list), SEARCH_UPDATE_BATCH_SIZE):
+            batch = pk_list[i:i + SEARCH_UPDATE_BATCH_SIZE]
+            objs = list(index.index_queryset(using=using).filter(pk__in=batch))
+            if objs:
+                backend.update(index, objs)
+            # 已删除或不再需要建立索引的数据
+            indexed = {obj.pk for obj in objs}
+            for pk in batch:
+                if pk not in indexed:
+                    backend.remove("%s.%s" % (label, pk))
+            # 每批完成后从集合中删除，失败时只重试未完成的部分
+            redis_conn.srem(flushing_key, *batch)
+
+        redis_conn.delete(flushing_key)
+        return len(pk_list)
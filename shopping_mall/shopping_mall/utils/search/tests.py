@@ -0,0 +1,209 @@
+import random
+
+from django.test import SimpleTestCase
+from haystack.backends import SearchNode
+
+from shopping_mall.utils.search import memory_backend
+from shopping_mall.utils.search.memory_backend import InvertedIndex, MemorySearchBackend, _insort
+
+NAMES = ["华为 手机", "小米 手机", "苹果 平板电脑", "华为 笔记本电脑", "机械键盘", "Apple Watch"]
+
+
+def make_document(sku_id, rand):
+    """与SKUIndex字段相同的文档，部分文档没有sales和name字段"""
+    text = "%s %s" % (rand.choice(NAMES), rand.choice(["黑色", "白色", "128GB"]))
+    document = {
+        "id": "goods.sku.%d" % sku_id,
+        "django_ct": "goods.sku",
+        "django_id": str(sku_id),
+        "text": text,
+        "category": rand.randint(1, 3),
+        "brand": rand.randint(1, 4),
+        "price_value": float(rand.randint(1, 100)),
+        "in_stock": rand.random() < 0.7,
+    }
+    if rand.random() < 0.8:
+        document["sales"] = rand.randint(0, 5)
+    if rand.random() < 0.8:
+        document["name"] = rand.choice(["a", "b", "c"])
+    return document
+
+
+def snapshot(index):
+    """倒排索引缓存的数据，比较时包含顺序"""
+    data = {
+        "documents": list(index.documents),
+        "total_length": index.total_length,
+        "model_counts": index.model_counts,
+    }
+    for char in ("机", "电", "华"):
+        data["char", char] = list(index.term_postings(char).items())
+    for term in ("手机", "华为", "机"):
+        data["score", term] = {doc_id: round(score, 9) for doc_id, score in index.term_scores(term).items()}
+    for field in ("category", "sales", "name", "in_stock"):
+        data["column", field] = list(index.field_column(field).items())
+        data["values", field] = {value: list(doc_ids) for value, doc_ids in index.field_values(field).items()}
+        for reverse in (False, True):
+            data["sort", field, reverse] = index.sorted_ids(field, reverse)
+    data["rows"] = list(index.field_rows(("category", "brand", "sales")).items())
+    return data
+
+
+class InvertedIndexTest(SimpleTestCase):
+    """倒排索引增量更新的缓存与从头重建的结果相同"""
+
+    def test_incremental_update_matches_rebuild(self):
+        rand = random.Random(0)
+        index = InvertedIndex()
+        documents = {}
+        for step in range(300):
+            # 先查询一次，缓存各种数据，之后的加入、删除、重新加入都走增量更新
+            snapshot(index)
+            sku_id = rand.randint(1, 60)
+            key = "goods.sku.%d" % sku_id
+            if key in documents and rand.random() < 0.5:
+                index.remove(key)
+                del documents[key]
+            else:
+                # 已存在的文档重新加入，排在最后
+                document = make_document(sku_id, rand)
+                index.add(key, document, document["text"])
+                documents.pop(key, None)
+                documents[key] = document
+
+            rebuilt = InvertedIndex()
+            for key, document in documents.items():
+                rebuilt.add(key, document, document["text"])
+            self.assertEqual(snapshot(index), snapshot(rebuilt), "step %d" % step)
+
+    def test_remove_missing_document(self):
+        index = InvertedIndex()
+        index.remove("goods.sku.1")
+        self.assertEqual(index.documents, {})
+
+    def test_insort(self):
+        rand = random.Random(0)
+        values = {doc_id: rand.randint(0, 5) for doc_id in range(200)}
+        for reverse in (False, True):
+            doc_ids = []
+            for doc_id in values:
+                _insort(doc_ids, doc_id, values.__getitem__, reverse)
+            # 值相同时按插入顺序，与稳定排序的结果相同
+            self.assertEqual(doc_ids, sorted(values, key=values.__getitem__, reverse=reverse))
+
+    def test_missing_values_sort_last(self):
+        index = InvertedIndex()
+        for sku_id, sales in ((1, 3), (2, None), (3, 1), (4, None), (5, 2)):
+            document = {"django_ct": "goods.sku", "django_id": str(sku_id)}
+            if sales is not None:
+                document["sales"] = sales
+            index.add(sku_id, document, "")
+        self.assertEqual(index.sorted_ids("sales", False), [3, 5, 1, 2, 4])
+        self.assertEqual(index.sorted_ids("sales", True), [1, 5, 3, 2, 4])
+        # 增量加入的文档也按相同的规则排序
+        index.add(6, {"django_ct": "goods.sku", "django_id": "6"}, "")
+        index.add(7, {"django_ct": "goods.sku", "django_id": "7", "sales": 2}, "")
+        self.assertEqual(index.sorted_ids("sales", False), [3, 5, 7, 1, 2, 4, 6])
+        self.assertEqual(index.sorted_ids("sales", True), [1, 5, 7, 3, 2, 4, 6])
+
+
+class MemorySearchBackendTest(SimpleTestCase):
+    """过滤条件、分面统计和排序，结果与逐个检查文档得到的结果相同"""
+
+    def setUp(self):
+        # 使用默认连接的索引字段定义，文档直接写入索引，不从数据库加载
+        self.saved_index = memory_backend._indexes.pop("default", None)
+        memory_backend._indexes["default"] = InvertedIndex()
+        self.backend = MemorySearchBackend("default")
+        rand = random.Random(0)
+        self.documents = [make_document(sku_id, rand) for sku_id in range(1, 201)]
+        for document in self.documents:
+            self.backend.inverted_index.add(document["id"], document, document["text"])
+
+    def tearDown(self):
+        memory_backend._indexes.pop("default", None)
+        if self.saved_index is not None:
+            memory_backend._indexes["default"] = self.saved_index
+
+    def search(self, node, **kwargs):
+        kwargs.setdefault("end_offset", len(self.documents))
+        return self.backend.search("", query_filter=node, models=["goods.sku"], **kwargs)
+
+    def ids(self, response):
+        return [int(result.pk) for result in response["results"]]
+
+    def expected(self, match):
+        return [int(document["django_id"]) for document in self.documents if match(document)]
+
+    def test_filters(self):
+        cases = [
+            (SearchNode([("category", 2)]), lambda d: d["category"] == 2),
+            (SearchNode([("category", "2"), ("in_stock", "true")]), lambda d: d["category"] == 2 and d["in_stock"]),
+            (SearchNode([("price_value__lt", 50)]), lambda d: d["price_value"] < 50),
+            (SearchNode([("price_value__gte", 50), ("brand__in", [1, 3])]),
+             lambda d: d["price_value"] >= 50 and d["brand"] in (1, 3)),
+            (SearchNode([("price_value__range", [20, 40])]), lambda d: 20 <= d["price_value"] <= 40),
+            (SearchNode([("sales__gt", 2)]), lambda d: d.get("sales") is not None and d["sales"] > 2),
+            (SearchNode([("brand", 1), ("brand", 2)], connector=SearchNode.OR), lambda d: d["brand"] in (1, 2)),
+            (SearchNode([SearchNode([("brand", 1)], negated=True), ("category", 1)]),
+             lambda d: d["brand"] != 1 and d["category"] == 1),
+            (SearchNode([("content", "手机"), ("category", 3)]), lambda d: "手机" in d["text"] and d["category"] == 3),
+            (SearchNode([("content", "机")]), lambda d: "机" in d["text"]),
+            (SearchNode([("content", "apple")]), lambda d: "apple" in d["text"].lower()),
+        ]
+        for node, match in cases:
+            response = self.search(node)
+            expected = self.expected(match)
+            self.assertEqual(response["hits"], len(expected), node)
+            self.assertEqual(sorted(self.ids(response)), expected, node)
+
+    def test_text_results_ranked_by_score(self):
+        response = self.search(SearchNode([("content", "华为 手机")]))
+        scores = [result.score for result in response["results"]]
+        self.assertTrue(scores)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_facets(self):
+        response = self.search(SearchNode([("in_stock", True)]), facets=["category", "sales"])
+        matched = [document for document in self.documents if document["in_stock"]]
+        for field in ("category", "sales"):
+            counts = {}
+            for document in matched:
+                # 没有该字段的文档不参与统计
+                if document.get(field) is not None:
+                    counts[document[field]] = counts.get(document[field], 0) + 1
+            expected = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+            self.assertEqual(response["facets"]["fields"][field], expected)
+
+    def test_sort(self):
+        node = SearchNode([("price_value__lte", 80)])
+        matched = [document for document in self.documents if document["price_value"] <= 80]
+
+        def sort_key(field, reverse):
+            # 没有该字段的文档正序和倒序都排在最后
+            return lambda d: ((d.get(field) is None) != reverse, d.get(field))
+
+        for sort_by, end in ((["sales"], 200), (["-sales"], 200), (["sales"], 5), (["-name"], 20),
+                             (["-sales", "price_value"], 200), (["name", "-sales"], 30)):
+            expected = list(matched)
+            for field in reversed(sort_by):
+                reverse = field.startswith("-")
+                expected.sort(key=sort_key(field.lstrip("-"), reverse), reverse=reverse)
+            expected = [int(document["django_id"]) for document in expected[:end]]
+            response = self.search(node, sort_by=sort_by, end_offset=end)
+            self.assertEqual(self.ids(response), expected, sort_by)
+
+    def test_pagination(self):
+        node = SearchNode([("category", 1)])
+        all_ids = self.ids(self.search(node, sort_by=["price_value"]))
+        response = self.search(node, sort_by=["price_value"], start_offset=5, end_offset=10)
+        self.assertEqual(self.ids(response), all_ids[5:10])
+        self.assertEqual(response["hits"], len(all_ids))
+
+    def test_update_and_remove(self):
+        node = SearchNode([("category", 1)])
+        before = self.ids(self.search(node))
+        self.backend.remove("goods.sku.%d" % before[0])
+        document = dict(self.documents[before[1] - 1], category=2)
+        self.backend.inverted_index.add(document["id"], document, document["text"])
+        self.assertEqual(self.ids(self.search(node)), before[2:])
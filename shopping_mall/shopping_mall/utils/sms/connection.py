@@ -0,0 +1,111 @@
+"""
+同一服务器的keep-alive http连接池
+
+请求完成后连接放回池中，下一个请求直接复用，不再为每条短信重新建立tcp和tls连接
+池中最多保留 maxsize 个空闲连接，并发请求超出时临时新建，用完关闭；maxsize为0时不复用连接
+复用前检查空闲连接，空闲超过 idle_timeout 秒或已被服务器关闭的连接直接丢弃；
+请求开始发送后出现的错误不重发，服务器可能已经处理了请求，重发会重复发送短信
+"""
+import http.client
+import queue
+import select
+import socket
+import ssl
+import time
+from urllib.parse import urlsplit
+
+
+class RequestNotSent(Exception):
+    """请求没有发出（建立连接失败），可以安全地重发"""
+
+
+def is_connection_dropped(conn):
+    """空闲连接是否已不可用：空闲时连接可读说明收到了服务器的关闭（或多余的数据）"""
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class ConnectionPool(object):
+    """线程安全，多个线程可以同时发送请求"""
+
+    def __init__(self, url, maxsize=10, timeout=5, idle_timeout=30):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.maxsize = maxsize
+        self.timeout = timeout
+        # 小于服务器的keep-alive超时时间，减少复用时连接恰好被服务器关闭的情况
+        self.idle_timeout = idle_timeout
+        # (连接, 放回的时间)
+        self._idle = queue.LifoQueue(maxsize)
+
+    def _new_connection(self):
+        if self.https:
+            # 与云通讯sdk一致，不验证证书
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=ssl._create_unverified_context())
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        conn.connect()
+        # 请求头和包体分开写入，复用连接时避免nagle算法等待上一个包的ack
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def _get(self):
+        """取一个可用的空闲连接，没有时新建"""
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - idle_since < self.idle_timeout and not is_connection_dropped(conn):
+                return conn
+            conn.close()
+        try:
+            return self._new_connection()
+        except (http.client.HTTPException, OSError) as e:
+            raise RequestNotSent(e)
+
+    def _put(self, conn):
+        if self.maxsize > 0:
+            try:
+                self._idle.put_nowait((conn, time.monotonic()))
+                return
+            except queue.Full:
+                pass
+        conn.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        发送请求，连接池不重发请求
+        :return: (状态码, 响应内容)
+        :raise RequestNotSent: 建立连接失败，请求没有发出
+        :raise http.client.HTTPException, OSError: 请求发送后出错，服务器可能已经处理了请求
+        """
+        conn = self._get()
+        try:
+            conn.request(method, path, body, headers or {})
+            response = conn.getresponse()
+            data = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._put(conn)
+        return response.status, data
+
+    def close(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait()[0].close()
+            except queue.Empty:
+                return
@@ -0,0 +1,105 @@
+"""
+短信服务商
+
+每个服务商对象持有自己的连接池和限速参数，由 sender.get_provider 按配置 SMS_PROVIDERS 创建，每个进程一个
+"""
+import base64
+import datetime
+import http.client
+import json
+from hashlib import md5
+
+from shopping_mall.utils.sms.connection import ConnectionPool, RequestNotSent
+from shopping_mall.utils.yuntongxun.response import TEMPLATE_SMS_FIELDS, decode_response
+
+
+class SMSError(Exception):
+    """发送失败，retry为True时是网络错误或服务商暂时不可用，可以重试"""
+
+    def __init__(self, message, retry=False):
+        super(SMSError, self).__init__(message)
+        self.retry = retry
+
+
+class SMSProvider(object):
+    """
+    服务商基类
+    配置项: RATE 每秒最多请求数（所有进程共享，None为不限），BURST 允许的突发请求数，
+           POOL_SIZE 保持的keep-alive连接数，也是批量发送时的并发数，TIMEOUT 请求超时时间，
+           IDLE_TIMEOUT 空闲连接最长复用时间，应小于服务商的keep-alive超时时间
+    """
+    # 一个请求最多的接收号码数，同一模板和内容的短信合并发送
+    max_recipients = 1
+
+    def __init__(self, name, options):
+        self.name = name
+        self.rate = options.get("RATE")
+        self.burst = options.get("BURST") or self.rate
+        self.pool_size = options.get("POOL_SIZE", 10)
+        self.pool = ConnectionPool(options["URL"], self.pool_size, options.get("TIMEOUT", 5),
+                                   options.get("IDLE_TIMEOUT", 30))
+
+    def send(self, mobiles, datas, temp_id):
+        """
+        发送一个请求，失败时抛出SMSError
+        :param mobiles: 手机号列表，最多 max_recipients 个
+        :param datas: 模板数据
+        :param temp_id: 模板id
+        """
+        raise NotImplementedError
+
+
+class YuntongxunProvider(SMSProvider):
+    """云通讯模板短信，使用json包体"""
+    max_recipients = 200
+
+    SOFT_VERSION = "2013-12-26"
+
+    def __init__(self, name, options):
+        super(YuntongxunProvider, self).__init__(name, options)
+        self.account_sid = options["ACCOUNT_SID"]
+        self.account_token = options["ACCOUNT_TOKEN"]
+        self.app_id = options["APP_ID"]
+        self.path = "/%s/Accounts/%s/SMS/TemplateSMS" % (self.SOFT_VERSION, self.account_sid)
+        # (时间戳, sig, auth)，同一秒内的请求使用相同的签名
+        self._signature = (None, None, None)
+
+    def sign(self):
+        """按当前时间戳生成url中的sig和Authorization头，同一秒内只计算一次"""
+        batch = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        signature = self._signature
+        if signature[0] != batch:
+            sig = md5((self.account_sid + self.account_token + batch).encode()).hexdigest().upper()
+            auth = base64.b64encode((self.account_sid + ":" + batch).encode()).decode()
+            signature = self._signature = (batch, sig, auth)
+        return signature[1], signature[2]
+
+    def send(self, mobiles, datas, temp_id):
+        sig, auth = self.sign()
+        body = json.dumps({
+            "to": ",".join(mobiles),
+            "datas": [str(data) for data in datas],
+            "templateId": str(temp_id),
+            "appId": self.app_id,
+        })
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json;charset=utf-8",
+            "Authorization": auth,
+        }
+        try:
+            status, data = self.pool.request("POST", "%s?sig=%s" % (self.path, sig), body.encode(), headers)
+        except RequestNotSent as e:
+            raise SMSError("网络错误: %s" % e, retry=True)
+        except (http.client.HTTPException, OSError) as e:
+            # 请求可能已被服务商处理，重试会重复发送，记入死信由人工确认后重新发送
+            raise SMSError("网络错误，请求可能已发出: %s" % e)
+        if status == 429 or status >= 500:
+            raise SMSError("HTTP %s" % status, retry=True)
+        try:
+            result = decode_response(data, "json", TEMPLATE_SMS_FIELDS)
+        except ValueError:
+            raise SMSError("响应格式错误: HTTP %s" % status)
+        # 发送成功时statusCode为"000000"
+        if result.get("statusCode") != "000000":
+            raise SMSError("状态码: %s %s" % (result.get("statusCode"), result.get("statusMsg", "")))
@@ -0,0 +1,262 @@
+"""
+短信发送
+
+短信先加入redis列表 sms_queue，立即调度celery任务 dispatch_sms，任务开始执行前加入的短信不再调度，由同一个任务发送，
+任务每次取出 SMS_DISPATCH_BATCH_SIZE 条，模板和内容相同的短信合并为一个请求，
+多个请求由多个线程通过服务商的keep-alive连接池并发发送，直到队列为空
+每个服务商一个令牌桶 sms_rate_<服务商>，所有进程共享，超过每秒请求数时等待
+建立连接失败和服务商暂时不可用时按带随机抖动的指数退避重试，请求发出后的网络错误不重试（服务商可能已发送），
+最终失败或发送时出现其他异常的短信记入死信列表 sms_dead_letter，
+死信超过 SMS_DEAD_LETTER_MAX_AGE 秒后不再重新发送
+短信取出后才发送，worker进程中途退出时未发送的短信丢失，不会重复发送
+"""
+import json
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from shopping_mall.utils.sms.providers import SMSError
+from shopping_mall.utils.redis_script import RedisScript
+from shopping_mall.utils.stats import incr_counters
+
+logger = logging.getLogger("django")
+
+SMS_QUEUE_KEY = "sms_queue"
+SMS_DISPATCH_SCHEDULED_KEY = "sms_dispatch_scheduled"
+SMS_RATE_KEY = "sms_rate_%s"
+SMS_DEAD_LETTER_KEY = "sms_dead_letter"
+
+# 每次从队列取出的短信数
+SMS_DISPATCH_BATCH_SIZE = 100
+# 已调度的发送任务还未开始执行时，加入队列的短信由该任务发送；任务丢失时此时间后可以再次调度，单位秒
+SMS_DISPATCH_INTERVAL = 1
+# 可重试的错误最多重试次数
+SMS_RETRY_TIMES = 3
+# 重试的退避时间，第n次重试前等待 0 ~ min(SMS_RETRY_MAX_DELAY, SMS_RETRY_BASE_DELAY * 2^n) 秒
+SMS_RETRY_BASE_DELAY = 0.2
+SMS_RETRY_MAX_DELAY = 5
+# 死信列表保留的最大数量
+SMS_DEAD_LETTER_MAX = 10000
+# 死信列表的有效期，最后一次记录死信后开始计算，单位秒
+SMS_DEAD_LETTER_EXPIRES = 7 * 24 * 60 * 60
+# 重新发送死信的最长时间，超过后短信内容（如验证码）已失效，与短信验证码的有效期相同，单位秒
+SMS_DEAD_LETTER_MAX_AGE = 5 * 60
+
+# 令牌桶限速，令牌不足时返回需要等待的毫秒数
+# KEYS: 令牌桶  ARGV: 每秒令牌数, 桶容量, 需要的令牌数, 当前时间
+RATE_LIMIT_SCRIPT = RedisScript("verify_codes", """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local need = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= need then
+    tokens = tokens - need
+else
+    wait = math.ceil((need - tokens) / rate * 1000)
+end
+redis.call('hmset', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(burst / rate) + 1)
+return wait
+""")
+
+_providers = {}
+_providers_pid = None
+
+
+def get_sms_connection():
+    return get_redis_connection("verify_codes")
+
+
+def get_provider(name=None):
+    """按配置 SMS_PROVIDERS 创建服务商，每个进程一个，连接池在同一进程的多次发送间复用；fork出的子进程重新创建"""
+    global _providers, _providers_pid
+    if _providers_pid != os.getpid():
+        _providers, _providers_pid = {}, os.getpid()
+    name = name or settings.SMS_DEFAULT_PROVIDER
+    provider = _providers.get(name)
+    if provider is None:
+        options = settings.SMS_PROVIDERS[name]
+        provider = _providers.setdefault(name, import_string(options["BACKEND"])(name, options))
+    return provider
+
+
+def acquire(provider, count=1):
+    """取得服务商的count个请求令牌，超过每秒请求数时等待"""
+    if not provider.rate:
+        return
+    try:
+        while True:
+            wait = RATE_LIMIT_SCRIPT(keys=[SMS_RATE_KEY % provider.name],
+                          args=[provider.rate, provider.burst, count, "%.6f" % time.time()])
+            if wait <= 0:
+                return
+            time.sleep(wait / 1000)
+    except RedisError as e:
+        logger.warning("短信限速失败，不限速发送: %s" % e)
+
+
+def send_request(provider, mobiles, datas, temp_id):
+    """
+    发送一个请求，可重试的错误按带随机抖动的指数退避重试，最终失败或出现其他异常时记入死信
+    :return: 是否成功
+    """
+    attempts = 0
+    while True:
+        acquire(provider)
+        attempts += 1
+        try:
+            provider.send(mobiles, datas, temp_id)
+            return True
+        except SMSError as e:
+            if not e.retry or attempts > SMS_RETRY_TIMES:
+                logger.error("发送短信[失败][ mobile: %s, message: %s ]" % (",".join(mobiles), e))
+                record_dead_letter(provider, mobiles, datas, temp_id, e, attempts)
+                return False
+            time.sleep(random.uniform(0, min(SMS_RETRY_MAX_DELAY, SMS_RETRY_BASE_DELAY * 2 ** (attempts - 1))))
+        except Exception as e:
+            # 其他异常不重试，记入死信，不影响同一批的其他请求
+            logger.error("发送短信[异常][ mobile: %s, message: %s ]" % (",".join(mobiles), e))
+            record_dead_letter(provider, mobiles, datas, temp_id, e, attempts)
+            return False
+
+
+def send_messages(messages, provider=None):
+    """
+    发送多条短信，模板和内容相同的合并为一个请求，多个请求并发发送
+    :param messages: [{"to": 手机号, "datas": 模板数据, "temp_id": 模板id}, ...]
+    :param provider: 服务商，默认为配置 SMS_DEFAULT_PROVIDER
+    :return: (成功数, 失败数)
+    """
+    provider = provider or get_provider()
+    groups = OrderedDict()
+    for message in messages:
+        key = (str(message["temp_id"]), tuple(str(data) for data in message["datas"]))
+        groups.setdefault(key, []).append(message["to"])
+    request_list = []
+    for (temp_id, datas), mobiles in groups.items():
+        for i in range(0, len(mobiles), provider.max_recipients):
+            request_list.append((mobiles[i:i + provider.max_recipients], list(datas), temp_id))
+
+    if len(request_list) == 1 or provider.pool_size <= 1:
+        results = [send_request(provider, *request) for request in request_list]
+    else:
+        with ThreadPoolExecutor(min(len(request_list), provider.pool_size)) as executor:
+            results = list(executor.map(lambda request: send_request(provider, *request), request_list))
+
+    sent = sum(len(request[0]) for request, ok in zip(request_list, results) if ok)
+    failed = len(messages) - sent
+    incr_counters({"sms.sent": sent, "sms.failed": failed, "sms.requests": len(request_list)})
+    return sent, failed
+
+
+def enqueue_sms(mobile, datas, temp_id):
+    """短信加入发送队列，没有等待执行的发送任务时立即调度，不等待凑成一批"""
+    redis_conn = get_sms_connection()
+    redis_conn.rpush(SMS_QUEUE_KEY, json.dumps({"to": mobile, "datas": datas, "temp_id": temp_id}))
+    if redis_conn.set(SMS_DISPATCH_SCHEDULED_KEY, 1, nx=True, ex=SMS_DISPATCH_INTERVAL):
+        try:
+            from celery_tasks.sms.tasks import dispatch_sms
+            dispatch_sms.delay()
+        except Exception as e:
+            # 短信保留在队列中，下一次调度时一起发送
+            logger.error("调度发送短信[异常][ message: %s ]" % e)
+
+
+def dispatch_sms_queue():
+    """
+    分批取出队列中的短信发送，直到队列为空
+    :return: (成功数, 失败数)
+    """
+    redis_conn = get_sms_connection()
+    # 先允许调度新的任务，发送期间加入的短信由本次或下一次任务发送
+    redis_conn.delete(SMS_DISPATCH_SCHEDULED_KEY)
+    sent = failed = 0
+    while True:
+        pl = redis_conn.pipeline()
+        pl.lrange(SMS_QUEUE_KEY, 0, SMS_DISPATCH_BATCH_SIZE - 1)
+        pl.ltrim(SMS_QUEUE_KEY, SMS_DISPATCH_BATCH_SIZE, -1)
+        items = pl.execute()[0]
+        if not items:
+            return sent, failed
+        messages = [message for message in map(parse_message, items) if message is not None]
+        failed += len(items) - len(messages)
+        try:
+            batch_sent, batch_failed = send_messages(messages)
+        except Exception as e:
+            # 如服务商配置错误，已取出的短信整批记入死信，修复后可以重新发送
+            logger.error("批量发送短信[异常][ message: %s ]" % e)
+            for message in messages:
+                record_dead_letter(None, [message["to"]], message["datas"], message["temp_id"], e, 0)
+            batch_sent, batch_failed = 0, len(messages)
+        sent += batch_sent
+        failed += batch_failed
+
+
+def parse_message(item):
+    """解析队列中的一条短信，格式错误时返回None"""
+    try:
+        message = json.loads(item.decode())
+        return {"to": message["to"], "datas": message["datas"], "temp_id": message["temp_id"]}
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error("解析队列中的短信[异常][ item: %s, message: %s ]" % (item, e))
+        return None
+
+
+def record_dead_letter(provider, mobiles, datas, temp_id, error, attempts):
+    """记录最终发送失败的短信，只保留最近的 SMS_DEAD_LETTER_MAX 条"""
+    item = json.dumps({
+        "provider": provider.name if provider is not None else None,
+        "to": mobiles,
+        "datas": datas,
+        "temp_id": temp_id,
+        "error": str(error),
+        "attempts": attempts,
+        "time": int(time.time()),
+    })
+    try:
+        pl = get_sms_connection().pipeline()
+        pl.lpush(SMS_DEAD_LETTER_KEY, item)
+        pl.ltrim(SMS_DEAD_LETTER_KEY, 0, SMS_DEAD_LETTER_MAX - 1)
+        pl.expire(SMS_DEAD_LETTER_KEY, SMS_DEAD_LETTER_EXPIRES)
+        pl.execute()
+    except RedisError as e:
+        logger.error("记录短信死信[异常][ item: %s, message: %s ]" % (item, e))
+
+
+def get_dead_letters(count=100):
+    """最近的死信，新的在前"""
+    return [json.loads(item.decode()) for item in get_sms_connection().lrange(SMS_DEAD_LETTER_KEY, 0, count - 1)]
+
+
+def requeue_dead_letters(max_age=SMS_DEAD_LETTER_MAX_AGE):
+    """
+    死信中的短信重新加入发送队列，超过max_age秒的死信已失效，直接丢弃
+    :return: (重新加入的短信数, 丢弃的短信数)
+    """
+    redis_conn = get_sms_connection()
+    count = expired = 0
+    min_time = time.time() - max_age
+    while True:
+        item = redis_conn.rpop(SMS_DEAD_LETTER_KEY)
+        if item is None:
+            return count, expired
+        letter = json.loads(item.decode())
+        if letter["time"] < min_time:
+            expired += len(letter["to"])
+            continue
+        for mobile in letter["to"]:
+            enqueue_sms(mobile, letter["datas"], letter["temp_id"])
+            count += 1
@@ -0,0 +1,108 @@
+import time
+import logging
+from contextlib import contextmanager
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger("django")
+
+# 延迟直方图各个桶的上界，单位毫秒
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+LATENCY_KEY_PREFIX = "latency_"
+COUNTER_KEY = "counters"
+
+
+def get_stats_connection():
+    return get_redis_connection("stats")
+
+
+def record_latency(stage, seconds):
+    """
+    记录某个阶段的一次耗时，累计到redis的直方图中，所有进程共享
+    统计失败只记日志，不影响业务
+    :param stage: 阶段名称
+    :param seconds: 耗时，单位秒
+    """
+    ms = seconds * 1000
+    bucket = "inf"
+    for upper in LATENCY_BUCKETS:
+        if ms <= upper:
+            bucket = upper
+            break
+
+    try:
+        pl = get_stats_connection().pipeline(transaction=False)
+        pl.hincrby(LATENCY_KEY_PREFIX + stage, bucket, 1)
+        pl.hincrbyfloat(LATENCY_KEY_PREFIX + stage, "sum", ms)
+        pl.execute()
+    except RedisError as e:
+        logger.warning("记录耗时统计失败: %s" % e)
+
+
+@contextmanager
+def latency(stage):
+    """统计with语句块的耗时"""
+    start = time.time()
+    try:
+        yield
+    finally:
+        record_latency(stage, time.time() - start)
+
+
+def incr_counters(counters):
+    """
+    累加计数器
+    :param counters: {计数器名称: 增量}
+    """
+    counters = {name: amount for name, amount in counters.items() if amount}
+    if not counters:
+        return
+    try:
+        pl = get_stats_connection().pipeline(transaction=False)
+        for name, amount in counters.items():
+            pl.hincrby(COUNTER_KEY, name, amount)
+        pl.execute()
+    except RedisError as e:
+        logger.warning("记录计数统计失败: %s" % e)
+
+
+def get_counters():
+    """获取所有计数器 {名称: 值}"""
+    return {name.decode(): int(value) for name, value in get_stats_connection().hgetall(COUNTER_KEY).items()}
+
+
+def get_latency_summary(stage):
+    """
+    汇总某个阶段的耗时
+    百分位取所在桶的上界，是估计值
+    :return: {"count":, "avg":, "p50":, "p95":, "p99":}，单位毫秒
+    """
+    data = get_stats_connection().hgetall(LATENCY_KEY_PREFIX + stage)
+    total_ms = float(data.pop(b"sum", 0))
+    buckets = sorted(((float(bucket), int(count)) for bucket, count in data.items()))
+    count = sum(c for _, c in buckets)
+    summary = {"count": count, "avg": total_ms / count if count else 0}
+    for name, percent in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        summary[name] = 0
+        seen = 0
+        for upper, c in buckets:
+            seen += c
+            if seen >= count * percent:
+                summary[name] = upper
+                break
+    return summary
+
+
+def get_latency_stages():
+    """获取所有记录过耗时的阶段名称"""
+    conn = get_stats_connection()
+    return sorted(key.decode()[len(LATENCY_KEY_PREFIX):] for key in conn.scan_iter(LATENCY_KEY_PREFIX + "*"))
+
+
+def reset_stats():
+    """清空所有统计"""
+    conn = get_stats_connection()
+    keys = list(conn.scan_iter(LATENCY_KEY_PREFIX + "*")) + [COUNTER_KEY]
+    conn.delete(*keys)
@@ -15,7 +15,7 @@ import base64
 import datetime
 from urllib import request as urllib2
 import json
-from .xmltojson import xmltojson
+from .response import TEMPLATE_SMS_FIELDS, decode_response
 
 
 class REST:
@@ -29,7 +29,7 @@ class REST:
     SoftVersion = ''
     Iflog = False  # 是否打印日志
     Batch = ''  # 时间戳
-    BodyType = 'xml'  # 包体格式，可填值：json 、xml
+    BodyType = 'json'  # 包体格式，可填值：json 、xml
 
     # 初始化
     # @param serverIP       必选参数    服务器地址
@@ -108,13 +108,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -159,13 +153,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -210,13 +198,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -256,11 +238,7 @@ class REST:
             ' % (to, tempId, self.AppId)
         if self.BodyType == 'json':
             # if this model is Json ..then do next code
-            b = '['
-            for a in datas:
-                b += '"%s",' % (a)
-            b += ']'
-            body = '''{"to": "%s", "datas": %s, "templateId": "%s", "appId": "%s"}''' % (to, b, tempId, self.AppId)
+            body = json.dumps({"to": to, "datas": [str(a) for a in datas], "templateId": str(tempId), "appId": self.AppId})
         req.data = body.encode()
         data = ''
         try:
@@ -268,13 +246,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType, TEMPLATE_SMS_FIELDS)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -335,13 +307,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -394,13 +360,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -445,8 +405,7 @@ class REST:
             res = urllib2.urlopen(req)
             data = res.read()
             res.close()
-            xtj = xmltojson()
-            locations = xtj.main(data)
+            locations = decode_response(data, 'xml')
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -491,13 +450,7 @@ class REST:
 
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -531,13 +484,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -581,13 +528,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main2(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -622,13 +563,7 @@ class REST:
             data = res.read()
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -673,13 +608,7 @@ class REST:
 
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -723,13 +652,7 @@ class REST:
 
             res.close()
 
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            locations = decode_response(data, self.BodyType)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+云通讯接口响应解码，sdk和短信发送共用
+
+json包体直接用json模块解析；xml包体用增量解析器流式解析，不构建整个文档树：
+只保留需要的顶层元素，每个顶层元素解析完就清除，需要的元素都取到后不再解析剩余内容
+返回的字典格式与json包体相同，例如 {"statusCode": "000000", "templateSMS": {"dateCreated": ..., "smsMessageSid": ...}}
+"""
+import json
+import xml.etree.ElementTree as ET
+
+# 发送模板短信用到的字段
+TEMPLATE_SMS_FIELDS = ("statusCode", "statusMsg", "templateSMS")
+
+# xml元素名与json字段名不同的
+XML_FIELD_NAMES = {"TemplateSMS": "templateSMS"}
+
+# xml包体每次送入解析器的字节数
+XML_CHUNK_SIZE = 4096
+
+
+def decode_response(data, body_type="json", fields=None):
+    """
+    :param data: 响应包体 bytes
+    :param body_type: json / xml
+    :param fields: xml包体中需要的顶层字段，None为全部
+    :return: dict
+    :raise ValueError: 包体格式错误，json和xml相同
+    """
+    if body_type == "json":
+        return json.loads(data.decode())
+    try:
+        return decode_xml(data, fields)
+    except ET.ParseError as e:
+        # ParseError不是ValueError的子类，调用方只需要处理ValueError
+        raise ValueError("xml包体格式错误: %s" % e)
+
+
+def decode_xml(data, fields=None):
+    """
+    顶层元素没有子元素时取文本，有子元素时取 {子元素名: 文本}，同名的顶层元素有多个时为列表
+    """
+    result = {}
+    remaining = set(fields) if fields is not None else None
+    depth = 0
+    # iterparse使用的增量解析器，分块送入数据，取到需要的字段后不再解析剩余的块
+    parser = ET.XMLPullParser(("start", "end"))
+    for offset in range(0, len(data), XML_CHUNK_SIZE):
+        parser.feed(data[offset:offset + XML_CHUNK_SIZE])
+        for event, element in parser.read_events():
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            # 根元素的子元素解析完成
+            name = XML_FIELD_NAMES.get(element.tag, element.tag)
+            if fields is None or name in fields:
+                value = {child.tag: child.text for child in element} if len(element) else element.text
+                if name not in result:
+                    result[name] = value
+                elif isinstance(result[name], list):
+                    result[name].append(value)
+                else:
+                    result[name] = [result[name], value]
+                if remaining is not None:
+                    remaining.discard(name)
+                    if not remaining:
+                        return result
+            element.clear()
+    parser.close()
+    return result